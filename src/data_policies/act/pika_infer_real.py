@@ -18,6 +18,7 @@ from src.hardware.control.controller import ArmControllerFactory
 from src.data_policies.act.constants import TASK_CONFIGS
 from src.data_policies.act.policy import ACTPolicy
 from src.data_policies.act.utils import set_seed
+from src.data_tools.scripts.dataset_catalog import load_catalog
 
 
 def main(args):
@@ -30,7 +31,15 @@ def main(args):
 
     # get task parameters
     task_config = TASK_CONFIGS[task_name]
-    episode_len = task_config["episode_len"]
+    episode_len = task_config.get("episode_len")
+    if episode_len is None:
+        # 配置中没有 episode_len 时才使用 catalog.json 中最长的 episode 帧数，
+        # 配置的值决定实机执行的步数，不随新转换的 episode 改变
+        catalog = load_catalog(task_config["dataset_dir"])
+        if not catalog["episodes"]:
+            raise ValueError(f"{task_name} has no episode_len and {task_config['dataset_dir']} has no catalog.json episodes")
+        episode_len = max(entry["frames"] for entry in catalog["episodes"].values())
+        print(f"{task_name} has no episode_len, use the longest catalog episode: {episode_len} frames")
     camera_names = task_config["camera_names"]
     state_dim = task_config["state_dim"]
 
@@ -1,6 +1,12 @@
 
 import os
+import sys
 import shutil
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))  # add root to path
+
+from src.data_tools.scripts.dataset_catalog import refresh_catalog
 
 def organize_hdf5_files(source_dir, target_dir):
     """
@@ -36,6 +42,9 @@ def organize_hdf5_files(source_dir, target_dir):
     
     print(f"完成! 共复制了 {count} 个.hdf5文件")
 
+    # 更新目标目录的 catalog.json，训练和推理时直接读取帧数
+    refresh_catalog(target_dir, "*.hdf5", rescan=True)
+
 # 使用示例
 source_directory = "/home/synk/questVR_ws-master/src/data_collect/bear_v4"  # 替换为您的源目录路径
 target_directory = "/home/synk/questVR_ws-master/src/act_input/bear_v4"  # 替换为目标目录路径
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-camera projection model for RGB-D point cloud generation.
+CameraGeometry reads the color and depth config.json once and caches the
+unprojection ray table, the depth-to-color pixel remap and the extrinsic transform,
+so turning a depth frame into a point cloud costs a multiply and a mask.
+"""
+
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+def create_transformation_matrix(x, y, z, roll, pitch, yaw):
+    transformation_matrix = np.eye(4, dtype=np.float64)
+    A = np.cos(yaw)
+    B = np.sin(yaw)
+    C = np.cos(pitch)
+    D = np.sin(pitch)
+    E = np.cos(roll)
+    F = np.sin(roll)
+    DE = D * E
+    DF = D * F
+    transformation_matrix[0, 0] = A * C
+    transformation_matrix[0, 1] = A * DF - B * E
+    transformation_matrix[0, 2] = B * F + A * DE
+    transformation_matrix[0, 3] = x
+    transformation_matrix[1, 0] = B * C
+    transformation_matrix[1, 1] = A * E + B * DF
+    transformation_matrix[1, 2] = B * DE - A * F
+    transformation_matrix[1, 3] = y
+    transformation_matrix[2, 0] = -D
+    transformation_matrix[2, 1] = C * F
+    transformation_matrix[2, 2] = C * E
+    transformation_matrix[2, 3] = z
+    transformation_matrix[3, 0] = 0
+    transformation_matrix[3, 1] = 0
+    transformation_matrix[3, 2] = 0
+    transformation_matrix[3, 3] = 1
+    return transformation_matrix
+
+
+def load_camera_config(path: str) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """读取相机 config.json，返回内参 (没有 K 时为 None) 和相对 parent_frame 的外参"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    intrinsic = np.array(data["K"], dtype=np.float64).reshape(3, 3) if "K" in data else None
+    frame = data["parent_frame"]
+    extrinsic = create_transformation_matrix(frame['x'], frame['y'], frame['z'], frame['roll'], frame['pitch'], frame['yaw'])
+    return intrinsic, extrinsic
+
+
+def get_relative_transform(target_extrinsic: np.ndarray, source_extrinsic: np.ndarray) -> Optional[np.ndarray]:
+    """source 坐标系到 target 坐标系的变换，两者相同时返回 None"""
+    if np.array_equal(target_extrinsic, source_extrinsic):
+        return None
+    return np.dot(np.linalg.inv(target_extrinsic), source_extrinsic)
+
+
+def transform_points(points: np.ndarray, transform: Optional[np.ndarray]) -> np.ndarray:
+    """对 (N, 3+) 点云的前三列做刚体变换，其余列 (颜色) 保持不变"""
+    if transform is None:
+        return points
+    points = points.copy()
+    points[:, :3] = points[:, :3] @ transform[:3, :3].T.astype(points.dtype) + transform[:3, 3].astype(points.dtype)
+    return points
+
+
+class CameraGeometry:
+    """一个 RGB-D 相机的投影模型
+
+    深度相机与彩色相机外参不同时，深度图先按像素坐标重映射到彩色图像平面，
+    再用彩色相机内参反投影，否则直接用深度相机内参反投影。
+    查找表按图像尺寸在第一次使用时建立。
+    """
+
+    def __init__(self, color_intrinsic: np.ndarray, depth_intrinsic: np.ndarray,
+                 color_extrinsic: np.ndarray, depth_extrinsic: np.ndarray, depth_scale: float = 1000.0):
+        self.color_intrinsic = color_intrinsic
+        self.depth_intrinsic = depth_intrinsic
+        self.depth_to_color = get_relative_transform(color_extrinsic, depth_extrinsic)
+        self.intrinsic = color_intrinsic if self.depth_to_color is not None else depth_intrinsic
+        self.depth_scale = depth_scale
+        self.tables: Dict[Tuple[int, int], Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]] = {}
+
+    @classmethod
+    def from_config(cls, color_config_path: str, depth_config_path: str, depth_scale: float = 1000.0):
+        color_intrinsic, color_extrinsic = load_camera_config(color_config_path)
+        depth_intrinsic, depth_extrinsic = load_camera_config(depth_config_path)
+        return cls(color_intrinsic, depth_intrinsic, color_extrinsic, depth_extrinsic, depth_scale)
+
+    def build_remap(self, height: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """深度像素到彩色图像平面像素的映射 (只与像素坐标有关)，返回 (源下标, 目标下标)
+
+        多个源像素落到同一目标像素时保留最后一个，与逐点赋值的结果一致。
+        """
+        u, v = np.meshgrid(np.arange(width), np.arange(height))
+        depth_points = np.vstack((u.flatten(), v.flatten(), np.ones(height * width)))
+        X_depth = np.linalg.inv(self.depth_intrinsic) @ depth_points
+        X_color = self.depth_to_color @ np.vstack((X_depth, np.ones((1, X_depth.shape[1]))))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_color = np.round(self.color_intrinsic[0, 0] * (X_color[0, :] / X_color[2, :]) + self.color_intrinsic[0, 2])
+            y_color = np.round(self.color_intrinsic[1, 1] * (X_color[1, :] / X_color[2, :]) + self.color_intrinsic[1, 2])
+        valid = np.isfinite(x_color) & np.isfinite(y_color) & (x_color >= 0) & (x_color < width) & (y_color >= 0) & (y_color < height)
+        source = np.flatnonzero(valid)
+        target = y_color[valid].astype(np.int64) * width + x_color[valid].astype(np.int64)
+        # 反转后 np.unique 的首次出现即原顺序中的最后一次
+        target, last = np.unique(target[::-1], return_index=True)
+        return source[::-1][last], target
+
+    def get_tables(self, height: int, width: int):
+        """返回 (射线表, 重映射源下标, 重映射目标下标)，射线表已除以深度比例"""
+        key = (height, width)
+        if key not in self.tables:
+            fx, fy = self.intrinsic[0][0], self.intrinsic[1][1]
+            cx, cy = self.intrinsic[0][2], self.intrinsic[1][2]
+            u, v = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+            rays = np.stack(((u - cx) / fx, (v - cy) / fy, np.ones_like(u)), axis=-1).reshape(-1, 3)
+            rays = (rays / self.depth_scale).astype(np.float32)
+            source, target = self.build_remap(height, width) if self.depth_to_color is not None else (None, None)
+            self.tables[key] = (rays, source, target)
+        return self.tables[key]
+
+    def align_depth(self, depths: np.ndarray) -> np.ndarray:
+        """把 (B, H, W) 深度图对齐到彩色图像平面"""
+        depths = np.asarray(depths)
+        if self.depth_to_color is None:
+            return depths
+        batch, height, width = depths.shape
+        _, source, target = self.get_tables(height, width)
+        flat = depths.reshape(batch, -1)
+        aligned = np.zeros_like(flat)
+        aligned[:, target] = flat[:, source]
+        return aligned.reshape(depths.shape)
+
+    def depth_to_point_clouds(self, depths: np.ndarray, colors: Optional[np.ndarray] = None, max_distance: float = 0) -> List[np.ndarray]:
+        """把一组深度图 (B, H, W) 和 BGR 彩色图 (B, H, W, 3) 转换为点云
+
+        返回 B 个 float32 点云，每个为 (N, 6) 的 x, y, z, r, g, b (没有彩色图时为 (N, 3))，
+        深度为零的像素被跳过；max_distance (米) 大于 0 时 z 不小于它的像素在反投影前即被跳过。
+        """
+        depths = np.asarray(depths)
+        if depths.ndim == 2:
+            depths = depths[np.newaxis]
+        batch, height, width = depths.shape
+        rays, _, _ = self.get_tables(height, width)
+        flat = self.align_depth(depths).reshape(batch, -1)
+        mask = flat > 0
+        if max_distance > 0:
+            # 反投影后 z 等于深度除以深度比例，直接在深度图上比较
+            mask &= flat < max_distance * self.depth_scale
+        frame_index, pixel_index = np.nonzero(mask)
+        columns = 3 if colors is None else 6
+        points = np.empty((frame_index.shape[0], columns), dtype=np.float32)
+        np.multiply(rays[pixel_index], flat[frame_index, pixel_index].astype(np.float32)[:, np.newaxis], out=points[:, :3])
+        if colors is not None:
+            colors = np.asarray(colors).reshape(batch, -1, 3)
+            points[:, 3:] = colors[frame_index, pixel_index][:, ::-1]
+        return np.split(points, np.cumsum(mask.sum(axis=1))[:-1])
+
+    def depth_to_point_cloud(self, depth: np.ndarray, color: Optional[np.ndarray] = None, max_distance: float = 0) -> np.ndarray:
+        """单帧版本的 depth_to_point_clouds"""
+        return self.depth_to_point_clouds(depth[np.newaxis], None if color is None else color[np.newaxis], max_distance)[0]
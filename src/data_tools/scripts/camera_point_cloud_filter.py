@@ -8,81 +8,24 @@
 import os
 import numpy as np
 import argparse
-import pcl
 import struct
-import open3d as o3d
 import time as systime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import random
 import cv2
 import json
 import numpy as np
 import cv2
 import yaml
+from sync_index import load_sync_index, read_sync_lines
+from point_cloud_sampling import crop_points, farthest_point_sampling, voxel_down_sample
+from point_cloud_augment import augment_point_clouds
+from point_cloud_io import POINT_CLOUD_TENSOR_FILE, load_point_cloud, create_point_cloud_tensor, open_point_cloud_tensor
+from camera_geometry import CameraGeometry, load_camera_config, get_relative_transform, transform_points
 
 
-def create_transformation_matrix(x, y, z, roll, pitch, yaw):
-    transformation_matrix = np.eye(4, dtype=np.float64)
-    A = np.cos(yaw)
-    B = np.sin(yaw)
-    C = np.cos(pitch)
-    D = np.sin(pitch)
-    E = np.cos(roll)
-    F = np.sin(roll)
-    DE = D * E
-    DF = D * F
-    transformation_matrix[0, 0] = A * C
-    transformation_matrix[0, 1] = A * DF - B * E
-    transformation_matrix[0, 2] = B * F + A * DE
-    transformation_matrix[0, 3] = x
-    transformation_matrix[1, 0] = B * C
-    transformation_matrix[1, 1] = A * E + B * DF
-    transformation_matrix[1, 2] = B * DE - A * F
-    transformation_matrix[1, 3] = y
-    transformation_matrix[2, 0] = -D
-    transformation_matrix[2, 1] = C * F
-    transformation_matrix[2, 2] = C * E
-    transformation_matrix[2, 3] = z
-    transformation_matrix[3, 0] = 0
-    transformation_matrix[3, 1] = 0
-    transformation_matrix[3, 2] = 0
-    transformation_matrix[3, 3] = 1
-    return transformation_matrix
-
-
-def depth_to_color_projection(depth_image, color_intrinsic, depth_intrinsic, extrinsic):
-    # 获取深度图像的宽度和高度
-    depth_height, depth_width = depth_image.shape[:2]
-
-    # 创建网格坐标
-    u, v = np.meshgrid(np.arange(depth_width), np.arange(depth_height))
-    u = u.flatten()
-    v = v.flatten()
-    depth_values = depth_image.flatten()
-
-    # 将像素坐标转换为齐次坐标
-    depth_points = np.vstack((u, v, np.ones_like(u)))
-
-    # 将深度图像中的点转换到深度相机坐标系
-    X_depth = np.linalg.inv(depth_intrinsic) @ depth_points
-
-    # 将深度相机坐标系中的点转换到彩色相机坐标系
-    X_color = extrinsic @ np.vstack((X_depth, np.ones((1, X_depth.shape[1]))))
-
-    # 将彩色相机坐标系中的点投影到彩色图像平面
-    x_color = (color_intrinsic[0, 0] * (X_color[0, :] / X_color[2, :]) + color_intrinsic[0, 2]).round().astype(int)
-    y_color = (color_intrinsic[1, 1] * (X_color[1, :] / X_color[2, :]) + color_intrinsic[1, 2]).round().astype(int)
-
-    # 创建对齐后的深度图像
-    aligned_depth = np.zeros_like(depth_image)
-
-    # 将投影后的点存储到对齐后的深度图像中
-    valid_indices = (x_color >= 0) & (x_color < depth_image.shape[1]) & (y_color >= 0) & (y_color < depth_image.shape[0])
-    aligned_depth[y_color[valid_indices], x_color[valid_indices]] = depth_values[valid_indices]
-
-    return aligned_depth
-
-
-def color_depth_to_point_cloud(color_image_path, depth_image_path, color_intrinsic, depth_intrinsic, color_extrinsic, depth_extrinsic):
+def color_depth_to_point_cloud(color_image_path, depth_image_path, geometry, max_distance=0):
     # 读取 color 图像
     color_image = cv2.imread(color_image_path)
     if color_image is None:
@@ -92,40 +35,9 @@ def color_depth_to_point_cloud(color_image_path, depth_image_path, color_intrins
     depth_image = cv2.imread(depth_image_path, cv2.IMREAD_ANYDEPTH)
     if depth_image is None:
         raise FileNotFoundError(f"Depth image {depth_image_path} not found")
-    if not np.array_equal(color_extrinsic, depth_extrinsic):
-        depth_image = depth_to_color_projection(depth_image, color_intrinsic, depth_intrinsic, np.dot(np.linalg.inv(color_extrinsic), depth_extrinsic))
-        # 相机内参矩阵
-        fx, fy = color_intrinsic[0][0], color_intrinsic[1][1]
-        cx, cy = color_intrinsic[0][2], color_intrinsic[1][2]
-    else:
-        # 相机内参矩阵
-        fx, fy = depth_intrinsic[0][0], depth_intrinsic[1][1]
-        cx, cy = depth_intrinsic[0][2], depth_intrinsic[1][2]
-    # 获取图像的宽度和高度
-    height, width = depth_image.shape
-
-    u, v = np.meshgrid(np.arange(width), np.arange(height))
-    u = u.astype(np.float32)
-    v = v.astype(np.float32)
-    z = depth_image.astype(np.float32) / 1000.0  # 将深度图像转换为米
-
-    # 计算 3D 坐标
-    x = (u - cx) * z / fx
-    y = (v - cy) * z / fy
-
-    # 提取 color 颜色值
-    b = color_image[..., 0].astype(np.float32)
-    g = color_image[..., 1].astype(np.float32)
-    r = color_image[..., 2].astype(np.float32)
 
-    # 合并为点云
-    point_cloud = np.stack((x, y, z, r, g, b), axis=-1)
-
-    # 跳过深度为零的点
-    valid_mask = z > 0.0
-    point_cloud = point_cloud[valid_mask]
-
-    return point_cloud
+    # 对齐、反投影和跳过深度为零或超出 max_distance 的像素由相机的缓存投影模型完成
+    return geometry.depth_to_point_cloud(depth_image, color_image, max_distance)
 
 
 class Operator:
@@ -150,229 +62,150 @@ class Operator:
         self.cameraPointCloudNormSyncDirs = [os.path.join(self.cameraPointCloudNormDirs[i], "sync.txt") for i in range(len(self.args.cameraNames))]
 
     def farthest_point_sampling(self, points, k):
-        sampled_points = [np.random.randint(len(points))]
-        distances = np.linalg.norm(points - points[sampled_points[-1]], axis=1)
-        for _ in range(k - 1):
-            farthest_index = np.argmax(distances)
-            sampled_points.append(farthest_index)
-            distances = np.minimum(distances, np.linalg.norm(points - points[farthest_index], axis=1))
-        return sampled_points
+        # float32 原地更新距离的最远点采样，见 point_cloud_sampling.py
+        # 起点从全局随机状态中选取，受每帧种子控制
+        return farthest_point_sampling(points, k, start_index=np.random.randint(len(points)))
+
+    def voxel_down_sample(self, point_cloud, voxel_size):
+        # 纯 NumPy 体素降采样，坐标和颜色按体素取均值，见 point_cloud_sampling.py
+        pc = voxel_down_sample(point_cloud, voxel_size)
+        if self.args.use_farthest_point_down_sample and pc.shape[0] > self.args.pointNum:
+            pc = pc[self.farthest_point_sampling(pc, self.args.pointNum)]
+
+        if pc.shape[0] > self.args.pointNum:
+            idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
+            pc = pc[idxs]
+        elif pc.shape[0] < self.args.pointNum:
+            if pc.shape[0] == 0:
+                pc = np.zeros([1, 6], dtype=np.float32)
+            idxs1 = np.arange(pc.shape[0])
+            idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
+                                     replace=True)
+            idxs = np.concatenate([idxs1, idxs2], axis=0)
+            pc = pc[idxs]
+        return pc
+
+    def get_frame_seed(self, camera_index, frame_index):
+        # 每帧的随机种子只由 --seed、相机序号和帧序号决定，与进程数无关
+        return int(np.random.SeedSequence([self.args.seed, camera_index, frame_index]).generate_state(1)[0])
+
+    def resample(self, pc):
+        if pc.shape[0] >= self.args.pointNum:
+            idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
+        elif pc.shape[0] < self.args.pointNum:
+            if pc.shape[0] == 0:
+                pc = np.zeros([1, 6], dtype=np.float32)
+            idxs1 = np.arange(pc.shape[0])
+            idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
+                                     replace=True)
+            idxs = np.concatenate([idxs1, idxs2], axis=0)
+        return pc[idxs]
+
+    def load_point_cloud_frame(self, point_cloud_path, point_cloud_transform, max_distance, voxel_size):
+        print(point_cloud_path)
+        # PCD 直接按文件头映射为数组，颜色已解包为 r, g, b
+        point_cloud = load_point_cloud(point_cloud_path)
+        # 降采样前先按距离裁剪，远处背景不参与体素化和最远点采样
+        if max_distance != 0:
+            point_cloud = crop_points(point_cloud, upper=(np.inf, np.inf, max_distance))
+        if voxel_size != 0:
+            pc = self.voxel_down_sample(point_cloud, voxel_size)
+        else:
+            pc = self.resample(point_cloud)
+
+        if point_cloud_transform is not None:
+            pc = transform_points(pc, point_cloud_transform)
+        return pc
+
+    def load_depth_frame(self, color_path, depth_path, geometry, max_distance, voxel_size):
+        print(depth_path)
+        point_cloud = color_depth_to_point_cloud(color_path, depth_path, geometry, max_distance)
+        if voxel_size != 0:
+            pc = self.voxel_down_sample(point_cloud, voxel_size)
+        else:
+            pc = self.resample(point_cloud)
+        return pc
+
+    def process_frame(self, frame):
+        """处理一帧并保存为 <time>.npy 或 points.npy 中的一行，frame 为 (相机序号, 帧序号, 时间戳, 读取函数名, 读取参数)"""
+        camera_index, frame_index, time, loader, loader_args = frame
+        seed = self.get_frame_seed(camera_index, frame_index)
+        np.random.seed(seed)
+        random.seed(seed)
+        pc = getattr(self, loader)(*loader_args)
+        if self.args.use_augment:
+            # 增强会固化到保存的点云中，训练时优先在读取阶段使用 point_cloud_augment.PointCloudAugmentation
+            pc = augment_point_clouds(pc, np.random.default_rng(seed))
+        if self.args.useTensorOutput:
+            # 各进程直接写入预分配的 points.npy 的第 frame_index 行
+            open_point_cloud_tensor(os.path.join(self.cameraPointCloudNormDirs[camera_index], POINT_CLOUD_TENSOR_FILE), 'r+')[frame_index] = pc
+        else:
+            np.save(os.path.join(self.cameraPointCloudNormDirs[camera_index], time + ".npy"), pc)
+        return time
+
+    def process_frames(self, frames):
+        """按顺序返回各帧时间戳，--workers 大于 1 时在进程池中处理"""
+        if self.args.workers > 1 and len(frames) > 1:
+            with ProcessPoolExecutor(max_workers=self.args.workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=init_frame_worker, initargs=(self,)) as executor:
+                return list(executor.map(process_frame_in_worker, frames, chunksize=max(1, len(frames) // (self.args.workers * 8))))
+        return [self.process_frame(frame) for frame in frames]
 
     def process(self):
+        sync_index = load_sync_index(self.episodeDir)
         for i in range(len(self.args.cameraNames)):
             os.system(f"rm -rf {self.cameraPointCloudNormDirs[i]}")
             os.system(f"mkdir {self.cameraPointCloudNormDirs[i]}")
             use_point_cloud = os.path.exists(self.cameraPointCloudSyncDirs[i])
             if use_point_cloud:
                 os.system(f"cp {self.cameraPointCloudConfigDirs[i]} {self.cameraPointCloudNormConfigDirs[i]}")
-                with open(self.cameraPointCloudSyncDirs[i], 'r') as lines:
-                    with open(self.cameraPointCloudNormSyncDirs[i], "w") as f:
-                        for line in lines:
-                            line = line.replace('\n', '')
-                            time = line[:-4]
-                            os.path.join(self.cameraPointCloudDirs[i], line)
-                            print(os.path.join(self.cameraPointCloudDirs[i], line))
-                            if self.args.voxelSize != 0:
-                                pcd = o3d.io.read_point_cloud(os.path.join(self.cameraPointCloudDirs[i], line))
-
-                                downsampled_cloud = pcd.voxel_down_sample(self.args.voxelSize)
-                                if self.args.use_farthest_point_down_sample and len(
-                                        downsampled_cloud.points) > self.args.pointNum:
-                                    downsampled_cloud = downsampled_cloud.farthest_point_down_sample(self.args.pointNum)
-
-                                downsampled_cloud.colors = o3d.utility.Vector3dVector(
-                                    (np.asarray(downsampled_cloud.colors) * 255).astype(np.float64))
-                                pc = np.concatenate([downsampled_cloud.points, downsampled_cloud.colors], axis=-1)
-                                condition = pc[:, 2] < 2
-                                pc = pc[condition, :]
-
-                                if pc.shape[0] > self.args.pointNum:
-                                    idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
-                                    pc = pc[idxs]
-                                elif pc.shape[0] < self.args.pointNum:
-                                    if pc.shape[0] == 0:
-                                        pc = np.zeros([1, 4], dtype=np.float32)
-                                    idxs1 = np.arange(pc.shape[0])
-                                    idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
-                                                             replace=True)
-                                    idxs = np.concatenate([idxs1, idxs2], axis=0)
-                                    pc = pc[idxs]
-                            else:
-                                pc = pcl.load_XYZRGB(os.path.join(self.cameraPointCloudDirs[i], line)).to_array()
-                                condition = pc[:, 2] < 2
-                                pc = pc[condition, :]
-                                if pc.shape[0] >= self.args.pointNum:
-                                    idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
-                                elif pc.shape[0] < self.args.pointNum:
-                                    if pc.shape[0] == 0:
-                                        pc = np.zeros([1, 4], dtype=np.float32)
-                                    idxs1 = np.arange(pc.shape[0])
-                                    idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
-                                                             replace=True)
-                                    idxs = np.concatenate([idxs1, idxs2], axis=0)
-
-                                rgbs = pc[idxs][:, 3].view(np.uint32)
-                                r = (np.right_shift(rgbs, 16) % 256)[:, np.newaxis]
-                                g = (np.right_shift(rgbs, 8) % 256)[:, np.newaxis]
-                                b = (rgbs % 256)[:, np.newaxis]
-                                r_g_b = np.concatenate([r, g, b], axis=-1)
-                                pc = np.concatenate([pc[idxs][:, :3], r_g_b], axis=-1)
-
-                            with open(self.cameraColorConfigDirs[i], 'r') as color_config_file:
-                                data = json.load(color_config_file)
-                                color_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-                                with open(self.cameraPointCloudConfigDirs[i], 'r') as point_cloud_config_file:
-                                    data = json.load(point_cloud_config_file)
-                                    point_cloud_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-                                    if not np.array_equal(color_extrinsic, point_cloud_extrinsic):
-                                        pcd = o3d.geometry.PointCloud()
-                                        pcd.points = o3d.utility.Vector3dVector(pc[:, :3])
-                                        pc[:, 3:] = pc[:, 3:] / 255
-                                        pcd.colors = o3d.utility.Vector3dVector(pc[:, 3:])
-                                        pcd.transform(np.dot(np.linalg.inv(color_extrinsic), point_cloud_extrinsic))
-                                        # o3d.io.write_point_cloud(
-                                        #     os.path.join(self.cameraPointCloudNormDirs[i], time + ".pcd"), pcd)
-                                        pcd.colors = o3d.utility.Vector3dVector(
-                                            (np.asarray(pcd.colors) * 255).astype(np.float64))
-                                        pc = np.concatenate([pcd.points, pcd.colors], axis=-1)
-
-                            if self.args.use_augment:
-                                # t = random.randint(0, 10)
-                                # for _ in range(t):
-                                #     center_point_idx = random.randint(0, pc.shape[0] - 1)
-                                #     dist = pc[center_point_idx, 2] / 2 * 0.20
-                                #     width = random.random() * dist
-                                #     height = random.random() * dist
-                                #     condition = (np.array(pc[:, 0] > (pc[center_point_idx, 0] + width / 2)) | np.array(pc[:, 0] < (pc[center_point_idx, 0] - width / 2))) | \
-                                #                 (np.array(pc[:, 1] > (pc[center_point_idx, 1] + height / 2)) | np.array(pc[:, 1] < (pc[center_point_idx, 1] - height / 2)))
-                                #     condition = np.logical_not(condition)
-                                #     replace = np.random.uniform(-2, 2, 3)
-                                #     replace[2] = np.random.uniform(0, 2)
-                                #     pc[condition, :3] *= replace
-
-                                t = random.randint(0, 200)
-                                indexs = np.random.randint(0, pc.shape[0], t)
-                                replace = np.random.uniform(0, 1, (t, 6))
-                                replace[:, :2] = np.random.uniform(-1, 1, (t, 2))
-                                replace[:, :3] *= 2
-                                replace[:, 3:] *= 255
-                                pc[indexs, :] = replace
-                                # pc[indexs, :] *= np.random.uniform(0, 1, (t, 6))
-
-                                t = random.randint(0, 1000)
-                                indexs = np.random.randint(0, pc.shape[0], t)
-                                replace = np.random.uniform(0, 2, (t, 3))
-                                replace[:, 1] = replace[:, 0]
-                                replace[:, 2] = replace[:, 0]
-                                pc[indexs, 3:] *= replace
-                                pc[indexs, 3:] = np.clip(pc[indexs, 3:], 0, 255)
-
-                                t = random.randint(0, 200)
-                                indexs = np.random.randint(0, pc.shape[0], t)
-                                pc[indexs, 3:] = np.random.uniform(0, 1, (t, 3)) * 255
-                                # pc[indexs, 3:] *= np.random.uniform(0, 1, (t, 3))
-
-                            f.write(time + ".npy\n")
-                            np.save(os.path.join(self.cameraPointCloudNormDirs[i], time + ".npy"), pc)
+                # 外参只在每个相机开始时读取一次
+                _, color_extrinsic = load_camera_config(self.cameraColorConfigDirs[i])
+                _, point_cloud_extrinsic = load_camera_config(self.cameraPointCloudConfigDirs[i])
+                point_cloud_transform = get_relative_transform(color_extrinsic, point_cloud_extrinsic)
+                lines = read_sync_lines(sync_index, self.cameraPointCloudDirs[i][len(self.episodeDir)+1:], self.cameraPointCloudSyncDirs[i])
+                frames = [(i, j, line[:-4], "load_point_cloud_frame", (os.path.join(self.cameraPointCloudDirs[i], line), point_cloud_transform, self.args.cameraMaxDistances[i], self.args.cameraVoxelSizes[i]))
+                          for j, (line, _) in enumerate(lines)]
             else:
                 os.system(f"cp {self.cameraDepthConfigDirs[i]} {self.cameraPointCloudNormConfigDirs[i]}")
-                with open(self.cameraColorConfigDirs[i], 'r') as color_config_file:
-                    data = json.load(color_config_file)
-                    color_intrinsic = np.array(data["K"]).reshape(3, 3)
-                    color_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-                    with open(self.cameraDepthConfigDirs[i], 'r') as depth_config_file:
-                        data = json.load(depth_config_file)
-                        depth_intrinsic = np.array(data["K"]).reshape(3, 3)
-                        depth_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-                        with open(self.cameraColorSyncDirs[i], 'r') as color_lines:
-                            with open(self.cameraDepthSyncDirs[i], 'r') as depth_lines:
-                                with open(self.cameraPointCloudNormSyncDirs[i], "w") as f:
-                                    for color_line, depth_line in zip(color_lines, depth_lines):
-                                        color_line = color_line.rstrip()
-                                        depth_line = depth_line.rstrip()
-                                        time = depth_line[:-4]
-                                        print(os.path.join(self.cameraDepthDirs[i], depth_line))
-                                        point_cloud = color_depth_to_point_cloud(os.path.join(self.cameraColorDirs[i], color_line), os.path.join(self.cameraDepthDirs[i], depth_line), color_intrinsic, depth_intrinsic, color_extrinsic, depth_extrinsic)
-                                        if self.args.voxelSize != 0:
-                                            pcd = o3d.geometry.PointCloud()
-                                            pcd.points = o3d.utility.Vector3dVector(point_cloud[:, :3])
-                                            pcd.colors = o3d.utility.Vector3dVector(point_cloud[:, 3:] / 255.0)
-                                            # o3d.io.write_point_cloud(
-                                            #     os.path.join(self.cameraPointCloudNormDirs[i], time + ".pcd"), pcd)
-                                            downsampled_cloud = pcd.voxel_down_sample(self.args.voxelSize)
-                                            if self.args.use_farthest_point_down_sample and len(
-                                                    downsampled_cloud.points) > self.args.pointNum:
-                                                downsampled_cloud = downsampled_cloud.farthest_point_down_sample(self.args.pointNum)
-
-                                            downsampled_cloud.colors = o3d.utility.Vector3dVector(
-                                                (np.asarray(downsampled_cloud.colors) * 255).astype(np.float64))
-                                            pc = np.concatenate([downsampled_cloud.points, downsampled_cloud.colors], axis=-1)
-                                            condition = pc[:, 2] < 2
-                                            pc = pc[condition, :]
-
-                                            if pc.shape[0] > self.args.pointNum:
-                                                idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
-                                                pc = pc[idxs]
-                                            elif pc.shape[0] < self.args.pointNum:
-                                                if pc.shape[0] == 0:
-                                                    pc = np.zeros([1, 4], dtype=np.float32)
-                                                idxs1 = np.arange(pc.shape[0])
-                                                idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
-                                                                         replace=True)
-                                                idxs = np.concatenate([idxs1, idxs2], axis=0)
-                                                pc = pc[idxs]
-                                        else:
-                                            pc = point_cloud
-                                            condition = pc[:, 2] < 2
-                                            pc = pc[condition, :]
-                                            if pc.shape[0] >= self.args.pointNum:
-                                                idxs = np.random.choice(pc.shape[0], self.args.pointNum, replace=False)
-                                            elif pc.shape[0] < self.args.pointNum:
-                                                if pc.shape[0] == 0:
-                                                    pc = np.zeros([1, 4], dtype=np.float32)
-                                                idxs1 = np.arange(pc.shape[0])
-                                                idxs2 = np.random.choice(pc.shape[0], self.args.pointNum - pc.shape[0],
-                                                                         replace=True)
-                                                idxs = np.concatenate([idxs1, idxs2], axis=0)
-                                            pc = pc[idxs]
-                                        if self.args.use_augment:
-                                            # t = random.randint(0, 10)
-                                            # for _ in range(t):
-                                            #     center_point_idx = random.randint(0, pc.shape[0] - 1)
-                                            #     dist = pc[center_point_idx, 2] / 2 * 0.20
-                                            #     width = random.random() * dist
-                                            #     height = random.random() * dist
-                                            #     condition = (np.array(pc[:, 0] > (pc[center_point_idx, 0] + width / 2)) | np.array(pc[:, 0] < (pc[center_point_idx, 0] - width / 2))) | \
-                                            #                 (np.array(pc[:, 1] > (pc[center_point_idx, 1] + height / 2)) | np.array(pc[:, 1] < (pc[center_point_idx, 1] - height / 2)))
-                                            #     condition = np.logical_not(condition)
-                                            #     replace = np.random.uniform(-2, 2, 3)
-                                            #     replace[2] = np.random.uniform(0, 2)
-                                            #     pc[condition, :3] *= replace
-
-                                            t = random.randint(0, 200)
-                                            indexs = np.random.randint(0, pc.shape[0], t)
-                                            replace = np.random.uniform(0, 1, (t, 6))
-                                            replace[:, :2] = np.random.uniform(-1, 1, (t, 2))
-                                            replace[:, :3] *= 2
-                                            replace[:, 3:] *= 255
-                                            pc[indexs, :] = replace
-                                            # pc[indexs, :] *= np.random.uniform(0, 1, (t, 6))
-
-                                            t = random.randint(0, 1000)
-                                            indexs = np.random.randint(0, pc.shape[0], t)
-                                            replace = np.random.uniform(0, 2, (t, 3))
-                                            replace[:, 1] = replace[:, 0]
-                                            replace[:, 2] = replace[:, 0]
-                                            pc[indexs, 3:] *= replace
-                                            pc[indexs, 3:] = np.clip(pc[indexs, 3:], 0, 255)
-
-                                            t = random.randint(0, 200)
-                                            indexs = np.random.randint(0, pc.shape[0], t)
-                                            pc[indexs, 3:] = np.random.uniform(0, 1, (t, 3)) * 255
-                                            # pc[indexs, 3:] *= np.random.uniform(0, 1, (t, 3))
-
-                                        f.write(time + ".npy\n")
-                                        np.save(os.path.join(self.cameraPointCloudNormDirs[i], time + ".npy"), pc)
+                # 内外参只在每个相机开始时读取一次，反投影查找表在第一帧建立
+                geometry = CameraGeometry.from_config(self.cameraColorConfigDirs[i], self.cameraDepthConfigDirs[i])
+                color_lines = read_sync_lines(sync_index, self.cameraColorDirs[i][len(self.episodeDir)+1:], self.cameraColorSyncDirs[i])
+                depth_lines = read_sync_lines(sync_index, self.cameraDepthDirs[i][len(self.episodeDir)+1:], self.cameraDepthSyncDirs[i])
+                frames = [(i, j, depth_line[:-4], "load_depth_frame", (os.path.join(self.cameraColorDirs[i], color_line), os.path.join(self.cameraDepthDirs[i], depth_line), geometry, self.args.cameraMaxDistances[i], self.args.cameraVoxelSizes[i]))
+                          for j, ((color_line, _), (depth_line, _)) in enumerate(zip(color_lines, depth_lines))]
+            if self.args.useTensorOutput:
+                # 预分配整个 episode 的 (帧数, pointNum, 6) 张量和时间戳，帧结果按行写入
+                create_point_cloud_tensor(self.cameraPointCloudNormDirs[i], [float(frame[2]) for frame in frames], self.args.pointNum, self.args.tensorDtype).flush()
+            times = self.process_frames(frames)
+            if self.args.useTensorOutput and frames:
+                open_point_cloud_tensor(os.path.join(self.cameraPointCloudNormDirs[i], POINT_CLOUD_TENSOR_FILE), 'r+').flush()
+                open_point_cloud_tensor.cache_clear()
+            # 各帧结果全部保存后按 sync.txt 顺序写入索引
+            with open(self.cameraPointCloudNormSyncDirs[i], "w") as f:
+                for time in times:
+                    f.write(time + ".npy\n")
+
+
+def get_camera_limit(point_cloud_info, key, name, default):
+    # 配置中 camera/pointCloud 的 maxDistances、downSizes 按相机名对应，未配置或为 0 时使用命令行参数
+    names = point_cloud_info.get('names') or []
+    values = point_cloud_info.get(key) or []
+    if name in names and names.index(name) < len(values) and values[names.index(name)] != 0:
+        return float(values[names.index(name)])
+    return default
+
+
+worker_operator = None
+
+
+def init_frame_worker(operator):
+    global worker_operator
+    worker_operator = operator
+
+
+def process_frame_in_worker(frame):
+    return worker_operator.process_frame(frame)
 
 
 def get_arguments():
@@ -387,10 +220,20 @@ def get_arguments():
                         default=5000, required=False)
     parser.add_argument('--voxelSize', action='store', type=float, help='voxelSize',
                         default=0.01, required=False)
+    parser.add_argument('--maxDistance', action='store', type=float, help='maxDistance, 0 for no crop',
+                        default=2, required=False)
     parser.add_argument('--use_farthest_point_down_sample', action='store', type=bool, help='use_farthest_point_down_sample',
                         default=False, required=False)
     parser.add_argument('--use_augment', action='store', type=bool, help='use_augment',
                         default=False, required=False)
+    parser.add_argument('--workers', action='store', type=int, help='workers',
+                        default=1, required=False)
+    parser.add_argument('--seed', action='store', type=int, help='seed',
+                        default=0, required=False)
+    parser.add_argument('--useTensorOutput', action='store', type=bool, help='useTensorOutput',
+                        default=False, required=False)
+    parser.add_argument('--tensorDtype', action='store', type=str, help='tensorDtype: float32 or float16',
+                        choices=['float32', 'float16'], default='float32', required=False)
     parser.add_argument('--cameraNames', action='store', type=str, help='cameraNames',
                         default=[], required=False)
     args = parser.parse_args()
@@ -398,6 +241,9 @@ def get_arguments():
     with open(f'../config/{args.type}_data_params.yaml', 'r') as file:
         yaml_data = yaml.safe_load(file)
         args.cameraNames = yaml_data['dataInfo']['camera']['depth']['names']
+        point_cloud_info = yaml_data['dataInfo']['camera'].get('pointCloud') or {}
+        args.cameraMaxDistances = [get_camera_limit(point_cloud_info, 'maxDistances', name, args.maxDistance) for name in args.cameraNames]
+        args.cameraVoxelSizes = [get_camera_limit(point_cloud_info, 'downSizes', name, args.voxelSize) for name in args.cameraNames]
 
     return args
 
@@ -406,7 +252,7 @@ def main():
     args = get_arguments()
     if args.episodeName == "":
         for f in os.listdir(args.datasetDir):
-            if not f.endswith(".tar.gz"):
+            if not f.endswith(".tar.gz") and os.path.isdir(os.path.join(args.datasetDir, f)):
                 args.episodeName = f
                 print("episode name: ", args.episodeName, "processing")
                 operator = Operator(args)
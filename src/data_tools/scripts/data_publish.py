@@ -32,6 +32,8 @@ from tf.transformations import quaternion_from_euler
 # import pcl
 import ros_numpy
 import yaml
+from hdf5_image import read_image
+from point_cloud_io import read_point_cloud
 USELIFT = False
 if USELIFT:
     from bt_task_msgs.msg import LiftMotorMsg
@@ -62,6 +64,27 @@ def pcd_to_msg(points):
     return ros_numpy.point_cloud2.array_to_pointcloud2(points, stamp=rospy.Time.now(), frame_id="camera")
 
 
+def to_xyzrgb_points(pc):
+    # 颜色列打包为 ros 点云的 uint32 rgb 字段
+    rgb = (pc[:, 3]).astype(np.uint32)*(2**16) + (pc[:, 4]).astype(np.uint32)*(2**8) + (pc[:, 5]).astype(np.uint32)
+    dtype = [('x', np.float32), ('y', np.float32), ('z', np.float32), ('rgb', np.uint32)]
+    points = np.zeros(rgb.shape[0], dtype=dtype)
+    points['x'] = pc[:, 0]
+    points['y'] = pc[:, 1]
+    points['z'] = pc[:, 2]
+    points['rgb'] = rgb
+    return points
+
+
+def to_xyz_points(pc):
+    dtype = [('x', np.float32), ('y', np.float32), ('z', np.float32)]
+    points = np.zeros(pc.shape[0], dtype=dtype)
+    points['x'] = pc[:, 0]
+    points['y'] = pc[:, 1]
+    points['z'] = pc[:, 2]
+    return points
+
+
 # 保存数据函数
 def process_data(args, ros_operator):
     episode_dir = os.path.join(args.datasetDir, args.episodeName)
@@ -75,37 +98,12 @@ def process_data(args, ros_operator):
             while not rospy.is_shutdown():
                 i = args.publishIndex
                 for j in range(len(args.camera_color_names)):
-                    if root[f'/camera/color/{args.camera_color_names[j]}'].ndim == 1:
-                        ros_operator.publish_camera_color(j, cv2.imread(os.path.join(episode_dir, root[f'/camera/color/{args.camera_color_names[j]}'][i].decode('utf-8')), cv2.IMREAD_UNCHANGED))
-                    else:
-                        ros_operator.publish_camera_color(j, root[f'/camera/color/{args.camera_color_names[j]}'][i])
+                    ros_operator.publish_camera_color(j, read_image(root[f'/camera/color/{args.camera_color_names[j]}'], i, episode_dir))
                 for j in range(len(args.camera_depth_names)):
-                    if root[f'/camera/depth/{args.camera_depth_names[j]}'].ndim == 1:
-                        ros_operator.publish_camera_depth(j, cv2.imread(os.path.join(episode_dir, root[f'/camera/depth/{args.camera_depth_names[j]}'][i].decode('utf-8')), cv2.IMREAD_UNCHANGED))
-                    else:
-                        ros_operator.publish_camera_depth(j, root[f'/camera/depth/{args.camera_depth_names[j]}'][i])
+                    ros_operator.publish_camera_depth(j, read_image(root[f'/camera/depth/{args.camera_depth_names[j]}'], i, episode_dir))
                 for j in range(len(args.camera_point_cloud_names)):
-                    if f'/lidar/pointCloud/{args.camera_point_cloud_names[j]}' in root.keys():
-                        if root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'].ndim == 1 and root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'pcd':
-                            # ros_operator.publish_camera_point_cloud(j, pcl.load_XYZRGB(os.path.join(episode_dir, root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8'))).to_array())
-                            print('Not support pcd format for camera point cloud yet.')
-                        else:
-                            if root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'].ndim == 1 and root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'npy':
-                                pc = np.load(os.path.join(episode_dir, root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')))
-                            else:
-                                pc = root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i]
-                            rgb = (pc[:, 3]).astype(np.uint32)*(2**16) + (pc[:, 4]).astype(np.uint32)*(2**8) + (pc[:, 5]).astype(np.uint32)
-                            dtype = [('x', np.float32), ('y', np.float32), ('z', np.float32), ('rgb', np.uint32)]
-                            points = np.zeros(rgb.shape[0], dtype=dtype)
-                            points['x'] = pc[:, 0]
-                            points['y'] = pc[:, 1]
-                            points['z'] = pc[:, 2]
-                            points['rgb'] = rgb
-                            # pc[:, 3] = rgb
-                            # rgb = rgb[:, np.newaxis]
-                            # pc = np.concatenate([pc[:, :3], rgb], axis=1).astype(np.float32)
-                            # print(pc)
-                            ros_operator.publish_camera_point_cloud(j, points)
+                    if f'camera/pointCloud/{args.camera_point_cloud_names[j]}' in root:
+                        ros_operator.publish_camera_point_cloud(j, to_xyzrgb_points(read_point_cloud(root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'], i, episode_dir)))
                 for j in range(len(args.arm_joint_state_names)):
                     ros_operator.publish_arm_joint_state(j, root[f'/arm/jointStatePosition/{args.arm_joint_state_names[j]}'][i])
                 for j in range(len(args.arm_end_pose_names)):
@@ -117,20 +115,8 @@ def process_data(args, ros_operator):
                 for j in range(len(args.imu_9axis_names)):
                     ros_operator.publish_imu_9axis(j, root[f'/imu/9axisOrientation/{args.imu_9axis_names[j]}'][i], root[f'/imu/9axisAngularVelocity/{args.imu_9axis_names[j]}'][i], root[f'/imu/9axisLinearAcceleration/{args.imu_9axis_names[j]}'][i])
                 for j in range(len(args.lidar_point_cloud_names)):
-                    if f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}' in root.keys():
-                        if root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'].ndim == 1 and root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'pcd':
-                            # ros_operator.publish_lidar_point_cloud(j, pcl.load_XYZI(os.path.join(episode_dir, root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8'))).to_array())
-                            print('Not support pcd format for lidar point cloud yet.')
-                        else:
-                            if root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'].ndim == 1 and root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'npy':
-                                pc = np.load(os.path.join(episode_dir, root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')))
-                            else:
-                                pc = root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i]
-                            points = np.zeros(rgb.shape[0], dtype=dtype)
-                            points['x'] = pc[:, 0]
-                            points['y'] = pc[:, 1]
-                            points['z'] = pc[:, 2]
-                            ros_operator.publish_lidar_point_cloud(j, points)
+                    if f'lidar/pointCloud/{args.lidar_point_cloud_names[j]}' in root:
+                        ros_operator.publish_lidar_point_cloud(j, to_xyz_points(read_point_cloud(root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'], i, episode_dir)))
                 for j in range(len(args.robot_base_vel_names)):
                     ros_operator.publish_robot_base_vel(j, root[f'/robotBase/vel/{args.robot_base_vel_names[j]}'][i])
                 for j in range(len(args.lift_motor_names)):
@@ -142,37 +128,12 @@ def process_data(args, ros_operator):
                 if rospy.is_shutdown():
                     return
                 for j in range(len(args.camera_color_names)):
-                    if root[f'/camera/color/{args.camera_color_names[j]}'].ndim == 1:
-                        ros_operator.publish_camera_color(j, cv2.imread(os.path.join(episode_dir, root[f'/camera/color/{args.camera_color_names[j]}'][i].decode('utf-8')), cv2.IMREAD_UNCHANGED))
-                    else:
-                        ros_operator.publish_camera_color(j, root[f'/camera/color/{args.camera_color_names[j]}'][i])
+                    ros_operator.publish_camera_color(j, read_image(root[f'/camera/color/{args.camera_color_names[j]}'], i, episode_dir))
                 for j in range(len(args.camera_depth_names)):
-                    if root[f'/camera/depth/{args.camera_depth_names[j]}'].ndim == 1:
-                        ros_operator.publish_camera_depth(j, cv2.imread(os.path.join(episode_dir, root[f'/camera/depth/{args.camera_depth_names[j]}'][i].decode('utf-8')), cv2.IMREAD_UNCHANGED))
-                    else:
-                        ros_operator.publish_camera_depth(j, root[f'/camera/depth/{args.camera_depth_names[j]}'][i])
+                    ros_operator.publish_camera_depth(j, read_image(root[f'/camera/depth/{args.camera_depth_names[j]}'], i, episode_dir))
                 for j in range(len(args.camera_point_cloud_names)):
-                    if f'/lidar/pointCloud/{args.camera_point_cloud_names[j]}' in root.keys():
-                        if root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'].ndim == 1 and root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'pcd':
-                            # ros_operator.publish_camera_point_cloud(j, pcl.load_XYZRGB(os.path.join(episode_dir, root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8'))).to_array())
-                            print('Not support pcd format for camera point cloud yet.')
-                        else:
-                            if root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'].ndim == 1 and root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'npy':
-                                pc = np.load(os.path.join(episode_dir, root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i].decode('utf-8')))
-                            else:
-                                pc = root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'][i]
-                            rgb = (pc[:, 3]).astype(np.uint32)*(2**16) + (pc[:, 4]).astype(np.uint32)*(2**8) + (pc[:, 5]).astype(np.uint32)
-                            dtype = [('x', np.float32), ('y', np.float32), ('z', np.float32), ('rgb', np.uint32)]
-                            points = np.zeros(rgb.shape[0], dtype=dtype)
-                            points['x'] = pc[:, 0]
-                            points['y'] = pc[:, 1]
-                            points['z'] = pc[:, 2]
-                            points['rgb'] = rgb
-                            # pc[:, 3] = rgb
-                            # rgb = rgb[:, np.newaxis]
-                            # pc = np.concatenate([pc[:, :3], rgb], axis=1).astype(np.float32)
-                            # print(pc)
-                            ros_operator.publish_camera_point_cloud(j, points)
+                    if f'camera/pointCloud/{args.camera_point_cloud_names[j]}' in root:
+                        ros_operator.publish_camera_point_cloud(j, to_xyzrgb_points(read_point_cloud(root[f'/camera/pointCloud/{args.camera_point_cloud_names[j]}'], i, episode_dir)))
                 for j in range(len(args.arm_joint_state_names)):
                     ros_operator.publish_arm_joint_state(j, root[f'/arm/jointStatePosition/{args.arm_joint_state_names[j]}'][i])
                 for j in range(len(args.arm_end_pose_names)):
@@ -184,20 +145,8 @@ def process_data(args, ros_operator):
                 for j in range(len(args.imu_9axis_names)):
                     ros_operator.publish_imu_9axis(j, root[f'/imu/9axisOrientation/{args.imu_9axis_names[j]}'][i], root[f'/imu/9axisAngularVelocity/{args.imu_9axis_names[j]}'][i], root[f'/imu/9axisLinearAcceleration/{args.imu_9axis_names[j]}'][i])
                 for j in range(len(args.lidar_point_cloud_names)):
-                    if f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}' in root.keys():
-                        if root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'].ndim == 1 and root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'pcd':
-                            # ros_operator.publish_lidar_point_cloud(j, pcl.load_XYZI(os.path.join(episode_dir, root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8'))).to_array())
-                            print('Not support pcd format for lidar point cloud yet.')
-                        else:
-                            if root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'].ndim == 1 and root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')[-3:] == 'npy':
-                                pc = np.load(os.path.join(episode_dir, root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i].decode('utf-8')))
-                            else:
-                                pc = root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'][i]
-                            points = np.zeros(rgb.shape[0], dtype=dtype)
-                            points['x'] = pc[:, 0]
-                            points['y'] = pc[:, 1]
-                            points['z'] = pc[:, 2]
-                            ros_operator.publish_lidar_point_cloud(j, points)
+                    if f'lidar/pointCloud/{args.lidar_point_cloud_names[j]}' in root:
+                        ros_operator.publish_lidar_point_cloud(j, to_xyz_points(read_point_cloud(root[f'/lidar/pointCloud/{args.lidar_point_cloud_names[j]}'], i, episode_dir)))
                 for j in range(len(args.robot_base_vel_names)):
                     ros_operator.publish_robot_base_vel(j, root[f'/robotBase/vel/{args.robot_base_vel_names[j]}'][i])
                 for j in range(len(args.lift_motor_names)):
@@ -7,13 +7,20 @@ converted from the original C++ ROS implementation.
 """
 
 import os
+import io
 import sys
+import contextlib
 import argparse
 import yaml
 import json
 import math
+import time
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List, Dict, Tuple, Optional
+from sync_index import SYNC_INDEX_FILE, save_sync_index
+from sync_report import SYNC_REPORT_FILE, build_sync_report, nearest_diff, save_sync_report
+from sync_interpolation import is_interpolated_topic, bracket_samples, load_topic_samples, interpolate_samples
 
 
 class TimeSeries:
@@ -32,6 +39,11 @@ class TimeSeries:
         self.sync_list.append(self)
 
 
+def format_sync_lines(times: List[float], ext: str) -> str:
+    """将同步时间戳格式化为 sync.txt 文件内容"""
+    return "".join(f"{time:.6f}{ext}\n" for time in times)
+
+
 class Operator:
     """数据同步器"""
     
@@ -63,6 +75,11 @@ class Operator:
         self.robot_base_vel_dirs = [os.path.join(self.episode_dir, "robotBase/vel", name) for name in self.args.robotBaseVelNames]
         self.lift_motor_dirs = [os.path.join(self.episode_dir, "lift/motor", name) for name in self.args.liftMotorNames]
 
+        # 增量同步清单
+        self.manifest_path = os.path.join(self.episode_dir, "sync_manifest.npz")
+        self.sync_index_path = os.path.join(self.episode_dir, SYNC_INDEX_FILE)
+        self.sync_report_path = os.path.join(self.episode_dir, SYNC_REPORT_FILE)
+
     def init_time_series(self):
         """初始化时间序列存储结构"""
         # 数据时间序列
@@ -104,6 +121,35 @@ class Operator:
         self.robot_base_vel_exts = [".json"] * len(self.args.robotBaseVelNames)
         self.lift_motor_exts = [".json"] * len(self.args.liftMotorNames)
 
+    def get_topics(self) -> List[Dict]:
+        """按 load_all_time_series 的加载顺序列出所有数据源"""
+        groups = [
+            ("camera/color", "Camera color", self.args.cameraColorNames, self.camera_color_dirs, self.camera_color_exts, self.camera_color_sync_time_series, [".jpg", ".png"]),
+            ("camera/depth", "Camera depth", self.args.cameraDepthNames, self.camera_depth_dirs, self.camera_depth_exts, self.camera_depth_sync_time_series, [".png"]),
+            ("camera/pointCloud", "Camera point cloud", self.args.cameraPointCloudNames, self.camera_point_cloud_dirs, self.camera_point_cloud_exts, self.camera_point_cloud_sync_time_series, [".pcd"]),
+            ("arm/jointState", "Arm joint state", self.args.armJointStateNames, self.arm_joint_state_dirs, self.arm_joint_state_exts, self.arm_joint_state_sync_time_series, [".json"]),
+            ("arm/endPose", "Arm end pose", self.args.armEndPoseNames, self.arm_end_pose_dirs, self.arm_end_pose_exts, self.arm_end_pose_sync_time_series, [".json"]),
+            ("localization/pose", "Localization pose", self.args.localizationPoseNames, self.localization_pose_dirs, self.localization_pose_exts, self.localization_pose_sync_time_series, [".json"]),
+            ("gripper/encoder", "Gripper encoder", self.args.gripperEncoderNames, self.gripper_encoder_dirs, self.gripper_encoder_exts, self.gripper_encoder_sync_time_series, [".json"]),
+            ("imu/9axis", "IMU 9-axis", self.args.imu9AxisNames, self.imu_9axis_dirs, self.imu_9axis_exts, self.imu_9axis_sync_time_series, [".json"]),
+            ("lidar/pointCloud", "Lidar point cloud", self.args.lidarPointCloudNames, self.lidar_point_cloud_dirs, self.lidar_point_cloud_exts, self.lidar_point_cloud_sync_time_series, [".json"]),
+            ("robotBase/vel", "Robot base velocity", self.args.robotBaseVelNames, self.robot_base_vel_dirs, self.robot_base_vel_exts, self.robot_base_vel_sync_time_series, [".json"]),
+            ("lift/motor", "Lift motor", self.args.liftMotorNames, self.lift_motor_dirs, self.lift_motor_exts, self.lift_motor_sync_time_series, [".json"]),
+        ]
+        topics = []
+        for key, label, names, dirs, exts, sync_series, candidate_exts in groups:
+            for i, name in enumerate(names):
+                topics.append({
+                    "key": f"{key}/{name}",
+                    "label": f"{label} {name}",
+                    "dir": dirs[i],
+                    "exts": exts,
+                    "index": i,
+                    "sync_series": sync_series[i],
+                    "candidate_exts": candidate_exts,
+                })
+        return topics
+
     def get_files_in_path(self, path: str, ext: str, data_list: List, sync_list: List) -> int:
         """获取指定路径下指定扩展名的文件，并按时间戳排序"""
         count = 0
@@ -304,12 +350,10 @@ class Operator:
         
         return closest_index, closest_diff
 
-    def sync(self):
-        """执行数据同步"""
+    def sync_legacy(self) -> int:
+        """逐帧线性扫描的原始同步实现，返回同步帧数"""
         frame_count = 0
         
-        print(f"All time series: {len(self.all_time_series)}")
-        
         for time_series in self.all_time_series:
             time_series.to_data_list()
             frame_time = self.check_data_adequacy()
@@ -533,12 +577,20 @@ class Operator:
                     
                     frame_count += 1
 
+        return frame_count
+
+    def sync(self):
+        """执行数据同步"""
+        print(f"All time series: {len(self.all_time_series)}")
+        frame_count = self.sync_legacy()
+
         print(f"Sync frame num: {frame_count}")
         if frame_count == 0:
             self.check_data_adequacy(True)
 
         # 写入同步文件
         self.write_sync_files()
+        return frame_count
 
     def write_sync_files(self):
         """写入同步文件"""
@@ -631,9 +683,312 @@ class Operator:
                 for time_series in self.lift_motor_sync_time_series[i]:
                     f.write(f"{time_series.time:.6f}{self.lift_motor_exts[i]}\n")
 
-    def process(self):
+    def list_topic_times(self, path: str, ext: str) -> np.ndarray:
+        """获取指定路径下指定扩展名文件的时间戳数组"""
+        if not os.path.exists(path):
+            print(f"Warning: Directory {path} does not exist")
+            return np.zeros(0, dtype=np.float64)
+        times = []
+        for filename in os.listdir(path):
+            if filename.endswith(ext):
+                try:
+                    times.append(float(filename[:filename.rfind(".")]))
+                except ValueError:
+                    continue
+        return np.array(times, dtype=np.float64)
+
+    def get_dir_mtime(self, path: str) -> int:
+        """获取目录修改时间 (纳秒)，目录不存在时返回 -1"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return -1
+
+    def load_manifest(self) -> Optional[Dict]:
+        """读取上次同步保存的清单，不存在或损坏时返回 None"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with np.load(self.manifest_path, allow_pickle=False) as data:
+                manifest = json.loads(str(data["meta"]))
+                for i, topic in enumerate(manifest["topics"]):
+                    topic["times"] = data[f"times_{i}"]
+            return manifest
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: ignore invalid manifest {self.manifest_path}: {e}")
+            return None
+
+    def save_manifest(self, frame_count: int):
+        """保存各数据源目录的修改时间、文件数和时间戳数组，供下次增量同步使用"""
+        meta = {
+            "timeDiffLimit": self.args.timeDiffLimit,
+            "syncMode": self.args.syncMode,
+            "interpolationGapLimit": self.args.interpolationGapLimit,
+            "frameCount": frame_count,
+            "topics": [{
+                "key": topic["key"],
+                "ext": topic["exts"][topic["index"]],
+                "mtime": self.get_dir_mtime(topic["dir"]),
+                "count": int(times.size),
+            } for topic, times in zip(self.topics, self.topic_times)],
+        }
+        arrays = {f"times_{i}": times for i, times in enumerate(self.topic_times)}
+        tmp_path = self.manifest_path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_manifest_up_to_date(self, manifest: Optional[Dict]) -> bool:
+        """判断 episode 自上次同步后是否未发生变化"""
+        if manifest is None or manifest["timeDiffLimit"] != self.args.timeDiffLimit:
+            return False
+        if manifest.get("syncMode", "nearest") != self.args.syncMode or \
+                manifest.get("interpolationGapLimit") != self.args.interpolationGapLimit:
+            return False
+        if [topic["key"] for topic in manifest["topics"]] != [topic["key"] for topic in self.topics]:
+            return False
+        for cached, topic in zip(manifest["topics"], self.topics):
+            if cached["mtime"] != self.get_dir_mtime(topic["dir"]):
+                return False
+            if not os.path.exists(os.path.join(topic["dir"], "sync.txt")):
+                return False
+        if self.args.syncReport and not os.path.exists(self.sync_report_path):
+            return False
+        return os.path.exists(self.sync_index_path)
+
+    def load_topic_times(self, manifest: Optional[Dict] = None):
+        """加载各数据源的有序时间戳数组，目录未变化时复用清单中缓存的数组"""
+        self.topics = self.get_topics()
+        self.topic_times = []
+        cached_topics = {cached["key"]: cached for cached in manifest["topics"]} if manifest is not None else {}
+        for topic in self.topics:
+            cached = cached_topics.get(topic["key"])
+            if cached is not None and cached["mtime"] != -1 and cached["mtime"] == self.get_dir_mtime(topic["dir"]) \
+                    and cached["count"] == cached["times"].size:
+                topic["exts"][topic["index"]] = cached["ext"]
+                self.topic_times.append(cached["times"])
+                continue
+            candidate_exts = topic["candidate_exts"]
+            times = self.list_topic_times(topic["dir"], candidate_exts[0])
+            for ext in candidate_exts[1:]:
+                if times.size > 0:
+                    break
+                times = self.list_topic_times(topic["dir"], ext)
+                if times.size > 0:
+                    topic["exts"][topic["index"]] = ext
+            self.topic_times.append(np.sort(times, kind='stable'))
+
+    def sync_vectorized(self) -> int:
+        """基于有序时间戳数组和 searchsorted 的批量同步，结果与 sync_legacy 一致，返回同步帧数"""
+        print(f"All time series: {sum(t.size for t in self.topic_times)}")
+        self.topic_sync_indices, self.frame_reference_times = self.match_nearest(self.topic_times)
+        self.interpolated_data = {}
+        return self.frame_reference_times.size
+
+    def match_nearest(self, times: List[np.ndarray]) -> Tuple[List[np.ndarray], np.ndarray]:
+        """按最近邻规则同步给定的有序时间戳数组，返回各数据源的帧索引和每帧参考时间"""
+        num_topics = len(times)
+        empty = ([np.zeros(0, dtype=np.int64) for _ in range(num_topics)], np.zeros(0, dtype=np.float64))
+        if num_topics == 0 or any(t.size == 0 for t in times):
+            return empty
+
+        # 按与 load_all_time_series 相同的稳定排序合并所有数据到达事件
+        event_topics = np.repeat(np.arange(num_topics), [t.size for t in times])
+        event_topics = event_topics[np.argsort(np.concatenate(times), kind='stable')]
+        num_events = event_topics.size
+
+        # counts[g, k]: 第 g 个事件到达后第 k 个数据源已到达的帧数
+        counts = np.empty((num_events, num_topics), dtype=np.int64)
+        for k in range(num_topics):
+            np.cumsum(event_topics == k, out=counts[:, k])
+        first_event = int(np.argmax(np.all(counts > 0, axis=1)))
+
+        # 参考时间: 各数据源最新一帧时间戳中的最小值 (即 check_data_adequacy 的返回值)
+        frame_times = np.full(num_events, np.inf)
+        for k, t in enumerate(times):
+            np.minimum(frame_times, t[np.maximum(counts[:, k] - 1, 0)], out=frame_times)
+
+        # closest[g, k]: 不考虑已消费数据时，第 k 个数据源中距参考时间最近的首个索引
+        closest = np.empty((num_events, num_topics), dtype=np.int64)
+        for k, t in enumerate(times):
+            right = np.minimum(np.searchsorted(t, frame_times, side='left'), t.size - 1)
+            left = np.maximum(right - 1, 0)
+            use_left = (right > 0) & (np.abs(t[left] - frame_times) <= np.abs(t[right] - frame_times))
+            closest[:, k] = np.where(use_left, np.searchsorted(t, t[left], side='left'), right)
+
+        # 已消费的数据只在同步成功时变化，按窗口批量寻找下一个同步成功的事件
+        flat_times = np.concatenate(times)
+        offsets = np.cumsum([0] + [t.size for t in times[:-1]])
+        last_indices = np.array([t.size - 1 for t in times])
+        consumed = np.zeros(num_topics, dtype=np.int64)
+        frame_indices = []
+        frame_events = []
+        event = first_event
+        window = 32
+        while event < num_events:
+            end = min(event + window, num_events)
+            indices = np.maximum(closest[event:end], consumed)
+            time_diff = np.abs(flat_times[offsets + np.minimum(indices, last_indices)] - frame_times[event:end, None])
+            time_diff_pass = ((counts[event:end] > consumed) & (time_diff <= self.args.timeDiffLimit)).all(axis=1)
+            passed = time_diff_pass.argmax()
+            if not time_diff_pass[passed]:
+                event = end
+                window = min(window * 2, 65536)
+                continue
+            frame_indices.append(indices[passed])
+            frame_events.append(event + passed)
+            consumed = indices[passed] + 1
+            event += int(passed) + 1
+            window = 32
+
+        if not frame_indices:
+            return empty
+        frame_indices = np.stack(frame_indices)
+        return [frame_indices[:, k] for k in range(num_topics)], frame_times[frame_events]
+
+    def sync_interpolated(self) -> int:
+        """以相机等非插值数据源为参考时钟同步，低维数据源在参考时间处插值，返回同步帧数"""
+        print(f"All time series: {sum(t.size for t in self.topic_times)}")
+        interpolated = [k for k, topic in enumerate(self.topics) if is_interpolated_topic(topic["key"])]
+        reference = [k for k in range(len(self.topics)) if k not in interpolated]
+        if not reference or not interpolated:
+            print("Warning: interpolate sync mode needs both reference and interpolated topics, fall back to nearest sync")
+            return self.sync_vectorized()
+
+        reference_indices, reference_times = self.match_nearest([self.topic_times[k] for k in reference])
+        brackets = {k: bracket_samples(self.topic_times[k], reference_times, self.args.interpolationGapLimit) for k in interpolated}
+        # 任一低维数据源无法插值的参考帧整帧丢弃
+        keep = np.ones(reference_times.size, dtype=bool)
+        for lower, upper, weights, valid in brackets.values():
+            keep &= valid
+        self.frame_reference_times = reference_times[keep]
+        self.topic_sync_indices = [None] * len(self.topics)
+        for j, k in enumerate(reference):
+            self.topic_sync_indices[k] = reference_indices[j][keep]
+
+        self.interpolated_data = {}
+        for k in interpolated:
+            topic = self.topics[k]
+            lower, upper, weights = (array[keep] for array in brackets[k][:3])
+            # sync.txt 中记录距参考时间最近的原始帧，兼容按文件读取的下游
+            self.topic_sync_indices[k] = np.where(weights <= 0.5, lower, upper)
+            # 只读取插值用到的前后两帧数据
+            needed = np.unique(np.concatenate([lower, upper]))
+            ext = topic["exts"][topic["index"]]
+            samples = load_topic_samples(topic["key"], topic["dir"], [f"{time:.6f}{ext}" for time in self.topic_times[k][needed].tolist()])
+            lower_pos = np.searchsorted(needed, lower)
+            upper_pos = np.searchsorted(needed, upper)
+            self.interpolated_data[topic["key"]] = interpolate_samples(
+                topic["key"], {field: values[lower_pos] for field, values in samples.items()},
+                {field: values[upper_pos] for field, values in samples.items()}, weights)
+        print(f"Interpolate sync: {int(keep.sum())} of {reference_times.size} reference frames kept")
+        return self.frame_reference_times.size
+
+    def verify_sync(self):
+        """用原始实现重新同步，并与向量化结果逐字节比对"""
         self.load_all_time_series()
-        self.sync()
+        self.sync_legacy()
+        for k, topic in enumerate(self.topics):
+            ext = topic["exts"][topic["index"]]
+            expected = format_sync_lines([time_series.time for time_series in topic["sync_series"]], ext)
+            actual = format_sync_lines(self.topic_times[k][self.topic_sync_indices[k]].tolist(), ext)
+            if expected != actual:
+                raise RuntimeError(f"Sync verify failed: {topic['label']} differs from legacy sync")
+        print("Sync verify passed")
+
+    def write_topic_sync_files(self):
+        """根据向量化同步结果写入同步文件"""
+        for k, topic in enumerate(self.topics):
+            sync_file_path = os.path.join(topic["dir"], "sync.txt")
+            os.makedirs(os.path.dirname(sync_file_path), exist_ok=True)
+            with open(sync_file_path, 'w') as f:
+                f.write(format_sync_lines(self.topic_times[k][self.topic_sync_indices[k]].tolist(), topic["exts"][topic["index"]]))
+        # 写入 episode 级二进制同步索引，供下游一次性加载
+        save_sync_index(self.episode_dir, [topic["key"] for topic in self.topics], [topic["exts"][topic["index"]] for topic in self.topics],
+                        self.frame_reference_times, self.topic_times, self.topic_sync_indices, self.interpolated_data)
+
+    def write_sync_report(self):
+        """根据同步结果写入同步质量报告，并打印拒绝候选帧最多的数据源"""
+        interpolate = bool(self.interpolated_data)
+        interpolated = [interpolate and is_interpolated_topic(topic["key"]) for topic in self.topics]
+        reference_times = [times for times, flag in zip(self.topic_times, interpolated) if not flag]
+        # 同步帧数不超过帧数最少的参考数据源，以其时间戳作为候选参考帧
+        candidate_times = min(reference_times, key=lambda t: t.size) if reference_times else np.zeros(0)
+        rejected = []
+        for times, flag in zip(self.topic_times, interpolated):
+            if flag:
+                rejected.append(~bracket_samples(times, candidate_times, self.args.interpolationGapLimit)[3])
+            else:
+                rejected.append(nearest_diff(times, candidate_times) > self.args.timeDiffLimit)
+        settings = {
+            "episode": self.args.episodeName,
+            "syncMode": "interpolate" if interpolate else "nearest",
+            "timeDiffLimit": self.args.timeDiffLimit,
+            "interpolationGapLimit": self.args.interpolationGapLimit,
+        }
+        report = build_sync_report(self.topics, self.topic_times, self.topic_sync_indices, self.frame_reference_times,
+                                   candidate_times, rejected, settings)
+        save_sync_report(self.episode_dir, report)
+        if report["topics"]:
+            worst = max(zip(self.topics, report["topics"]), key=lambda item: item[1]["rejectedPercent"])
+            print(f"Sync yield: {report['yield'] * 100:.1f}%, most rejecting topic: {worst[0]['label']} "
+                  f"({worst[1]['rejectedPercent']:.1f}% of candidate frames)")
+
+    def process(self) -> int:
+        if self.args.syncMode == 'interpolate' and self.args.syncEngine != 'vectorized':
+            raise ValueError("interpolate sync mode requires the vectorized sync engine")
+        if self.args.syncEngine == 'legacy':
+            # 原始实现不生成二进制索引和质量报告，删除旧文件以免与新的 sync.txt 不一致
+            for path in (self.sync_index_path, self.sync_report_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.load_all_time_series()
+            return self.sync()
+        manifest = self.load_manifest() if self.args.useSyncManifest else None
+        self.topics = self.get_topics()
+        if self.args.syncEngine != 'verify' and self.is_manifest_up_to_date(manifest):
+            print(f"Sync skipped, episode unchanged since last sync, frame num: {manifest['frameCount']}")
+            return manifest["frameCount"]
+        self.load_topic_times(manifest)
+        frame_count = self.sync_interpolated() if self.args.syncMode == 'interpolate' else self.sync_vectorized()
+        print(f"Sync frame num: {frame_count}")
+        if frame_count == 0:
+            for topic, times in zip(self.topics, self.topic_times):
+                if times.size == 0:
+                    print(f"{topic['label']} has no data")
+        if self.args.syncEngine == 'verify':
+            self.verify_sync()
+        self.write_topic_sync_files()
+        if self.args.syncReport:
+            self.write_sync_report()
+        elif os.path.exists(self.sync_report_path):
+            os.remove(self.sync_report_path)
+        if self.args.useSyncManifest:
+            self.save_manifest(frame_count)
+        return frame_count
+
+
+def sync_episode(args, episode_name: str, quiet: bool = False) -> Dict:
+    """同步单个 episode，返回帧数、耗时和失败原因，异常不会向外抛出"""
+    episode_args = argparse.Namespace(**vars(args))
+    episode_args.episodeName = episode_name
+    result = {"episode": episode_name, "frames": 0, "error": None}
+    start = time.time()
+    try:
+        # 并行时屏蔽各进程的逐步输出，避免与进度信息交错
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            result["frames"] = Operator(episode_args).process()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.time() - start
+    return result
+
+
+def print_episode_result(result: Dict, index: int, total: int):
+    """打印单个 episode 的同步结果"""
+    if result["error"] is None:
+        print(f"[{index}/{total}] episode name: {result['episode']} done, frames: {result['frames']}, elapsed: {result['elapsed']:.2f}s")
+    else:
+        print(f"[{index}/{total}] episode name: {result['episode']} failed: {result['error']}, elapsed: {result['elapsed']:.2f}s")
 
 def get_arguments():
     parser = argparse.ArgumentParser()
@@ -643,6 +998,18 @@ def get_arguments():
                        default="", required=False)
     parser.add_argument('--timeDiffLimit', action='store', type=float, help='timeDiffLimit',
                        default=0.03, required=False)
+    parser.add_argument('--workers', action='store', type=int, help='workers',
+                       default=1, required=False)
+    parser.add_argument('--useSyncManifest', action='store', type=bool, help='useSyncManifest',
+                       default=True, required=False)
+    parser.add_argument('--syncEngine', action='store', type=str, help='syncEngine: vectorized, legacy or verify',
+                       choices=['vectorized', 'legacy', 'verify'], default='vectorized', required=False)
+    parser.add_argument('--syncReport', action='store', type=bool, help='syncReport',
+                       default=True, required=False)
+    parser.add_argument('--syncMode', action='store', type=str, help='syncMode: nearest or interpolate',
+                       choices=['nearest', 'interpolate'], default='nearest', required=False)
+    parser.add_argument('--interpolationGapLimit', action='store', type=float, help='interpolationGapLimit',
+                       default=0.1, required=False)
     parser.add_argument('--type', action='store', type=str, help='type',
                        default='aloha', required=False)
     parser.add_argument('--cameraColorNames', action='store', type=str, help='cameraColorNames',
@@ -691,13 +1058,28 @@ def main():
         if not os.path.exists(args.datasetDir):
             print(f"Error: Dataset directory {args.datasetDir} does not exist")
             return
-        for f in os.listdir(args.datasetDir):
-            if not f.endswith(".tar.gz"):
-                args.episodeName = f
-                print("episode name:", args.episodeName, "processing")
-                operator = Operator(args)
-                operator.process()
-                print("episode name:", args.episodeName, "done")
+        episode_names = [f for f in os.listdir(args.datasetDir) if not f.endswith(".tar.gz") and os.path.isdir(os.path.join(args.datasetDir, f))]
+        results = []
+        if args.workers > 1:
+            # episode 之间相互独立，使用进程池并行同步
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = {executor.submit(sync_episode, args, name, True): name for name in episode_names}
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"episode": futures[future], "frames": 0, "error": f"{type(e).__name__}: {e}", "elapsed": 0.0}
+                    results.append(result)
+                    print_episode_result(result, len(results), len(episode_names))
+        else:
+            for name in episode_names:
+                print("episode name:", name, "processing")
+                results.append(sync_episode(args, name))
+                print_episode_result(results[-1], len(results), len(episode_names))
+        failed = [result for result in results if result["error"] is not None]
+        print(f"Synced {len(results) - len(failed)}/{len(results)} episodes, frames: {sum(result['frames'] for result in results)}")
+        for result in failed:
+            print(f"Failed episode {result['episode']}: {result['error']}")
     else:
         operator = Operator(args)
         operator.process()
@@ -11,8 +11,18 @@ import h5py
 import argparse
 import json
 import cv2
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from scipy.spatial.transform import Rotation as R
 import yaml
+from hdf5_image import ENCODED_IMAGE_DTYPE, read_image_bytes
+from point_cloud_io import load_point_cloud, get_point_cloud_tensor_path, open_point_cloud_tensor
+from depth_codec import encode_depth
+from dataset_catalog import get_catalog_dir, update_catalog
+from dataset_stats import EpisodeStats, get_role_keys, update_dataset_stats
+from sync_index import load_sync_index, read_sync_lines, read_interpolated
 
 
 def matrix_to_xyzrpy(matrix):
@@ -54,6 +64,176 @@ def create_transformation_matrix(x, y, z, roll, pitch, yaw):
     return transformation_matrix
 
 
+# 存储配置: 各类数据集的每个分块帧数、压缩方式，以及文件的分块缓存大小
+# chunkRows 为 None 时按每个分块约 1MB 计算，变长数据 (路径、编码图像) 只分块不压缩
+STORAGE_PROFILES = {
+    "default": {
+        "cacheBytes": 1024 ** 2 * 2,
+        "image": {"chunkRows": None, "compression": None},
+        "depth": {"chunkRows": None, "compression": None},
+        "pointCloud": {"chunkRows": None, "compression": None},
+        "lowDim": {"chunkRows": None, "compression": None},
+    },
+    "training-random-access": {
+        "cacheBytes": 1024 ** 2 * 64,
+        "image": {"chunkRows": 1, "compression": None},
+        "depth": {"chunkRows": 1, "compression": "lzf", "shuffle": True},
+        "pointCloud": {"chunkRows": 1, "compression": "lzf", "shuffle": True},
+        "lowDim": {"chunkRows": 256, "compression": None},
+    },
+    "archive": {
+        "cacheBytes": 1024 ** 2 * 4,
+        "image": {"chunkRows": 1, "compression": "gzip", "compressionOpts": 4, "shuffle": True},
+        "depth": {"chunkRows": 1, "compression": "gzip", "compressionOpts": 6, "shuffle": True},
+        "pointCloud": {"chunkRows": 1, "compression": "gzip", "compressionOpts": 4, "shuffle": True},
+        "lowDim": {"chunkRows": 4096, "compression": "gzip", "compressionOpts": 6, "shuffle": True},
+    },
+}
+
+
+def get_dataset_type(key):
+    """按数据集名称区分图像、深度、点云和低维数据"""
+    if key.startswith('camera/color/'):
+        return "image"
+    if key.startswith('camera/depth/'):
+        return "depth"
+    if key.startswith('camera/pointCloud/') or key.startswith('lidar/pointCloud/'):
+        return "pointCloud"
+    return "lowDim"
+
+
+def get_dataset_options(profile, key, shape, dtype):
+    """返回按存储配置创建数据集时的分块和压缩参数，shape 为单帧形状"""
+    options = STORAGE_PROFILES[profile]["lowDim" if dtype.kind == 'O' else get_dataset_type(key)]
+    rows = options["chunkRows"]
+    if rows is None:
+        frame_bytes = max(1, int(np.prod(shape, dtype=np.int64)) * (dtype.itemsize if dtype.kind != 'O' else 16))
+        rows = int(min(1024, max(1, 1024 ** 2 // frame_bytes)))
+    dataset_options = {"chunks": (rows,) + tuple(max(d, 1) for d in shape)}
+    if options["compression"] is not None and dtype.kind != 'O':
+        dataset_options["compression"] = options["compression"]
+        if "compressionOpts" in options:
+            dataset_options["compression_opts"] = options["compressionOpts"]
+        dataset_options["shuffle"] = options.get("shuffle", False)
+    return dataset_options
+
+
+def to_object_array(values):
+    """把长度不一的数组列表转换为一维 object 数组，用于写入变长数据集"""
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+class DictWriter:
+    """缓存整个 episode 的数据，关闭时一次性创建数据集"""
+
+    def __init__(self, root, profile="default"):
+        self.root = root
+        self.profile = profile
+        self.data_dict = {}
+        self.dtypes = {}
+
+    def declare(self, key, dtype=None):
+        self.data_dict.setdefault(key, [])
+        if dtype is not None:
+            self.dtypes[key] = dtype
+
+    def append(self, key, value):
+        self.data_dict[key].append(value)
+
+    def set(self, key, value):
+        self.data_dict[key] = value
+
+    def close(self):
+        for key in self.data_dict:
+            if key in self.dtypes:
+                self.root.create_dataset(key, data=to_object_array(self.data_dict[key]), dtype=self.dtypes[key])
+            elif self.profile == "default":
+                self.root.create_dataset(key, data=self.data_dict[key])
+            else:
+                data = np.asarray(self.data_dict[key])
+                if data.dtype.kind not in 'biuf' or data.ndim == 0 or data.size == 0:
+                    self.root.create_dataset(key, data=self.data_dict[key])
+                    continue
+                options = get_dataset_options(self.profile, key, data.shape[1:], data.dtype)
+                # 固定大小的数据集分块不能超过数据形状
+                options["chunks"] = tuple(min(c, d) for c, d in zip(options["chunks"], data.shape))
+                self.root.create_dataset(key, data=data, **options)
+
+
+class StreamWriter:
+    """预先创建可扩展的分块数据集并按帧追加，峰值内存只与缓冲帧数有关，与 episode 长度无关"""
+
+    def __init__(self, root, buffer_size, profile="default"):
+        self.root = root
+        self.buffer_size = max(1, buffer_size)
+        self.profile = profile
+        self.buffers = {}
+        self.dtypes = {}
+
+    def declare(self, key, dtype=None):
+        self.buffers.setdefault(key, [])
+        if dtype is not None:
+            self.dtypes[key] = dtype
+
+    def append(self, key, value):
+        buffer = self.buffers[key]
+        buffer.append(value)
+        if len(buffer) >= self.buffer_size:
+            self.flush(key)
+
+    def set(self, key, value):
+        self.buffers.pop(key, None)
+        self.root.create_dataset(key, data=value)
+
+    def create(self, key, shape, dtype, data=None):
+        """按存储配置创建首维可扩展的分块数据集"""
+        self.root.create_dataset(key, shape=(0,) + shape, maxshape=(None,) + tuple(d if d > 0 else None for d in shape),
+                                 dtype=dtype, **get_dataset_options(self.profile, key, shape, dtype))
+        if data is not None:
+            self.write(key, data)
+
+    def write(self, key, data):
+        dataset = self.root[key]
+        start = dataset.shape[0]
+        dataset.resize(start + len(data), axis=0)
+        dataset[start:] = data
+
+    def flush(self, key):
+        buffer = self.buffers[key]
+        if not buffer:
+            return
+        if key in self.dtypes:
+            data = to_object_array(buffer)
+            dtype = self.dtypes[key]
+        else:
+            data = np.asarray(buffer)
+            dtype = data.dtype
+        if data.dtype.kind == 'U':
+            data = data.astype(object)
+            dtype = h5py.string_dtype()
+        if key not in self.root:
+            self.create(key, data.shape[1:], dtype)
+        elif dtype.kind != 'O' and np.result_type(self.root[key].dtype, dtype) != self.root[key].dtype:
+            # 后续帧类型更宽时 (如整数之后出现浮点数) 提升已写入数据的类型，与一次性写入的结果一致
+            written = self.root[key][()]
+            del self.root[key]
+            self.create(key, data.shape[1:], np.result_type(written.dtype, dtype), written)
+        self.write(key, data)
+        buffer.clear()
+
+    def close(self):
+        for key in self.buffers:
+            if key in self.root or self.buffers[key]:
+                self.flush(key)
+            elif key in self.dtypes:
+                self.root.create_dataset(key, data=to_object_array([]), dtype=self.dtypes[key])
+            else:
+                self.root.create_dataset(key, data=[])
+
+
 class Operator:
     def __init__(self, args):
         self.args = args
@@ -85,6 +265,9 @@ class Operator:
         self.cameraColorConfigDirs = [os.path.join(self.cameraColorDirs[i], "config.json") for i in range(len(self.args.cameraColorNames))]
         self.cameraDepthConfigDirs = [os.path.join(self.cameraDepthDirs[i], "config.json") for i in range(len(self.args.cameraDepthNames))]
         self.cameraPointCloudConfigDirs = [os.path.join(self.cameraPointCloudDirs[i], "config.json") for i in range(len(self.args.cameraPointCloudNames))]
+        # camera_point_cloud_filter.py --useTensorOutput 输出的逐帧张量，帧所在行即其在 sync.txt 中的行号
+        self.cameraPointCloudTensorDirs = [get_point_cloud_tensor_path(self.cameraPointCloudDirs[i]) for i in range(len(self.args.cameraPointCloudNames))]
+        self.cameraPointCloudTensorRows = {}
 
         self.instructionsDir = "instructions.npy"
         if self.args.useIndex:
@@ -92,261 +275,242 @@ class Operator:
         else:
             self.dataFile = os.path.join(self.args.datasetTargetDir, self.args.episodeName + ".hdf5")
 
-    def process(self):
-        data_dict = {}
+    def declare_datasets(self, writer):
+        """声明 episode 的所有数据集，没有数据的数据集写为空数组"""
         for cameraColorName in self.args.cameraColorNames:
-            data_dict[f'camera/color/{cameraColorName}'] = []
-            data_dict[f'camera/colorIntrinsic/{cameraColorName}'] = []
-            data_dict[f'camera/colorExtrinsic/{cameraColorName}'] = []
+            writer.declare(f'camera/color/{cameraColorName}', ENCODED_IMAGE_DTYPE if self.args.useEncodedImage else None)
+            writer.declare(f'camera/colorIntrinsic/{cameraColorName}')
+            writer.declare(f'camera/colorExtrinsic/{cameraColorName}')
         for cameraDepthName in self.args.cameraDepthNames:
-            data_dict[f'camera/depth/{cameraDepthName}'] = []
-            data_dict[f'camera/depthIntrinsic/{cameraDepthName}'] = []
-            data_dict[f'camera/depthExtrinsic/{cameraDepthName}'] = []
+            writer.declare(f'camera/depth/{cameraDepthName}', ENCODED_IMAGE_DTYPE if self.args.useEncodedImage or self.args.useDepthCodec else None)
+            writer.declare(f'camera/depthIntrinsic/{cameraDepthName}')
+            writer.declare(f'camera/depthExtrinsic/{cameraDepthName}')
         for cameraPointCloudName in self.args.cameraPointCloudNames:
-            data_dict[f'camera/pointCloud/{cameraPointCloudName}'] = []
-            data_dict[f'camera/pointCloudIntrinsic/{cameraPointCloudName}'] = []
-            data_dict[f'camera/pointCloudExtrinsic/{cameraPointCloudName}'] = []
+            writer.declare(f'camera/pointCloud/{cameraPointCloudName}')
+            writer.declare(f'camera/pointCloudIntrinsic/{cameraPointCloudName}')
+            writer.declare(f'camera/pointCloudExtrinsic/{cameraPointCloudName}')
         for armJointStateName in self.args.armJointStateNames:
-            data_dict[f'arm/jointStateVelocity/{armJointStateName}'] = []
-            data_dict[f'arm/jointStatePosition/{armJointStateName}'] = []
-            data_dict[f'arm/jointStateEffort/{armJointStateName}'] = []
+            writer.declare(f'arm/jointStateVelocity/{armJointStateName}')
+            writer.declare(f'arm/jointStatePosition/{armJointStateName}')
+            writer.declare(f'arm/jointStateEffort/{armJointStateName}')
         for armEndPoseName in self.args.armEndPoseNames:
-            data_dict[f'arm/endPose/{armEndPoseName}'] = []
+            writer.declare(f'arm/endPose/{armEndPoseName}')
         for localizationPoseName in self.args.localizationPoseNames:
-            data_dict[f'localization/pose/{localizationPoseName}'] = []
+            writer.declare(f'localization/pose/{localizationPoseName}')
         for gripperEncoderName in self.args.gripperEncoderNames:
-            data_dict[f'gripper/encoderAngle/{gripperEncoderName}'] = []
-            data_dict[f'gripper/encoderDistance/{gripperEncoderName}'] = []
+            writer.declare(f'gripper/encoderAngle/{gripperEncoderName}')
+            writer.declare(f'gripper/encoderDistance/{gripperEncoderName}')
         for imu9AxisName in self.args.imu9AxisNames:
-            data_dict[f'imu/9axisOrientation/{imu9AxisName}'] = []
-            data_dict[f'imu/9axisAngularVelocity/{imu9AxisName}'] = []
-            data_dict[f'imu/9axisLinearAcceleration/{imu9AxisName}'] = []
+            writer.declare(f'imu/9axisOrientation/{imu9AxisName}')
+            writer.declare(f'imu/9axisAngularVelocity/{imu9AxisName}')
+            writer.declare(f'imu/9axisLinearAcceleration/{imu9AxisName}')
         for lidarPointCloudName in self.args.lidarPointCloudNames:
-            data_dict[f'lidar/pointCloud/{lidarPointCloudName}'] = []
+            writer.declare(f'lidar/pointCloud/{lidarPointCloudName}')
         for robotBaseVelName in self.args.robotBaseVelNames:
-            data_dict[f'robotBase/vel/{robotBaseVelName}'] = []
+            writer.declare(f'robotBase/vel/{robotBaseVelName}')
         for liftMotorName in self.args.liftMotorNames:
-            data_dict[f'lift/motor/{liftMotorName}'] = []
-        data_dict[f'instruction'] = self.instructionsDir
-        data_dict[f'timestamp'] = []
-        data_dict[f'size'] = 0
-        size_count = 0
-        for i in range(len(self.args.cameraColorNames)):
-            with open(self.cameraColorSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    if self.args.useIndex:
-                        data_dict[f'camera/color/{self.args.cameraColorNames[i]}'].append(os.path.join(self.cameraColorDirs[i][len(self.episodeDir)+1:], line))
-                    else:
-                        data_dict[f'camera/color/{self.args.cameraColorNames[i]}'].append(cv2.imread(os.path.join(self.cameraColorDirs[i], line)))
-                    # print(os.path.join(self.cameraColorDirs[i], line))
-                    # cv2.imread(os.path.join(self.cameraColorDirs[i], line))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-            # with open(self.cameraColorConfigDirs[i], 'r') as color_config_file:
-            #     data = json.load(color_config_file)
-            #     color_intrinsic = np.array(data["K"]).reshape(3, 3)
-            #     color_extrinsic = create_transformation_matrix(data["parent_frame"]['x'],  data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-            #     data_dict[f'camera/colorIntrinsic/{self.args.cameraColorNames[i]}'] = color_intrinsic
-            #     data_dict[f'camera/colorExtrinsic/{self.args.cameraColorNames[i]}'] = color_extrinsic
-        for i in range(len(self.args.cameraDepthNames)):
-            with open(self.cameraDepthSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    if self.args.useIndex:
-                        data_dict[f'camera/depth/{self.args.cameraDepthNames[i]}'].append(os.path.join(self.cameraDepthDirs[i][len(self.episodeDir)+1:], line))
-                    else:
-                        data_dict[f'camera/depth/{self.args.cameraDepthNames[i]}'].append(cv2.imread(os.path.join(self.cameraDepthDirs[i], line)))
-                    # print(os.path.join(self.cameraDepthDirs[i], line))
-                    # img = cv2.imread(os.path.join(self.cameraDepthDirs[i], line), cv2.IMREAD_UNCHANGED).flatten()
-                    # print(max(img), min(img))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-            # with open(self.cameraDepthConfigDirs[i], 'r') as depth_config_file:
-            #     data = json.load(depth_config_file)
-            #     depth_intrinsic = np.array(data["K"]).reshape(3, 3)
-            #     depth_extrinsic = create_transformation_matrix(data["parent_frame"]['x'],  data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-            #     data_dict[f'camera/depthIntrinsic/{self.args.cameraDepthNames[i]}'] = depth_intrinsic
-            #     data_dict[f'camera/depthExtrinsic/{self.args.cameraDepthNames[i]}'] = depth_extrinsic
-        for i in range(len(self.args.cameraPointCloudNames)):
-            with open(self.cameraPointCloudSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    if self.args.useIndex:
-                        data_dict[f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}'].append(os.path.join(self.cameraPointCloudDirs[i][len(self.episodeDir)+1:], line))
-                    else:
-                        data_dict[f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}'].append(np.load(os.path.join(self.cameraPointCloudDirs[i], line)))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-            # with open(self.cameraPointCloudConfigDirs[i], 'r') as point_cloud_config_file:
-            #     data = json.load(point_cloud_config_file)
-            #     point_cloud_intrinsic = np.array(data["K"]).reshape(3, 3)
-            #     point_cloud_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
-            #     data_dict[f'camera/pointCloudIntrinsic/{self.args.cameraPointCloudNames[i]}'] = point_cloud_intrinsic
-            #     data_dict[f'camera/pointCloudExtrinsic/{self.args.cameraPointCloudNames[i]}'] = point_cloud_extrinsic
-        for i in range(len(self.args.armJointStateNames)):
-            with open(self.armJointStateSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.armJointStateDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        data_dict[f'arm/jointStateVelocity/{self.args.armJointStateNames[i]}'].append(np.array(data['velocity']))
-                        data_dict[f'arm/jointStateEffort/{self.args.armJointStateNames[i]}'].append(np.array(data['effort']))
-                        data_dict[f'arm/jointStatePosition/{self.args.armJointStateNames[i]}'].append(np.array(data['position']))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.armEndPoseNames)):
-            with open(self.armEndPoseSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.armEndPoseDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        if 'grasper' in data.keys():
-                            data_dict[f'arm/endPose/{self.args.armEndPoseNames[i]}'].append(np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw'], data['grasper']]))
-                        else:
-                            data_dict[f'arm/endPose/{self.args.armEndPoseNames[i]}'].append(np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw']]))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.localizationPoseNames)):
-            with open(self.localizationPoseSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.localizationPoseDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        # ori_trans = create_transformation_matrix(data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw'])
-                        # incre_trans = create_transformation_matrix(0, 0, 0, 0, math.pi/4, 0)
-                        # final_trans = np.dot(ori_trans, incre_trans)
-                        # xyzrpy = matrix_to_xyzrpy(final_trans)
-                        data_dict[f'localization/pose/{self.args.localizationPoseNames[i]}'].append(np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw']]))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.gripperEncoderNames)):
-            with open(self.gripperEncoderSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.gripperEncoderDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        data_dict[f'gripper/encoderAngle/{self.args.gripperEncoderNames[i]}'].append(data['angle'])
-                        data_dict[f'gripper/encoderDistance/{self.args.gripperEncoderNames[i]}'].append(data['distance'])
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.imu9AxisNames)):
-            with open(self.imu9AxisSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.imu9AxisDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        data_dict[f'imu/9axisOrientation/{self.args.imu9AxisNames[i]}'].append(np.array([data['orientation']['x'], data['orientation']['y'], data['orientation']['z'], data['orientation']['w']]))
-                        data_dict[f'imu/9axisAngularVelocity/{self.args.imu9AxisNames[i]}'].append(np.array([data['angular_velocity']['x'], data['angular_velocity']['y'], data['angular_velocity']['z']]))
-                        data_dict[f'imu/9axisLinearAcceleration/{self.args.imu9AxisNames[i]}'].append(np.array([data['linear_acceleration']['x'], data['linear_acceleration']['y'], data['linear_acceleration']['z']]))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.lidarPointCloudNames)):
-            with open(self.lidarPointCloudSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    data_dict[f'lidar/pointCloud/{self.args.lidarPointCloudNames[i]}'].append(os.path.join(self.lidarPointCloudDirs[i][len(self.episodeDir)+1:], line))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.robotBaseVelNames)):
-            with open(self.robotBaseVelSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.robotBaseVelDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        data_dict[f'robotBase/vel/{self.args.robotBaseVelNames[i]}'].append(np.array([data['linear']['x'], data['linear']['y'], data['angular']['z']]))
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        for i in range(len(self.args.liftMotorNames)):
-            with open(self.liftMotorSyncDirs[i], 'r') as lines:
-                count = 0
-                for line in lines:
-                    line = line.replace('\n', '')
-                    time = float(line[:line.rfind(".")])
-                    if len(data_dict[f'timestamp']) <= count:
-                        data_dict[f'timestamp'].append(time)
-                    else:
-                        data_dict[f'timestamp'][count] = time if time < data_dict[f'timestamp'][count] else data_dict[f'timestamp'][count]
-                    with open(os.path.join(self.liftMotorDirs[i], line), 'r') as file:
-                        data = json.load(file)
-                        data_dict[f'lift/motor/{self.args.liftMotorNames[i]}'].append(data['backHeight'])
-                    count += 1
-                if size_count == 0:
-                    size_count = count
-        data_dict['size'] = size_count
-        with h5py.File(self.dataFile, 'w', rdcc_nbytes=1024 ** 2 * 2) as root:
-            for key in data_dict:
-                root.create_dataset(key, data=data_dict[key])
+            writer.declare(f'lift/motor/{liftMotorName}')
+        writer.declare(f'timestamp')
+
+    def get_sources(self, sync_index):
+        """按原有处理顺序列出各数据源的同步行 [(文件名, 时间戳)] 和逐帧读取函数"""
+        sources = []
+
+        def add_sources(dirs, sync_dirs, reader, interpolate=False):
+            for i in range(len(dirs)):
+                key = dirs[i][len(self.episodeDir)+1:]
+                interpolated = read_interpolated(sync_index, key, sync_dirs[i]) if interpolate else None
+                sources.append({"lines": read_sync_lines(sync_index, key, sync_dirs[i]), "read": partial(reader, i, interpolated)})
+
+        add_sources(self.cameraColorDirs, self.cameraColorSyncDirs, self.read_camera_color)
+        # with open(self.cameraColorConfigDirs[i], 'r') as color_config_file:
+        #     data = json.load(color_config_file)
+        #     color_intrinsic = np.array(data["K"]).reshape(3, 3)
+        #     color_extrinsic = create_transformation_matrix(data["parent_frame"]['x'],  data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
+        #     data_dict[f'camera/colorIntrinsic/{self.args.cameraColorNames[i]}'] = color_intrinsic
+        #     data_dict[f'camera/colorExtrinsic/{self.args.cameraColorNames[i]}'] = color_extrinsic
+        add_sources(self.cameraDepthDirs, self.cameraDepthSyncDirs, self.read_camera_depth)
+        # with open(self.cameraDepthConfigDirs[i], 'r') as depth_config_file:
+        #     data = json.load(depth_config_file)
+        #     depth_intrinsic = np.array(data["K"]).reshape(3, 3)
+        #     depth_extrinsic = create_transformation_matrix(data["parent_frame"]['x'],  data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
+        #     data_dict[f'camera/depthIntrinsic/{self.args.cameraDepthNames[i]}'] = depth_intrinsic
+        #     data_dict[f'camera/depthExtrinsic/{self.args.cameraDepthNames[i]}'] = depth_extrinsic
+        add_sources(self.cameraPointCloudDirs, self.cameraPointCloudSyncDirs, self.read_camera_point_cloud)
+        # with open(self.cameraPointCloudConfigDirs[i], 'r') as point_cloud_config_file:
+        #     data = json.load(point_cloud_config_file)
+        #     point_cloud_intrinsic = np.array(data["K"]).reshape(3, 3)
+        #     point_cloud_extrinsic = create_transformation_matrix(data["parent_frame"]['x'], data["parent_frame"]['y'], data["parent_frame"]['z'], data["parent_frame"]['roll'], data["parent_frame"]['pitch'], data["parent_frame"]['yaw'])
+        #     data_dict[f'camera/pointCloudIntrinsic/{self.args.cameraPointCloudNames[i]}'] = point_cloud_intrinsic
+        #     data_dict[f'camera/pointCloudExtrinsic/{self.args.cameraPointCloudNames[i]}'] = point_cloud_extrinsic
+        add_sources(self.armJointStateDirs, self.armJointStateSyncDirs, self.read_arm_joint_state, True)
+        add_sources(self.armEndPoseDirs, self.armEndPoseSyncDirs, self.read_arm_end_pose, True)
+        add_sources(self.localizationPoseDirs, self.localizationPoseSyncDirs, self.read_localization_pose)
+        add_sources(self.gripperEncoderDirs, self.gripperEncoderSyncDirs, self.read_gripper_encoder, True)
+        add_sources(self.imu9AxisDirs, self.imu9AxisSyncDirs, self.read_imu_9axis, True)
+        add_sources(self.lidarPointCloudDirs, self.lidarPointCloudSyncDirs, self.read_lidar_point_cloud)
+        add_sources(self.robotBaseVelDirs, self.robotBaseVelSyncDirs, self.read_robot_base_vel)
+        add_sources(self.liftMotorDirs, self.liftMotorSyncDirs, self.read_lift_motor)
+        return sources
+
+    def read_camera_color(self, i, interpolated, count, line):
+        if self.args.useEncodedImage:
+            return [(f'camera/color/{self.args.cameraColorNames[i]}', read_image_bytes(os.path.join(self.cameraColorDirs[i], line)))]
+        if self.args.useIndex:
+            return [(f'camera/color/{self.args.cameraColorNames[i]}', os.path.join(self.cameraColorDirs[i][len(self.episodeDir)+1:], line))]
+        return [(f'camera/color/{self.args.cameraColorNames[i]}', cv2.imread(os.path.join(self.cameraColorDirs[i], line)))]
+
+    def read_camera_depth(self, i, interpolated, count, line):
+        if self.args.useDepthCodec:
+            depth = cv2.imread(os.path.join(self.cameraDepthDirs[i], line), cv2.IMREAD_UNCHANGED)
+            if depth is None:
+                raise FileNotFoundError(f"Depth image {os.path.join(self.cameraDepthDirs[i], line)} not found")
+            return [(f'camera/depth/{self.args.cameraDepthNames[i]}', encode_depth(depth))]
+        if self.args.useEncodedImage:
+            return [(f'camera/depth/{self.args.cameraDepthNames[i]}', read_image_bytes(os.path.join(self.cameraDepthDirs[i], line)))]
+        if self.args.useIndex:
+            return [(f'camera/depth/{self.args.cameraDepthNames[i]}', os.path.join(self.cameraDepthDirs[i][len(self.episodeDir)+1:], line))]
+        # 深度图为 16 位单通道，需要 IMREAD_UNCHANGED 保留原始数值
+        return [(f'camera/depth/{self.args.cameraDepthNames[i]}', cv2.imread(os.path.join(self.cameraDepthDirs[i], line), cv2.IMREAD_UNCHANGED))]
+
+    def read_camera_point_cloud(self, i, interpolated, count, line):
+        if self.cameraPointCloudTensorDirs[i] is not None:
+            if i not in self.cameraPointCloudTensorRows:
+                with open(self.cameraPointCloudSyncDirs[i], 'r') as f:
+                    # 按微秒时间戳匹配，同步索引中的文件名格式可能与 sync.txt 不同
+                    self.cameraPointCloudTensorRows[i] = {round(float(name[:name.rfind(".")]), 6): row for row, name in enumerate(f) if name.strip()}
+            row = self.cameraPointCloudTensorRows[i][round(float(line[:line.rfind(".")]), 6)]
+            if self.args.useIndex:
+                return [(f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}', self.cameraPointCloudTensorDirs[i][len(self.episodeDir)+1:] + f"#{row}")]
+            return [(f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}', np.array(open_point_cloud_tensor(self.cameraPointCloudTensorDirs[i])[row]))]
+        if self.args.useIndex:
+            return [(f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}', os.path.join(self.cameraPointCloudDirs[i][len(self.episodeDir)+1:], line))]
+        # 采集的 .pcd 解析为 x, y, z, r, g, b；旧版滤波输出的 float64 .npy 转为 float32，与当前滤波输出一致
+        return [(f'camera/pointCloud/{self.args.cameraPointCloudNames[i]}', np.asarray(load_point_cloud(os.path.join(self.cameraPointCloudDirs[i], line)), dtype=np.float32))]
+
+    def read_arm_joint_state(self, i, interpolated, count, line):
+        name = self.args.armJointStateNames[i]
+        if interpolated is not None:
+            return [(f'arm/jointStateVelocity/{name}', interpolated['velocity'][count]),
+                    (f'arm/jointStateEffort/{name}', interpolated['effort'][count]),
+                    (f'arm/jointStatePosition/{name}', interpolated['position'][count])]
+        with open(os.path.join(self.armJointStateDirs[i], line), 'r') as file:
+            data = json.load(file)
+            return [(f'arm/jointStateVelocity/{name}', np.array(data['velocity'])),
+                    (f'arm/jointStateEffort/{name}', np.array(data['effort'])),
+                    (f'arm/jointStatePosition/{name}', np.array(data['position']))]
+
+    def read_arm_end_pose(self, i, interpolated, count, line):
+        name = self.args.armEndPoseNames[i]
+        if interpolated is not None:
+            return [(f'arm/endPose/{name}', interpolated['pose'][count])]
+        with open(os.path.join(self.armEndPoseDirs[i], line), 'r') as file:
+            data = json.load(file)
+            if 'grasper' in data.keys():
+                return [(f'arm/endPose/{name}', np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw'], data['grasper']]))]
+            return [(f'arm/endPose/{name}', np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw']]))]
+
+    def read_localization_pose(self, i, interpolated, count, line):
+        with open(os.path.join(self.localizationPoseDirs[i], line), 'r') as file:
+            data = json.load(file)
+            # ori_trans = create_transformation_matrix(data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw'])
+            # incre_trans = create_transformation_matrix(0, 0, 0, 0, math.pi/4, 0)
+            # final_trans = np.dot(ori_trans, incre_trans)
+            # xyzrpy = matrix_to_xyzrpy(final_trans)
+            return [(f'localization/pose/{self.args.localizationPoseNames[i]}', np.array([data['x'], data['y'], data['z'], data['roll'], data['pitch'], data['yaw']]))]
+
+    def read_gripper_encoder(self, i, interpolated, count, line):
+        name = self.args.gripperEncoderNames[i]
+        if interpolated is not None:
+            return [(f'gripper/encoderAngle/{name}', interpolated['angle'][count]),
+                    (f'gripper/encoderDistance/{name}', interpolated['distance'][count])]
+        with open(os.path.join(self.gripperEncoderDirs[i], line), 'r') as file:
+            data = json.load(file)
+            return [(f'gripper/encoderAngle/{name}', data['angle']),
+                    (f'gripper/encoderDistance/{name}', data['distance'])]
+
+    def read_imu_9axis(self, i, interpolated, count, line):
+        name = self.args.imu9AxisNames[i]
+        if interpolated is not None:
+            return [(f'imu/9axisOrientation/{name}', interpolated['orientation'][count]),
+                    (f'imu/9axisAngularVelocity/{name}', interpolated['angularVelocity'][count]),
+                    (f'imu/9axisLinearAcceleration/{name}', interpolated['linearAcceleration'][count])]
+        with open(os.path.join(self.imu9AxisDirs[i], line), 'r') as file:
+            data = json.load(file)
+            return [(f'imu/9axisOrientation/{name}', np.array([data['orientation']['x'], data['orientation']['y'], data['orientation']['z'], data['orientation']['w']])),
+                    (f'imu/9axisAngularVelocity/{name}', np.array([data['angular_velocity']['x'], data['angular_velocity']['y'], data['angular_velocity']['z']])),
+                    (f'imu/9axisLinearAcceleration/{name}', np.array([data['linear_acceleration']['x'], data['linear_acceleration']['y'], data['linear_acceleration']['z']]))]
+
+    def read_lidar_point_cloud(self, i, interpolated, count, line):
+        return [(f'lidar/pointCloud/{self.args.lidarPointCloudNames[i]}', os.path.join(self.lidarPointCloudDirs[i][len(self.episodeDir)+1:], line))]
+
+    def read_robot_base_vel(self, i, interpolated, count, line):
+        with open(os.path.join(self.robotBaseVelDirs[i], line), 'r') as file:
+            data = json.load(file)
+            return [(f'robotBase/vel/{self.args.robotBaseVelNames[i]}', np.array([data['linear']['x'], data['linear']['y'], data['angular']['z']]))]
+
+    def read_lift_motor(self, i, interpolated, count, line):
+        with open(os.path.join(self.liftMotorDirs[i], line), 'r') as file:
+            data = json.load(file)
+            return [(f'lift/motor/{self.args.liftMotorNames[i]}', data['backHeight'])]
+
+    def read_frame(self, sources, count):
+        """读取所有数据源的第 count 帧，返回 (时间戳, [(数据集, 数据)])，时间戳取各数据源时间戳的最小值"""
+        timestamp = None
+        values = []
+        for source in sources:
+            if count >= len(source["lines"]):
+                continue
+            line, frame_time = source["lines"][count]
+            timestamp = frame_time if timestamp is None or frame_time < timestamp else timestamp
+            values.extend(source["read"](count, line))
+        return timestamp, values
+
+    def iter_frames(self, sources, frame_count):
+        """按帧序返回各帧数据，readWorkers > 1 时用线程池并发读取和解码，最多预读 readQueueSize 帧"""
+        if self.args.readWorkers <= 1:
+            for count in range(frame_count):
+                yield self.read_frame(sources, count)
+            return
+        with ThreadPoolExecutor(max_workers=self.args.readWorkers) as executor:
+            pending = deque()
+            for count in range(frame_count):
+                pending.append(executor.submit(self.read_frame, sources, count))
+                if len(pending) >= max(1, self.args.readQueueSize):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def process(self):
+        sync_index = load_sync_index(self.episodeDir)
+        sources = self.get_sources(sync_index)
+        # 先写入临时文件，转换失败时不会留下不完整的 hdf5
+        tmp_file = self.dataFile + ".tmp"
+        profile = self.args.storageProfile
+        with h5py.File(tmp_file, 'w', rdcc_nbytes=STORAGE_PROFILES[profile]["cacheBytes"]) as root:
+            writer = StreamWriter(root, self.args.streamBufferSize, profile) if self.args.useStreamWrite else DictWriter(root, profile)
+            self.declare_datasets(writer)
+            writer.set(f'instruction', self.instructionsDir)
+            frame_count = max([len(source["lines"]) for source in sources], default=0)
+            stats = EpisodeStats()
+            start = time.time()
+            for timestamp, values in self.iter_frames(sources, frame_count):
+                for key, value in values:
+                    writer.append(key, value)
+                    stats.append(key, value)
+                writer.append(f'timestamp', timestamp)
+            elapsed = time.time() - start
+            print(f"Converted {frame_count} frames in {elapsed:.2f}s, {frame_count / elapsed if elapsed > 0 else 0:.1f} fps")
+            writer.set(f'size', next((len(source["lines"]) for source in sources if len(source["lines"]) > 0), 0))
+            writer.close()
+        os.replace(tmp_file, self.dataFile)
+        if self.args.useCatalog:
+            catalog_dir = get_catalog_dir(self.dataFile)
+            catalog = update_catalog(catalog_dir, [self.dataFile])
+            if self.args.useStats:
+                # 只合并各 episode 已保存的统计量，不重新读取数据；没有 qpos/action 数据集时只打印警告，hdf5 和 catalog 已写入
+                update_dataset_stats(catalog_dir, [os.path.join(catalog_dir, name) for name in catalog["episodes"]], {self.dataFile: stats.finish()},
+                                     [key for key in self.args.statsQposKeys.split(",") if key], [key for key in self.args.statsActionKeys.split(",") if key])
 
 
 def get_arguments():
@@ -359,6 +523,28 @@ def get_arguments():
                         default="/home/agilex/data", required=False)
     parser.add_argument('--useIndex', action='store', type=bool, help='useIndex',
                         default=True, required=False)
+    parser.add_argument('--useEncodedImage', action='store', type=bool, help='useEncodedImage',
+                        default=False, required=False)
+    parser.add_argument('--useDepthCodec', action='store', type=bool, help='useDepthCodec',
+                        default=False, required=False)
+    parser.add_argument('--useStreamWrite', action='store', type=bool, help='useStreamWrite',
+                        default=True, required=False)
+    parser.add_argument('--streamBufferSize', action='store', type=int, help='streamBufferSize',
+                        default=32, required=False)
+    parser.add_argument('--storageProfile', action='store', type=str, help='storageProfile: default, training-random-access or archive',
+                        choices=list(STORAGE_PROFILES.keys()), default="default", required=False)
+    parser.add_argument('--readWorkers', action='store', type=int, help='readWorkers',
+                        default=4, required=False)
+    parser.add_argument('--readQueueSize', action='store', type=int, help='readQueueSize',
+                        default=16, required=False)
+    parser.add_argument('--useCatalog', action='store', type=bool, help='useCatalog',
+                        default=True, required=False)
+    parser.add_argument('--useStats', action='store', type=bool, help='useStats',
+                        default=True, required=False)
+    parser.add_argument('--statsQposKeys', action='store', type=str, help='statsQposKeys, comma separated',
+                        default="", required=False)
+    parser.add_argument('--statsActionKeys', action='store', type=str, help='statsActionKeys, comma separated',
+                        default="", required=False)
     parser.add_argument('--type', action='store', type=str, help='type',
                         default="aloha", required=False)
     parser.add_argument('--cameraColorNames', action='store', type=str, help='cameraColorNames',
@@ -410,9 +596,17 @@ def main():
     args = get_arguments()
     if not args.useCameraPointCloud:
         args.cameraPointCloudNames = []
+    if args.useCatalog and args.useStats:
+        # 转换前按配置检查 qpos/action 的组成：指定的数据集不存在时报错，没有默认数据集时只跳过统计，仍然转换
+        qpos_keys, action_keys = get_role_keys([f'arm/jointStatePosition/{name}' for name in args.armJointStateNames] +
+                                               [f'arm/endPose/{name}' for name in args.armEndPoseNames] +
+                                               [f'gripper/{kind}/{name}' for name in args.gripperEncoderNames for kind in ('encoderAngle', 'encoderDistance')] +
+                                               [f'localization/pose/{name}' for name in args.localizationPoseNames],
+                                               [key for key in args.statsQposKeys.split(",") if key], [key for key in args.statsActionKeys.split(",") if key])
+        args.useStats = bool(qpos_keys and action_keys)
     if args.episodeName == "":
         for f in os.listdir(args.datasetDir):
-            if not f.endswith(".tar.gz"):
+            if not f.endswith(".tar.gz") and os.path.isdir(os.path.join(args.datasetDir, f)):
                 args.episodeName = f
                 print("episode name: ", args.episodeName, "processing")
                 operator = Operator(args)
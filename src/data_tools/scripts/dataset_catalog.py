@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dataset-level episode catalog.
+data_to_hdf5.py keeps catalog.json at the dataset root with the path, frame count,
+dataset keys/shapes/dtypes, time span and content hash of every converted episode,
+so loaders and exporters can list episodes without opening each hdf5 file.
+"""
+
+import os
+import glob
+import fnmatch
+import json
+import hashlib
+import argparse
+import h5py
+import numpy as np
+from typing import Dict, List, Optional
+
+
+CATALOG_FILE = "catalog.json"
+CATALOG_VERSION = 1
+
+
+def get_catalog_dir(path: str) -> str:
+    """episode 文件所属的数据集根目录: <root>/<episode>/data.hdf5 或 <root>/<episode>.hdf5"""
+    episode_dir = os.path.dirname(os.path.abspath(path))
+    return os.path.dirname(episode_dir) if os.path.basename(path) == "data.hdf5" else episode_dir
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_dtype_name(dtype) -> str:
+    """数据集类型名，变长字符串为 str，变长数组为 vlen <类型>"""
+    vlen = h5py.check_vlen_dtype(dtype)
+    if vlen is None:
+        return str(dtype)
+    return vlen.__name__ if isinstance(vlen, type) and not issubclass(vlen, np.generic) else f"vlen {np.dtype(vlen)}"
+
+
+def describe_episode(path: str) -> Dict:
+    """打开 hdf5 文件，记录帧数、数据集形状和类型、时间范围和内容哈希"""
+    datasets = {}
+    with h5py.File(path, 'r') as root:
+        root.visititems(lambda name, obj: datasets.update({name: obj}) if isinstance(obj, h5py.Dataset) else None)
+        if 'size' in datasets:
+            frames = int(datasets['size'][()])
+        elif 'timestamp' in datasets:
+            frames = int(datasets['timestamp'].shape[0])
+        else:
+            frames = max([dataset.shape[0] for dataset in datasets.values() if dataset.ndim > 0], default=0)
+        time_span = None
+        if 'timestamp' in datasets and datasets['timestamp'].ndim == 1 and datasets['timestamp'].shape[0] > 0:
+            time_span = [float(datasets['timestamp'][0]), float(datasets['timestamp'][-1])]
+        keys = {name: {"shape": list(dataset.shape), "dtype": get_dtype_name(dataset.dtype)}
+                for name, dataset in sorted(datasets.items())}
+    stat = os.stat(path)
+    return {"frames": frames, "timeSpan": time_span, "datasets": keys, "sha256": hash_file(path),
+            "bytes": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def is_entry_valid(entry: Optional[Dict], path: str) -> bool:
+    """文件大小和修改时间都未变化时条目可用"""
+    if entry is None or not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    return entry["bytes"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+
+
+def load_catalog(dataset_dir: str) -> Dict:
+    """读取数据集目录下的 catalog.json，不存在或损坏时返回空目录"""
+    path = os.path.join(dataset_dir, CATALOG_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                catalog = json.load(f)
+            if catalog.get("version") == CATALOG_VERSION:
+                return catalog
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignore invalid catalog {path}: {e}")
+    return {"version": CATALOG_VERSION, "episodes": {}}
+
+
+def save_catalog(dataset_dir: str, catalog: Dict):
+    """写入 catalog.json，episode 按路径排序"""
+    catalog["episodes"] = dict(sorted(catalog["episodes"].items()))
+    path = os.path.join(dataset_dir, CATALOG_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(catalog, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def update_entries(dataset_dir: str, catalog: Dict, paths: List[str]) -> bool:
+    """只重新读取新增或修改过的 episode 文件，返回目录是否有变化"""
+    changed = False
+    for path in paths:
+        name = os.path.relpath(os.path.abspath(path), os.path.abspath(dataset_dir))
+        if not is_entry_valid(catalog["episodes"].get(name), path):
+            catalog["episodes"][name] = describe_episode(path)
+            changed = True
+    return changed
+
+
+def update_catalog(dataset_dir: str, paths: List[str]) -> Dict:
+    """把指定 episode 文件加入数据集目录下的 catalog.json"""
+    catalog = load_catalog(dataset_dir)
+    if update_entries(dataset_dir, catalog, paths):
+        save_catalog(dataset_dir, catalog)
+    return catalog
+
+
+def refresh_catalog(dataset_dir: str, pattern: str = "**/*.hdf5", rescan: bool = False) -> Dict:
+    """校验并更新目录
+
+    已有条目只做 stat: 删除已不存在的 episode，重新读取修改过的 episode。
+    目录为空或 rescan 时再按 pattern 扫描数据集目录，加入新的 episode。
+    """
+    catalog = load_catalog(dataset_dir)
+    missing = [name for name in catalog["episodes"] if not os.path.isfile(os.path.join(dataset_dir, name))]
+    for name in missing:
+        del catalog["episodes"][name]
+    paths = [os.path.join(dataset_dir, name) for name in catalog["episodes"]]
+    if rescan or not catalog["episodes"]:
+        paths += [path for path in glob.glob(os.path.join(dataset_dir, pattern), recursive=True) if os.path.isfile(path)]
+    if update_entries(dataset_dir, catalog, paths) or missing:
+        save_catalog(dataset_dir, catalog)
+    return catalog
+
+
+def get_episode_paths(dataset_dir: str, pattern: str = "**/*.hdf5", rescan: bool = False) -> List[str]:
+    """按路径排序返回目录中与 pattern 匹配的 episode 文件的绝对路径"""
+    catalog = refresh_catalog(dataset_dir, pattern, rescan)
+    names = [name for name in catalog["episodes"] if fnmatch.fnmatch(name, pattern)]
+    if not names and not rescan:
+        # 目录中只有其它布局的 episode 时重新扫描一次
+        catalog = refresh_catalog(dataset_dir, pattern, rescan=True)
+        names = [name for name in catalog["episodes"] if fnmatch.fnmatch(name, pattern)]
+    return [os.path.join(os.path.abspath(dataset_dir), name) for name in names]
+
+
+def get_episode_entries(paths: List[str]) -> List[Dict]:
+    """返回各 episode 文件的目录条目，按文件所属的数据集根目录分别读取和更新目录"""
+    groups = {}
+    for path in paths:
+        groups.setdefault(get_catalog_dir(path), []).append(path)
+    catalogs = {dataset_dir: update_catalog(dataset_dir, group) for dataset_dir, group in groups.items()}
+    entries = []
+    for path in paths:
+        dataset_dir = get_catalog_dir(path)
+        entries.append(catalogs[dataset_dir]["episodes"][os.path.relpath(os.path.abspath(path), dataset_dir)])
+    return entries
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasetDir', action='store', type=str, help='datasetDir',
+                        default="/home/agilex/data", required=False)
+    parser.add_argument('--pattern', action='store', type=str, help='glob pattern of episode files',
+                        default="**/*.hdf5", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    catalog = refresh_catalog(args.datasetDir, args.pattern, rescan=True)
+    frames = sum(entry["frames"] for entry in catalog["episodes"].values())
+    print(f"Catalog {os.path.join(args.datasetDir, CATALOG_FILE)}: {len(catalog['episodes'])} episodes, {frames} frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming normalization statistics.
+data_to_hdf5.py updates per-episode running statistics (count, mean, M2, min/max and a
+mergeable log-bucket quantile sketch per dimension) while it writes each episode. The
+partial statistics of every episode are kept in episode_stats.pkl at the dataset root
+and merged into dataset_stats.pkl, which carries the qpos_mean/qpos_std/action_mean/
+action_std entries expected by ACT.
+"""
+
+import os
+import math
+import pickle
+import argparse
+import h5py
+import numpy as np
+from typing import Dict, List, Optional
+
+from dataset_catalog import get_episode_paths
+
+
+DATASET_STATS_FILE = "dataset_stats.pkl"
+EPISODE_STATS_FILE = "episode_stats.pkl"
+
+# 需要统计的低维数据集前缀
+STATS_KEY_PREFIXES = ["arm/jointStatePosition/", "arm/endPose/", "gripper/encoderAngle/", "gripper/encoderDistance/", "localization/pose/"]
+
+# 分位数草图的相对精度，以及视为 0 的最小绝对值
+SKETCH_RELATIVE_ACCURACY = 0.005
+SKETCH_MIN_VALUE = 1e-9
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+
+REPORT_QUANTILES = [0.01, 0.05, 0.5, 0.95, 0.99]
+
+# 与 ACT 的 get_norm_stats 一致，标准差下限 1e-2
+MIN_STD = 1e-2
+
+# 默认 qpos/action 对应的臂名称片段；lift 配置中从臂名称拼写为 puupet
+ROLE_ARM_NAMES = {"qpos": ("puppet", "puupet"), "action": ("master",)}
+
+
+def is_stats_key(key: str) -> bool:
+    return any(key.startswith(prefix) for prefix in STATS_KEY_PREFIXES)
+
+
+def compact_buckets(indices: np.ndarray, counts: np.ndarray):
+    """合并相同桶的计数，返回按桶序号排序的 (桶序号, 计数)"""
+    indices, inverse = np.unique(indices, return_inverse=True)
+    return indices, np.bincount(inverse.ravel(), weights=counts, minlength=indices.size).astype(np.int64)
+
+
+class RunningStats:
+    """逐维度的可合并统计量
+
+    均值和方差按 Chan 的并行算法合并批次，数值稳定；分位数草图按 |x| 的对数分桶
+    (正负值分开计数)，桶计数直接相加即可合并，分位数的相对误差不超过 SKETCH_RELATIVE_ACCURACY。
+    """
+
+    def __init__(self, dim: int):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+        self.min = np.full(dim, np.inf)
+        self.max = np.full(dim, -np.inf)
+        self.zero = np.zeros(dim, dtype=np.int64)
+        # 每个维度的 (桶序号, 计数)
+        self.positive = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)) for _ in range(dim)]
+        self.negative = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)) for _ in range(dim)]
+
+    @property
+    def dim(self) -> int:
+        return self.mean.size
+
+    def update(self, values: np.ndarray):
+        """加入一批 (N, dim) 数据"""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.dim)
+        if values.shape[0] == 0:
+            return
+        batch = RunningStats(self.dim)
+        batch.count = values.shape[0]
+        batch.mean = values.mean(axis=0)
+        batch.m2 = ((values - batch.mean) ** 2).sum(axis=0)
+        batch.min = values.min(axis=0)
+        batch.max = values.max(axis=0)
+        magnitude = np.abs(values)
+        nonzero = magnitude > SKETCH_MIN_VALUE
+        batch.zero = (~nonzero).sum(axis=0)
+        buckets = np.ceil(np.log(np.where(nonzero, magnitude, 1.0)) / math.log(SKETCH_GAMMA)).astype(np.int64)
+        for d in range(self.dim):
+            for store, mask in ((batch.positive, nonzero[:, d] & (values[:, d] > 0)), (batch.negative, nonzero[:, d] & (values[:, d] < 0))):
+                indices, counts = np.unique(buckets[mask, d], return_counts=True)
+                store[d] = (indices, counts.astype(np.int64))
+        self.merge(batch)
+
+    def merge(self, *others: "RunningStats"):
+        """合并其它统计量，多份一起合并时草图只整理一次"""
+        others = [other for other in others if other.count > 0]
+        for other in others:
+            if other.dim != self.dim:
+                raise ValueError(f"Cannot merge stats of dim {other.dim} into dim {self.dim}")
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * other.count / total
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / total
+            self.count = total
+            self.min = np.minimum(self.min, other.min)
+            self.max = np.maximum(self.max, other.max)
+            self.zero = self.zero + other.zero
+        if not others:
+            return
+        for name in ("positive", "negative"):
+            stores = [getattr(self, name)] + [getattr(other, name) for other in others]
+            setattr(self, name, [compact_buckets(np.concatenate([store[d][0] for store in stores]),
+                                                 np.concatenate([store[d][1] for store in stores])) for d in range(self.dim)])
+
+    def std(self, ddof: int = 1) -> np.ndarray:
+        return np.sqrt(self.m2 / max(self.count - ddof, 1))
+
+    def quantile(self, q: float) -> np.ndarray:
+        """按草图估计分位数"""
+        result = np.full(self.dim, np.nan)
+        if self.count == 0:
+            return result
+        rank = q * (self.count - 1)
+        for d in range(self.dim):
+            # 由小到大: 负值桶按 |x| 从大到小，0，正值桶按 |x| 从小到大
+            values = np.concatenate([-self.bucket_value(self.negative[d][0][::-1]), [0.0], self.bucket_value(self.positive[d][0])])
+            counts = np.concatenate([self.negative[d][1][::-1], [self.zero[d]], self.positive[d][1]])
+            result[d] = values[np.searchsorted(np.cumsum(counts), rank, side='right')]
+        return np.clip(result, self.min, self.max)
+
+    @staticmethod
+    def bucket_value(indices: np.ndarray) -> np.ndarray:
+        return 2 * SKETCH_GAMMA ** indices.astype(np.float64) / (SKETCH_GAMMA + 1)
+
+    def summary(self) -> Dict:
+        return {"count": self.count, "mean": self.mean, "std": self.std(), "min": self.min, "max": self.max,
+                "quantiles": {q: self.quantile(q) for q in REPORT_QUANTILES}}
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+                "zero": self.zero, "positive": self.positive, "negative": self.negative}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunningStats":
+        stats = cls(data["mean"].size)
+        for name, value in data.items():
+            setattr(stats, name, value)
+        return stats
+
+
+class EpisodeStats:
+    """写入 episode 时按数据集累积统计量，按批更新以减少逐帧开销"""
+
+    def __init__(self, batch_size: int = 256):
+        self.batch_size = batch_size
+        self.stats = {}
+        self.buffers = {}
+
+    def append(self, key: str, value):
+        if not is_stats_key(key):
+            return
+        value = np.atleast_1d(np.asarray(value, dtype=np.float64)).ravel()
+        if value.size == 0:
+            return
+        if key not in self.stats:
+            self.stats[key] = RunningStats(value.size)
+            self.buffers[key] = []
+        self.buffers[key].append(value)
+        if len(self.buffers[key]) >= self.batch_size:
+            self.flush(key)
+
+    def flush(self, key: str):
+        if self.buffers[key]:
+            self.stats[key].update(np.stack(self.buffers[key]))
+            self.buffers[key] = []
+
+    def finish(self) -> Dict[str, RunningStats]:
+        for key in self.buffers:
+            self.flush(key)
+        return self.stats
+
+
+def compute_episode_stats(path: str) -> Dict[str, RunningStats]:
+    """从已有的 hdf5 文件读取低维数据集计算统计量，用于不是由本次转换写入的 episode"""
+    stats = {}
+    with h5py.File(path, 'r') as root:
+        datasets = {}
+        root.visititems(lambda name, obj: datasets.update({name: obj}) if isinstance(obj, h5py.Dataset) and is_stats_key(name) else None)
+        for key, dataset in datasets.items():
+            values = dataset[()]
+            if values.ndim == 0 or values.size == 0:
+                continue
+            values = values.reshape(values.shape[0], -1)
+            stats[key] = RunningStats(values.shape[1])
+            stats[key].update(values)
+    return stats
+
+
+def merge_stats(partials: List[Dict[str, RunningStats]]) -> Dict[str, RunningStats]:
+    merged = {}
+    for key in sorted({key for partial in partials for key in partial}):
+        stats = [partial[key] for partial in partials if key in partial]
+        merged[key] = RunningStats(stats[0].dim)
+        merged[key].merge(*stats)
+    return merged
+
+
+def select_keys(keys: List[str], role: str) -> List[str]:
+    """默认的 qpos/action 组成: 与 hdf5_to_lerobot 一致，qpos 为 puppet、action 为 master 的关节位置和末端位姿；
+    没有主从臂时 (如 pika) 两者都使用定位位姿"""
+    def is_role_arm(key):
+        return any(name in key.split("/")[-1] for name in ROLE_ARM_NAMES[role])
+    selected = [key for key in keys if key.startswith("arm/jointStatePosition/") and is_role_arm(key)]
+    selected += [key for key in keys if key.startswith("arm/endPose/") and is_role_arm(key)]
+    if not selected:
+        selected = [key for key in keys if key.startswith("localization/pose/")]
+    return selected
+
+
+def get_role_keys(keys: List[str], qpos_keys: Optional[List[str]] = None, action_keys: Optional[List[str]] = None):
+    """返回 (qpos 数据集, action 数据集)，未指定时按 select_keys 选择
+
+    指定的数据集不存在时抛出 ValueError；未指定且没有默认数据集时打印警告并返回空列表，由调用方跳过统计。
+    """
+    selected = {}
+    for role, role_keys, option in (("qpos", qpos_keys, "--statsQposKeys"), ("action", action_keys, "--statsActionKeys")):
+        if role_keys:
+            missing = [key for key in role_keys if key not in keys]
+            if missing:
+                raise ValueError(f"{option} datasets {missing} not found, available datasets: {sorted(keys)}")
+        else:
+            role_keys = select_keys(keys, role)
+            if not role_keys:
+                print(f"Warning: no default {role} datasets (arm names containing {' or '.join(ROLE_ARM_NAMES[role])} "
+                      f"or localization poses) in {sorted(keys)}, skip dataset statistics. Set {option} (comma separated datasets) to enable them")
+        selected[role] = role_keys
+    return selected["qpos"], selected["action"]
+
+
+def build_dataset_stats(merged: Dict[str, RunningStats], episode_count: int,
+                        qpos_keys: Optional[List[str]] = None, action_keys: Optional[List[str]] = None) -> Optional[Dict]:
+    """生成 dataset_stats.pkl 的内容，qpos 或 action 没有可用数据集时返回 None"""
+    keys = sorted(merged.keys())
+    if not keys:
+        print("Warning: no low-dimensional datasets, skip dataset statistics")
+        return None
+    qpos_keys, action_keys = get_role_keys(keys, qpos_keys, action_keys)
+    if not qpos_keys or not action_keys:
+        return None
+    dataset_stats = {"episodes": episode_count, "keys": {key: merged[key].summary() for key in keys},
+                     "qpos_keys": qpos_keys, "action_keys": action_keys}
+    for role, role_keys in (("qpos", qpos_keys), ("action", action_keys)):
+        mean = np.concatenate([merged[key].mean for key in role_keys])
+        std = np.concatenate([merged[key].std() for key in role_keys])
+        dataset_stats[f"{role}_mean"] = mean.astype(np.float32)
+        dataset_stats[f"{role}_std"] = np.clip(std, MIN_STD, np.inf).astype(np.float32)
+    return dataset_stats
+
+
+def load_episode_stats(dataset_dir: str) -> Dict:
+    path = os.path.join(dataset_dir, EPISODE_STATS_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Warning: ignore invalid episode stats {path}: {e}")
+        return {}
+
+
+def save_pickle(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def update_dataset_stats(dataset_dir: str, paths: List[str], partials: Optional[Dict[str, Dict[str, RunningStats]]] = None,
+                         qpos_keys: Optional[List[str]] = None, action_keys: Optional[List[str]] = None) -> Optional[Dict]:
+    """更新 episode 级统计量并重新合并 dataset_stats.pkl
+
+    paths:    数据集中所有 episode 文件
+    partials: 刚写入的 episode 的统计量 {文件路径: {数据集: RunningStats}}
+    已保存的统计量在文件大小和修改时间不变时直接复用，否则从文件重新计算。
+    qpos 或 action 没有可用数据集时两个文件都不写入，返回 None。
+    """
+    episodes = load_episode_stats(dataset_dir)
+    partials = {os.path.abspath(path): stats for path, stats in (partials or {}).items()}
+    updated = {}
+    for path in paths:
+        name = os.path.relpath(os.path.abspath(path), os.path.abspath(dataset_dir))
+        stat = os.stat(path)
+        entry = episodes.get(name)
+        if os.path.abspath(path) in partials:
+            stats = partials[os.path.abspath(path)]
+        elif entry is None or entry["bytes"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+            stats = compute_episode_stats(path)
+        else:
+            stats = {key: RunningStats.from_dict(data) for key, data in entry["stats"].items()}
+        updated[name] = {"bytes": stat.st_size, "mtime": stat.st_mtime_ns, "stats": stats}
+    merged = merge_stats([entry["stats"] for entry in updated.values()])
+    dataset_stats = build_dataset_stats(merged, len(updated), qpos_keys, action_keys)
+    if dataset_stats is None:
+        return None
+    save_pickle(os.path.join(dataset_dir, EPISODE_STATS_FILE),
+                {name: dict(entry, stats={key: stats.to_dict() for key, stats in entry["stats"].items()}) for name, entry in updated.items()})
+    save_pickle(os.path.join(dataset_dir, DATASET_STATS_FILE), dataset_stats)
+    return dataset_stats
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasetDir', action='store', type=str, help='datasetDir',
+                        default="/home/agilex/data", required=False)
+    parser.add_argument('--pattern', action='store', type=str, help='glob pattern of episode files',
+                        default="**/*.hdf5", required=False)
+    parser.add_argument('--statsQposKeys', action='store', type=str, help='statsQposKeys, comma separated',
+                        default="", required=False)
+    parser.add_argument('--statsActionKeys', action='store', type=str, help='statsActionKeys, comma separated',
+                        default="", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    paths = get_episode_paths(args.datasetDir, args.pattern)
+    dataset_stats = update_dataset_stats(args.datasetDir, paths, qpos_keys=[key for key in args.statsQposKeys.split(",") if key],
+                                         action_keys=[key for key in args.statsActionKeys.split(",") if key])
+    if dataset_stats is None:
+        return
+    print(f"Stats {os.path.join(args.datasetDir, DATASET_STATS_FILE)}: {dataset_stats['episodes']} episodes, "
+          f"qpos {dataset_stats['qpos_keys']}, action {dataset_stats['action_keys']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lossless uint16 depth codec.
+Each frame is stored independently: row-wise delta, zigzag mapping, low/high byte
+planes, then zlib. Decoding is a single inflate plus a cumulative sum per row.
+"""
+
+import zlib
+import struct
+import numpy as np
+
+
+DEPTH_CODEC_MAGIC = b"DPZ1"
+DEPTH_CODEC_HEADER = struct.Struct("<4sII")
+
+
+def is_encoded_depth(data: np.ndarray) -> bool:
+    """判断编码字节是否为本编码格式"""
+    return data.size >= DEPTH_CODEC_HEADER.size and data[:4].tobytes() == DEPTH_CODEC_MAGIC
+
+
+def encode_depth(depth: np.ndarray, level: int = 3) -> np.ndarray:
+    """把 (H, W) uint16 深度图编码为 uint8 字节数组"""
+    if depth.ndim != 2 or depth.dtype != np.uint16:
+        raise ValueError(f"Depth codec expects a (H, W) uint16 image, got {depth.shape} {depth.dtype}")
+    height, width = depth.shape
+    depth = np.ascontiguousarray(depth)
+    # 行内差分，uint16 按模 2^16 回绕，保证无损
+    delta = depth.copy()
+    delta[:, 1:] -= depth[:, :-1]
+    # zigzag 映射使小的负差分也落在低位，高字节平面几乎全为 0
+    signed = delta.view(np.int16)
+    zigzag = ((signed << 1) ^ (signed >> 15)).view(np.uint16)
+    planes = np.stack([zigzag & 0xFF, zigzag >> 8]).astype(np.uint8)
+    payload = zlib.compress(planes.tobytes(), level)
+    return np.frombuffer(DEPTH_CODEC_HEADER.pack(DEPTH_CODEC_MAGIC, height, width) + payload, dtype=np.uint8)
+
+
+def decode_depth(data: np.ndarray) -> np.ndarray:
+    """把 encode_depth 的输出解码为 (H, W) uint16 深度图"""
+    magic, height, width = DEPTH_CODEC_HEADER.unpack(data[:DEPTH_CODEC_HEADER.size].tobytes())
+    if magic != DEPTH_CODEC_MAGIC:
+        raise ValueError("Invalid depth codec header")
+    planes = np.frombuffer(zlib.decompress(data[DEPTH_CODEC_HEADER.size:].tobytes()), dtype=np.uint8).reshape(2, height * width)
+    zigzag = (planes[0].astype(np.uint16) | (planes[1].astype(np.uint16) << 8)).reshape(height, width)
+    delta = (zigzag >> 1) ^ (np.uint16(0) - (zigzag & 1))
+    return np.cumsum(delta, axis=1, dtype=np.uint16)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for farthest point sampling.
+Generates synthetic tabletop scenes and times point_cloud_sampling against the
+original per-selection np.linalg.norm loop and Open3D's farthest_point_down_sample.
+The coverage radius (largest distance from any point to the sampled set) is
+reported alongside the time to compare sample quality.
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from point_cloud_sampling import farthest_point_sampling, farthest_point_sampling_batch
+
+
+def legacy_farthest_point_sampling(points, k):
+    """原 camera_point_cloud_filter.Operator.farthest_point_sampling"""
+    sampled_points = [np.random.randint(len(points))]
+    distances = np.linalg.norm(points - points[sampled_points[-1]], axis=1)
+    for _ in range(k - 1):
+        farthest_index = np.argmax(distances)
+        sampled_points.append(farthest_index)
+        distances = np.minimum(distances, np.linalg.norm(points - points[farthest_index], axis=1))
+    return sampled_points
+
+
+def open3d_farthest_point_sampling(points, k):
+    import open3d as o3d
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points[:, :3].astype(np.float64))
+    return np.asarray(pcd.farthest_point_down_sample(k).points)
+
+
+def generate_scene(rng: np.random.Generator, count: int) -> np.ndarray:
+    """桌面场景: 一个桌面平面、几个盒状物体和稀疏背景，返回 (count, 6) float32"""
+    table_count, object_count = count // 2, count * 3 // 10
+    background_count = count - table_count - object_count
+    table = np.column_stack((rng.uniform(-0.5, 0.5, table_count), rng.uniform(-0.3, 0.3, table_count),
+                             rng.normal(0.8, 0.002, table_count)))
+    centers = rng.uniform([-0.3, -0.2, 0.6], [0.3, 0.2, 0.75], (5, 3))
+    objects = centers[rng.integers(0, 5, object_count)] + rng.uniform(-0.05, 0.05, (object_count, 3))
+    background = rng.uniform([-1.5, -1.0, 1.0], [1.5, 1.0, 3.0], (background_count, 3))
+    xyz = np.concatenate((table, objects, background)).astype(np.float32)
+    colors = rng.integers(0, 256, (count, 3)).astype(np.float32)
+    return np.concatenate((xyz, colors), axis=1)
+
+
+def coverage_radius(points: np.ndarray, samples: np.ndarray, chunk: int = 64) -> float:
+    """所有点到采样点集合的最大距离"""
+    xyz = points[:, :3].astype(np.float32)
+    samples = samples[:, :3].astype(np.float32)
+    distances = np.full(xyz.shape[0], np.inf, dtype=np.float32)
+    for start in range(0, samples.shape[0], chunk):
+        block = samples[start:start + chunk]
+        squared = (xyz ** 2).sum(axis=1)[np.newaxis] - 2 * block @ xyz.T + (block ** 2).sum(axis=1)[:, np.newaxis]
+        np.minimum(distances, squared.min(axis=0), out=distances)
+    return float(np.sqrt(max(distances.max(), 0.0)))
+
+
+def run_method(method: str, points: np.ndarray, k: int, args) -> np.ndarray:
+    """返回采样后的点"""
+    if method == 'engine':
+        return points[farthest_point_sampling(points, k, seed=args.seed)]
+    if method == 'engine_voxel':
+        return points[farthest_point_sampling(points, k, seed=args.seed, voxel_size=args.voxelSize)]
+    if method == 'legacy':
+        return points[legacy_farthest_point_sampling(points[:, :3], k)]
+    if method == 'open3d':
+        return open3d_farthest_point_sampling(points, k)
+    raise ValueError(f"unsupported method {method}")
+
+
+def benchmark(args) -> List[Dict]:
+    results = []
+    rng = np.random.default_rng(args.seed)
+    methods = [method.strip() for method in args.methods.split(",") if method.strip()]
+    for count in [int(value) for value in args.pointCounts.split(",") if value.strip()]:
+        points = generate_scene(rng, count)
+        for k in [int(value) for value in args.sampleCounts.split(",") if value.strip()]:
+            for method in methods:
+                if method == 'legacy' and count * k > args.legacyMaxWork:
+                    print(f"{count} points, k {k}, {method}: skipped, raise --legacyMaxWork to run")
+                    continue
+                try:
+                    times = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        samples = run_method(method, points, k, args)
+                        times.append(time.perf_counter() - start)
+                except ImportError as e:
+                    print(f"{count} points, k {k}, {method}: skipped, {e}")
+                    continue
+                result = {"points": count, "k": k, "method": method, "seconds": min(times)}
+                if args.useCoverage:
+                    result["coverageRadius"] = coverage_radius(points, samples)
+                results.append(result)
+                print(f"{count} points, k {k}, {method}: {result['seconds']:.3f}s"
+                      + (f", coverage radius {result['coverageRadius']:.4f}m" if args.useCoverage else ""))
+        if args.batchSize > 1:
+            # 同样大小的点云成批采样，摊薄每次选择的 Python 开销
+            batch = np.stack([generate_scene(rng, count) for _ in range(args.batchSize)])
+            k = int(args.sampleCounts.split(",")[0])
+            start = time.perf_counter()
+            farthest_point_sampling_batch(batch, k, seed=args.seed)
+            seconds = time.perf_counter() - start
+            results.append({"points": count, "k": k, "method": f"engine_batch{args.batchSize}", "seconds": seconds / args.batchSize})
+            print(f"{count} points, k {k}, engine batch of {args.batchSize}: {seconds / args.batchSize:.3f}s per cloud")
+    return results
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', action='store', type=str, help='output json file',
+                        default='fps_benchmark.json', required=False)
+    parser.add_argument('--pointCounts', action='store', type=str, help='points per cloud, comma separated',
+                        default='50000,300000', required=False)
+    parser.add_argument('--sampleCounts', action='store', type=str, help='sampled points, comma separated',
+                        default='1024,5000', required=False)
+    parser.add_argument('--methods', action='store', type=str, help='methods, comma separated: engine, engine_voxel, legacy, open3d',
+                        default='engine,engine_voxel,legacy,open3d', required=False)
+    parser.add_argument('--voxelSize', action='store', type=float, help='voxel size of the engine_voxel pre-pass',
+                        default=0.005, required=False)
+    parser.add_argument('--batchSize', action='store', type=int, help='batchSize',
+                        default=8, required=False)
+    parser.add_argument('--legacyMaxWork', action='store', type=int, help='skip legacy above points * k',
+                        default=300000 * 1024, required=False)
+    parser.add_argument('--useCoverage', action='store', type=bool, help='useCoverage',
+                        default=True, required=False)
+    parser.add_argument('--repeat', action='store', type=int, help='repeat',
+                        default=1, required=False)
+    parser.add_argument('--seed', action='store', type=int, help='seed',
+                        default=0, required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    np.random.seed(args.seed)
+    results = benchmark(args)
+    with open(args.output, 'w') as f:
+        json.dump({"settings": {key: value for key, value in vars(args).items() if key != 'output'}, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
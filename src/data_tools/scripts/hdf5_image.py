@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Image storage helpers for episode hdf5 files.
+Camera datasets hold either relative file paths (useIndex), decoded arrays, the
+original JPEG/PNG bytes as variable-length uint8 (useEncodedImage), or depth frames
+encoded with depth_codec (useDepthCodec).
+"""
+
+import os
+import cv2
+import h5py
+import numpy as np
+from depth_codec import is_encoded_depth, decode_depth
+
+
+ENCODED_IMAGE_DTYPE = h5py.vlen_dtype(np.dtype(np.uint8))
+
+
+def is_encoded_image(dataset) -> bool:
+    """判断数据集是否为原始编码字节"""
+    return h5py.check_vlen_dtype(dataset.dtype) == np.dtype(np.uint8)
+
+
+def read_image_bytes(path: str) -> np.ndarray:
+    """读取图像文件的原始字节，不解码"""
+    with open(path, 'rb') as file:
+        return np.frombuffer(file.read(), dtype=np.uint8)
+
+
+def read_image_data(dataset, index: int, episode_dir: str):
+    """读取第 index 帧未解码的数据: 编码字节、图像文件路径或解码后数组"""
+    if is_encoded_image(dataset):
+        return dataset[index]
+    if dataset.ndim == 1:
+        return os.path.join(episode_dir, dataset[index].decode('utf-8'))
+    return dataset[index]
+
+
+def decode_image_data(data, flags: int = cv2.IMREAD_UNCHANGED) -> np.ndarray:
+    """解码 read_image_data 的结果，可在线程中并行执行"""
+    if isinstance(data, str):
+        return cv2.imread(data, flags)
+    if data.dtype == np.uint8 and data.ndim == 1:
+        # 深度无损编码的帧直接解码为 uint16
+        if is_encoded_depth(data):
+            return decode_depth(data)
+        return cv2.imdecode(data, flags)
+    return data
+
+
+def read_image(dataset, index: int, episode_dir: str, flags: int = cv2.IMREAD_UNCHANGED) -> np.ndarray:
+    """读取第 index 帧图像，兼容相对路径、解码后数组和原始编码字节三种存储方式"""
+    return decode_image_data(read_image_data(dataset, index, episode_dir), flags)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Storage profile benchmark for data_to_hdf5.
+Converts one recorded episode with every storage profile and reports the file size,
+conversion time and per-sample random-read latency of each profile.
+"""
+
+import os
+import json
+import time
+import argparse
+import contextlib
+import io
+import h5py
+import numpy as np
+import yaml
+
+from data_to_hdf5 import Operator, STORAGE_PROFILES
+
+
+def convert_episode(args, profile: str, target_dir: str) -> str:
+    """按指定存储配置转换 episode，返回 hdf5 路径"""
+    episode_args = argparse.Namespace(**vars(args))
+    episode_args.datasetTargetDir = target_dir
+    episode_args.storageProfile = profile
+    os.makedirs(target_dir, exist_ok=True)
+    operator = Operator(episode_args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        operator.process()
+    return operator.dataFile
+
+
+def measure_random_read(path: str, profile: str, samples: int, seed: int) -> dict:
+    """模拟训练时的随机读取: 每个样本重新打开文件，读取所有逐帧数据集的同一帧"""
+    with h5py.File(path, 'r') as root:
+        size = int(root['size'][()])
+        keys = []
+        root.visititems(lambda name, obj: keys.append(name) if isinstance(obj, h5py.Dataset) and obj.ndim > 0 and obj.shape[0] == size else None)
+    if size == 0:
+        return {"samples": 0}
+    indices = np.random.default_rng(seed).integers(0, size, samples)
+    latencies = []
+    for index in indices.tolist():
+        start = time.perf_counter()
+        with h5py.File(path, 'r', rdcc_nbytes=STORAGE_PROFILES[profile]["cacheBytes"]) as root:
+            for key in keys:
+                root[key][index]
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+    return {"samples": samples, "datasets": len(keys), "meanMs": float(latencies.mean()),
+            "p50Ms": float(np.percentile(latencies, 50)), "p95Ms": float(np.percentile(latencies, 95))}
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasetDir', action='store', type=str, help='datasetDir',
+                        default="/home/agilex/data", required=False)
+    parser.add_argument('--episodeName', action='store', type=str, help='episodeName',
+                        default="episode0", required=False)
+    parser.add_argument('--benchmarkDir', action='store', type=str, help='benchmarkDir',
+                        default="/tmp/hdf5_storage_benchmark", required=False)
+    parser.add_argument('--output', action='store', type=str, help='output json file',
+                        default="hdf5_storage_benchmark.json", required=False)
+    parser.add_argument('--profiles', action='store', type=str, help='storage profiles, comma separated',
+                        default=",".join(STORAGE_PROFILES.keys()), required=False)
+    parser.add_argument('--samples', action='store', type=int, help='random read samples',
+                        default=200, required=False)
+    parser.add_argument('--seed', action='store', type=int, help='seed',
+                        default=0, required=False)
+    parser.add_argument('--useEncodedImage', action='store', type=bool, help='useEncodedImage',
+                        default=False, required=False)
+    parser.add_argument('--useDepthCodec', action='store', type=bool, help='useDepthCodec',
+                        default=False, required=False)
+    parser.add_argument('--useCameraPointCloud', action='store', type=bool, help='useCameraPointCloud',
+                        default=False, required=False)
+    parser.add_argument('--useCameraPointCloudNormalization', action='store', type=bool, help='useCameraPointCloudNormalization',
+                        default=True, required=False)
+    parser.add_argument('--type', action='store', type=str, help='type',
+                        default="aloha", required=False)
+    args = parser.parse_args()
+
+    with open(f'../config/{args.type}_data_params.yaml', 'r') as file:
+        yaml_data = yaml.safe_load(file)
+        args.cameraColorNames = yaml_data['dataInfo']['camera']['color']['names']
+        args.cameraDepthNames = yaml_data['dataInfo']['camera']['depth']['names']
+        args.cameraPointCloudNames = yaml_data['dataInfo']['camera']['pointCloud']['names'] if args.useCameraPointCloud else []
+        args.armJointStateNames = yaml_data['dataInfo']['arm']['jointState']['names']
+        args.armEndPoseNames = yaml_data['dataInfo']['arm']['endPose']['names']
+        args.localizationPoseNames = yaml_data['dataInfo']['localization']['pose']['names']
+        args.gripperEncoderNames = yaml_data['dataInfo']['gripper']['encoder']['names']
+        args.imu9AxisNames = yaml_data['dataInfo']['imu']['9axis']['names']
+        args.lidarPointCloudNames = yaml_data['dataInfo']['lidar']['pointCloud']['names']
+        args.robotBaseVelNames = yaml_data['dataInfo']['robotBase']['vel']['names']
+        args.liftMotorNames = yaml_data['dataInfo']['lift']['motor']['names']
+    # 基准测试总是把数据写入 hdf5，并使用默认的流式写入和并行读取
+    args.useIndex = False
+    args.useStreamWrite = True
+    args.streamBufferSize = 32
+    args.readWorkers = 4
+    args.readQueueSize = 16
+    args.useCatalog = False
+    return args
+
+
+def main():
+    args = get_arguments()
+    results = []
+    for profile in [profile.strip() for profile in args.profiles.split(",") if profile.strip()]:
+        if profile not in STORAGE_PROFILES:
+            print(f"Error: unknown storage profile {profile}")
+            return
+        start = time.perf_counter()
+        path = convert_episode(args, profile, os.path.join(args.benchmarkDir, profile))
+        result = {"profile": profile, "fileBytes": os.path.getsize(path), "writeSeconds": time.perf_counter() - start}
+        result["randomRead"] = measure_random_read(path, profile, args.samples, args.seed)
+        results.append(result)
+        print(f"{profile}: {result['fileBytes'] / 1024 ** 2:.1f} MB, write {result['writeSeconds']:.2f}s, "
+              f"random read mean {result['randomRead'].get('meanMs', 0):.2f} ms, p95 {result['randomRead'].get('p95Ms', 0):.2f} ms")
+    with open(args.output, 'w') as f:
+        json.dump({"episode": os.path.join(args.datasetDir, args.episodeName), "useEncodedImage": bool(args.useEncodedImage),
+                   "useDepthCodec": bool(args.useDepthCodec),
+                   "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
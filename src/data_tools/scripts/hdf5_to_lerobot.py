@@ -21,6 +21,15 @@ import os
 import argparse
 import math
 import yaml
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from hdf5_image import read_image_data, decode_image_data
+from point_cloud_io import load_point_cloud
+import json
+from dataset_catalog import get_episode_paths, get_episode_entries
+from lerobot_shards import SOURCE_EPISODES_PATH, load_jsonl, merge_shards
 
 
 @dataclasses.dataclass(frozen=True)
@@ -35,6 +44,32 @@ class DatasetConfig:
 DEFAULT_DATASET_CONFIG = DatasetConfig()
 
 
+def append_source_episode(root: Path, source: dict):
+    """记录 LeRobot episode 来源的 hdf5 文件及其内容哈希，追加导出时据此跳过已导出的文件"""
+    path = root / SOURCE_EPISODES_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(source) + "\n")
+
+
+def open_existing_dataset(
+    args,
+    dataset_config: DatasetConfig = DEFAULT_DATASET_CONFIG,
+) -> LeRobotDataset:
+    """打开已有的 LeRobot 数据集用于追加 episode"""
+    dataset = LeRobotDataset(
+        repo_id=args.datasetName,
+        root=args.targetDir,
+        tolerance_s=dataset_config.tolerance_s,
+        video_backend=dataset_config.video_backend,
+    )
+    dataset.start_image_writer(
+        num_processes=dataset_config.image_writer_processes,
+        num_threads=dataset_config.image_writer_threads,
+    )
+    return dataset
+
+
 def create_empty_dataset(
     args,
     mode: Literal["video", "image"] = "video",
@@ -100,8 +135,12 @@ def create_empty_dataset(
     if args.useCameraPointCloud:
         for camera in args.cameraPointCloudNames:
             features[f"observation.pointClouds.{camera}"] = {
-                "dtype": "float64",
-                "shape": ((args.pointNum * 6),)
+                "dtype": "float32",
+                "shape": (args.pointNum, 6),
+                "names": [
+                    "points",
+                    "xyzrgb",
+                ],
             }
 
     return LeRobotDataset.create(
@@ -118,46 +157,70 @@ def create_empty_dataset(
     )
 
 
-def load_episode_data(
+def load_episode_states(
     args,
-    episode_path: Path,
+    episode: h5py.File,
 ):
-    with h5py.File(episode_path, "r") as episode:
-        states = torch.from_numpy(
-            np.concatenate(
-                [episode[f"arm/jointStatePosition/{name}"][()] for name in args.armJointStateNames if "puppet" in name] + \
-                [episode[f"arm/endPose/{name}"][()] for name in args.armEndPoseNames if "puppet" in name], axis=1
-            )
+    states = torch.from_numpy(
+        np.concatenate(
+            [episode[f"arm/jointStatePosition/{name}"][()] for name in args.armJointStateNames if "puppet" in name] + \
+            [episode[f"arm/endPose/{name}"][()] for name in args.armEndPoseNames if "puppet" in name], axis=1
         )
-        actions = torch.from_numpy(
-            np.concatenate(
-                [episode[f"arm/jointStatePosition/{name}"][()] for name in args.armJointStateNames if "master" in name] + \
-                [episode[f"arm/endPose/{name}"][()] for name in args.armEndPoseNames if "master" in name], axis=1
-            )
+    )
+    actions = torch.from_numpy(
+        np.concatenate(
+            [episode[f"arm/jointStatePosition/{name}"][()] for name in args.armJointStateNames if "master" in name] + \
+            [episode[f"arm/endPose/{name}"][()] for name in args.armEndPoseNames if "master" in name], axis=1
         )
-        colors = {}
-        for camera in args.cameraColorNames:
-            colors[camera] = []
-            for i in range(episode[f'camera/color/{camera}'].shape[0]):
-                colors[camera].append(cv2.cvtColor(cv2.imread(
-                    os.path.join(str(episode_path.resolve())[:-9], episode[f'camera/color/{camera}'][i].decode('utf-8')),
-                    cv2.IMREAD_UNCHANGED), cv2.COLOR_BGR2RGB))
-            colors[camera] = colors[camera]
-        depths = {}
-        # for camera in args.cameraDepthNames:
-        #     depths[camera] = []
-        #     for i in range(episode[f'camera/depth/{camera}'].shape[0]):
-        #         depths[camera].append(cv2.imread(
-        #             os.path.join(str(episode_path.resolve())[:-9], episode[f'camera/depth/{camera}'][i].decode('utf-8')),
-        #             cv2.IMREAD_UNCHANGED))
-        pointclouds = {}
-        if args.useCameraPointCloud:
-            for camera in args.cameraPointCloudNames:
-                pointclouds[camera] = []
-                for i in range(episode[f'camera/pointCloud/{camera}'].shape[0]):
-                    pointclouds[camera].append(np.load(
-                        os.path.join(str(episode_path.resolve())[:-9], episode[f'camera/color/{camera}'][i].decode('utf-8'))))
-    return colors, depths, pointclouds, states, actions
+    )
+    return states, actions
+
+
+def decode_frame(frame: dict, images: dict, pointclouds: dict) -> dict:
+    """在线程池中解码一帧的图像和点云，cv2 解码时释放 GIL"""
+    for key, data in images.items():
+        frame[key] = cv2.cvtColor(decode_image_data(data), cv2.COLOR_BGR2RGB)
+    # for key, data in depths.items():
+    #     frame[key] = decode_image_data(data)
+    for key, path in pointclouds.items():
+        # 逐帧张量可能为 float16，统一为特征声明的 float32 (pointNum, 6)
+        frame[key] = np.asarray(load_point_cloud(path), dtype=np.float32).reshape(-1, 6)
+    return frame
+
+
+def produce_frames(
+    args,
+    hdf5_files: list[Path],
+    task: str,
+    executor: ThreadPoolExecutor,
+    frame_queue: queue.Queue,
+):
+    """按顺序提交各 episode 每一帧的解码任务，episode 结束时放入 None
+
+    队列有界，最多预取 readQueueSize 帧；当前 episode 在 save_episode 编码时，
+    下一个 episode 的帧已经在解码。
+    """
+    try:
+        for episode_path in hdf5_files:
+            episode_dir = str(episode_path.resolve())[:-9]
+            with h5py.File(episode_path, "r") as episode:
+                states, actions = load_episode_states(args, episode)
+                for i in range(states.shape[0]):
+                    frame = {
+                        'task': task,
+                        "observation.state": states[i],
+                        "action": actions[i],
+                    }
+                    images = {f"observation.images.{camera}": read_image_data(episode[f'camera/color/{camera}'], i, episode_dir)
+                              for camera in args.cameraColorNames}
+                    pointclouds = {}
+                    if args.useCameraPointCloud:
+                        pointclouds = {f"observation.pointClouds.{camera}": os.path.join(episode_dir, episode[f'camera/pointCloud/{camera}'][i].decode('utf-8'))
+                                       for camera in args.cameraPointCloudNames}
+                    frame_queue.put(executor.submit(decode_frame, frame, images, pointclouds))
+            frame_queue.put(None)
+    except Exception as e:
+        frame_queue.put(e)
 
 
 def populate_dataset(
@@ -165,34 +228,83 @@ def populate_dataset(
     dataset: LeRobotDataset,
     hdf5_files: list[Path],
     task: str,
+    hashes: list[str] | None = None,
 ) -> LeRobotDataset:
     episodes = range(len(hdf5_files))
+    frame_queue = queue.Queue(maxsize=max(1, args.readQueueSize))
+
+    with ThreadPoolExecutor(max_workers=max(1, args.readWorkers)) as executor:
+        producer = threading.Thread(target=produce_frames, args=(args, hdf5_files, task, executor, frame_queue), daemon=True)
+        producer.start()
+        for ep_idx in tqdm.tqdm(episodes):
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                dataset.add_frame(item.result())
+
+            dataset.save_episode()
+            if hashes is not None:
+                append_source_episode(Path(args.targetDir), {"episode_index": dataset.meta.total_episodes - 1,
+                                                             "source": str(hdf5_files[ep_idx]), "sha256": hashes[ep_idx]})
+        producer.join()
 
-    for ep_idx in tqdm.tqdm(episodes):
-        episode_path = hdf5_files[ep_idx]
-
-        colors, depths, pointclouds, states, actions = load_episode_data(args, episode_path)
-        num_frames = states.shape[0]
+    return dataset
 
-        for i in range(num_frames):
-            frame = {
-                'task': task,
-                "observation.state": states[i],
-                "action": actions[i],
-            }
-            for camera, color in colors.items():
-                frame[f"observation.images.{camera}"] = color[i]
-            # for camera, depth in depths.items():
-            #     frame[f"observation.depths.{camera}"] = depth[i]
-            if args.useCameraPointCloud:
-                for camera, pointcloud in pointclouds.items():
-                    frame[f"observation.pointClouds.{camera}"] = pointcloud[i]
 
-            dataset.add_frame(frame)
+def export_shard(
+    args,
+    hdf5_files: list[Path],
+    hashes: list[str],
+    shard_dir: Path,
+    dataset_config: DatasetConfig,
+) -> int:
+    """在子进程中把一组 episode 导出为独立的分片数据集"""
+    shard_args = argparse.Namespace(**vars(args))
+    shard_args.targetDir = str(shard_dir)
+    dataset = create_empty_dataset(
+        shard_args,
+        dataset_config=dataset_config,
+    )
+    populate_dataset(
+        shard_args,
+        dataset,
+        hdf5_files,
+        task=args.instruction,
+        hashes=hashes,
+    )
+    dataset.stop_image_writer()
+    return len(hdf5_files)
 
-        dataset.save_episode()
 
-    return dataset
+def export_parallel(
+    args,
+    hdf5_files: list[Path],
+    hashes: list[str],
+    dataset_config: DatasetConfig,
+):
+    """多个 episode 同时导出到临时分片，再按原顺序合并到 targetDir，视频不重新编码"""
+    workers = min(args.exportWorkers, len(hdf5_files))
+    shard_root = Path(args.targetDir).parent / (Path(args.targetDir).name + ".shards")
+    if shard_root.exists():
+        shutil.rmtree(shard_root)
+    shard_root.mkdir(parents=True)
+    shards = [shard_root / f"shard{k:03d}" for k in range(workers)]
+    # 轮流分配 episode，使各分片的工作量接近
+    assignments = [list(range(k, len(hdf5_files), workers)) for k in range(workers)]
+    # 分片本身已在独立进程中运行，图像只用线程写入；每个写入进程都会再导入一次 torch，
+    # exportWorkers 个分片各带写入进程时内存占用成倍增加
+    shard_config = dataclasses.replace(dataset_config, image_writer_processes=0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(export_shard, args, [hdf5_files[i] for i in assignment], [hashes[i] for i in assignment], shards[k], shard_config)
+                   for k, assignment in enumerate(assignments)]
+        for future in futures:
+            future.result()
+    order = sorted((assignment[j], k, j) for k, assignment in enumerate(assignments) for j in range(len(assignment)))
+    merge_shards(Path(args.targetDir), shards, [(k, j) for _, k, j in order])
+    shutil.rmtree(shard_root)
 
 
 def process(
@@ -203,20 +315,47 @@ def process(
     dataset_dir = Path(args.datasetDir)
     if not dataset_dir.exists():
         raise ValueError("dataset_dir does not exist")
-    if Path(args.targetDir).exists():
+
+    # episode 列表来自数据集根目录的 catalog.json，不再递归扫描整个数据集目录
+    hdf5_files = [Path(path) for path in get_episode_paths(args.datasetDir, "**/data.hdf5", args.rescanCatalog)]
+    hashes = [entry["sha256"] for entry in get_episode_entries([str(path) for path in hdf5_files])]
+
+    if args.append and not (Path(args.targetDir) / SOURCE_EPISODES_PATH).exists() and Path(args.targetDir).exists():
+        print(f"Warning: {args.targetDir} has no {SOURCE_EPISODES_PATH}, export all episodes again")
+    if args.append and (Path(args.targetDir) / SOURCE_EPISODES_PATH).exists():
+        # 追加模式: 只导出内容哈希未出现在已有数据集中的 episode
+        exported = {source["sha256"] for source in load_jsonl(Path(args.targetDir) / SOURCE_EPISODES_PATH)}
+        pending = [i for i in range(len(hdf5_files)) if hashes[i] not in exported]
+        print(f"Append {len(pending)} new episodes, skip {len(hdf5_files) - len(pending)} exported episodes")
+        if not pending:
+            return
+        hdf5_files = [hdf5_files[i] for i in pending]
+        hashes = [hashes[i] for i in pending]
+    elif Path(args.targetDir).exists():
         shutil.rmtree(Path(args.targetDir))
 
-    hdf5_files = sorted(dataset_dir.glob("**/data.hdf5"))
+    if args.exportWorkers > 1 and len(hdf5_files) > 1 and dataset_config.use_videos:
+        export_parallel(args, hdf5_files, hashes, dataset_config)
+        if push_to_hub:
+            LeRobotDataset(repo_id=args.datasetName, root=args.targetDir).push_to_hub()
+        return
 
-    dataset = create_empty_dataset(
-        args,
-        dataset_config=dataset_config,
-    )
+    if (Path(args.targetDir) / SOURCE_EPISODES_PATH).exists():
+        dataset = open_existing_dataset(
+            args,
+            dataset_config=dataset_config,
+        )
+    else:
+        dataset = create_empty_dataset(
+            args,
+            dataset_config=dataset_config,
+        )
     dataset = populate_dataset(
         args,
         dataset,
         hdf5_files,
         task=args.instruction,
+        hashes=hashes,
     )
 
     if push_to_hub:
@@ -235,6 +374,16 @@ def get_arguments():
                         default="null", required=False)
     parser.add_argument('--targetDir', action='store', type=str, help='targetDir',
                         default="/home/agilex/data", required=False)
+    parser.add_argument('--exportWorkers', action='store', type=int, help='exportWorkers',
+                        default=1, required=False)
+    parser.add_argument('--append', action='store', type=bool, help='append',
+                        default=False, required=False)
+    parser.add_argument('--rescanCatalog', action='store', type=bool, help='rescanCatalog',
+                        default=False, required=False)
+    parser.add_argument('--readWorkers', action='store', type=int, help='readWorkers',
+                        default=4, required=False)
+    parser.add_argument('--readQueueSize', action='store', type=int, help='readQueueSize',
+                        default=32, required=False)
     parser.add_argument('--robotType', action='store', type=str, help='robotType',
                         default="cobot_magic", required=False)
     parser.add_argument('--fps', action='store', type=int, help='fps',
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end check of the parallel and append paths of hdf5_to_lerobot.py.
+Builds synthetic episodes for a config type in the data_to_hdf5.py --useIndex layout,
+exports them with one worker, with --exportWorkers workers and by appending the last
+episodes to serial and parallel exports, then requires every result to match the
+serial export: meta files, parquet tables and decoded video frames. Each result is
+also loaded with LeRobotDataset. Needs lerobot and pyarrow installed.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import cv2
+import h5py
+import numpy as np
+import yaml
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import List
+
+META_FILES = ["info.json", "episodes.jsonl", "tasks.jsonl", "episodes_stats.jsonl", "stats.json", "source_episodes.jsonl"]
+
+
+def build_episode(episode_dir: str, config: dict, index: int, frames: int, point_num: int):
+    """按 data_to_hdf5.py --useIndex 布局生成一个 episode，内容只由 index 决定"""
+    rng = np.random.default_rng(index)
+    info = config['dataInfo']
+    with h5py.File(os.path.join(episode_dir, "data.hdf5"), "w") as root:
+        for name in info['arm']['jointState']['names']:
+            root[f"arm/jointStatePosition/{name}"] = rng.normal(size=(frames, 7))
+        for name in info['arm']['endPose']['names']:
+            root[f"arm/endPose/{name}"] = rng.normal(size=(frames, 7))
+        for name in info['camera']['color']['names']:
+            os.makedirs(os.path.join(episode_dir, f"camera/color/{name}"), exist_ok=True)
+            paths = []
+            for i in range(frames):
+                image = np.zeros((480, 640, 3), dtype=np.uint8)
+                image[:, :, 0] = (i * 20 + index * 40) % 255
+                cv2.circle(image, (100 + 10 * i, 200), 40, (0, 255, 0), -1)
+                paths.append(f"camera/color/{name}/{i}.jpg")
+                cv2.imwrite(os.path.join(episode_dir, paths[-1]), image)
+            root[f"camera/color/{name}"] = np.array(paths, dtype=h5py.string_dtype())
+        for name in info['camera']['pointCloud']['names']:
+            os.makedirs(os.path.join(episode_dir, f"camera/pointCloud/{name}-normalization"), exist_ok=True)
+            paths = []
+            for i in range(frames):
+                point_cloud = np.concatenate([rng.uniform(-1, 1, (point_num, 3)), rng.uniform(0, 255, (point_num, 3))], axis=1)
+                paths.append(f"camera/pointCloud/{name}-normalization/{i}.npy")
+                np.save(os.path.join(episode_dir, paths[-1]), point_cloud.astype(np.float32))
+            root[f"camera/pointCloud/{name}"] = np.array(paths, dtype=h5py.string_dtype())
+        root["timestamp"] = np.arange(frames) / 30.0
+
+
+def build_episodes(dataset_dir: str, config: dict, first: int, count: int, args):
+    for index in range(first, first + count):
+        episode_dir = os.path.join(dataset_dir, f"episode{index}")
+        os.makedirs(episode_dir, exist_ok=True)
+        build_episode(episode_dir, config, index, args.frames + index, args.pointNum)
+
+
+def export(dataset_dir: str, target_dir: str, workers: int, args, append: bool = False, instruction: str = "null"):
+    """以命令行方式运行 hdf5_to_lerobot.py，工作目录为脚本目录以读取 ../config"""
+    command = [sys.executable, "hdf5_to_lerobot.py", "--type", args.type, "--datasetDir", dataset_dir,
+               "--targetDir", target_dir, "--datasetName", f"check/{os.path.basename(target_dir)}",
+               "--exportWorkers", str(workers), "--rescanCatalog", "1", "--instruction", instruction,
+               "--pointNum", str(args.pointNum)]
+    if append:
+        command += ["--append", "1"]
+    if args.useCameraPointCloud:
+        command += ["--useCameraPointCloud", "1"]
+    with open(target_dir + ".log", "a") as log:
+        subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=log, stderr=subprocess.STDOUT, check=True)
+
+
+def load_meta(path: Path):
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        if path.suffix == ".json":
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_video(path: Path) -> List[np.ndarray]:
+    import av
+    with av.open(str(path)) as container:
+        return [frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)]
+
+
+def compare_datasets(expected: Path, actual: Path) -> List[str]:
+    """返回两个 LeRobot 数据集之间的差异描述，为空表示一致"""
+    differences = [f"meta/{name}" for name in META_FILES if load_meta(expected / "meta" / name) != load_meta(actual / "meta" / name)]
+    info = load_meta(expected / "meta/info.json")
+    for episode_index in range(info["total_episodes"]):
+        chunk = episode_index // info["chunks_size"]
+        data_path = info["data_path"].format(episode_chunk=chunk, episode_index=episode_index)
+        if not (actual / data_path).exists() or not pq.read_table(expected / data_path).equals(pq.read_table(actual / data_path)):
+            differences.append(data_path)
+        for key, feature in info["features"].items():
+            if feature["dtype"] != "video":
+                continue
+            video_path = info["video_path"].format(episode_chunk=chunk, episode_index=episode_index, video_key=key)
+            expected_frames = read_video(expected / video_path)
+            actual_frames = read_video(actual / video_path) if (actual / video_path).exists() else []
+            if len(expected_frames) != len(actual_frames) or any(not np.array_equal(a, b) for a, b in zip(expected_frames, actual_frames)):
+                differences.append(video_path)
+    return differences
+
+
+def load_dataset(root: Path) -> str:
+    """用 LeRobotDataset 读取全部帧，检查全局帧编号和 episode 编号连续"""
+    from lerobot.common.datasets.lerobot_dataset import LeRobotDataset
+    dataset = LeRobotDataset(repo_id=f"check/{root.name}", root=root, video_backend="pyav")
+    episodes = []
+    for i in range(len(dataset)):
+        item = dataset[i]
+        if int(item["index"]) != i:
+            raise ValueError(f"{root}: frame {i} has index {int(item['index'])}")
+        episodes.append(int(item["episode_index"]))
+    if sorted(set(episodes)) != list(range(dataset.num_episodes)):
+        raise ValueError(f"{root}: episode indices {sorted(set(episodes))} for {dataset.num_episodes} episodes")
+    return f"{len(dataset)} frames, {dataset.num_episodes} episodes"
+
+
+def check(args) -> bool:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f'../config/{args.type}_data_params.yaml'), 'r') as file:
+        config = yaml.safe_load(file)
+    if not args.useCameraPointCloud:
+        config['dataInfo']['camera']['pointCloud']['names'] = []
+    if os.path.exists(args.checkDir):
+        shutil.rmtree(args.checkDir)
+    dataset_dir = os.path.join(args.checkDir, "hdf5")
+    first_count = args.episodes - args.appendEpisodes
+    targets = {name: os.path.join(args.checkDir, name) for name in
+               ("serial", "parallel", "serial_append_serial", "serial_append_parallel", "parallel_append_parallel", "task_serial", "task_parallel")}
+
+    # 先导出前 first_count 个 episode，再生成其余 episode 并追加
+    build_episodes(dataset_dir, config, 0, first_count, args)
+    export(dataset_dir, targets["serial_append_serial"], 1, args)
+    export(dataset_dir, targets["serial_append_parallel"], 1, args)
+    export(dataset_dir, targets["parallel_append_parallel"], args.exportWorkers, args)
+    export(dataset_dir, targets["task_serial"], 1, args)
+    export(dataset_dir, targets["task_parallel"], 1, args)
+    build_episodes(dataset_dir, config, first_count, args.appendEpisodes, args)
+    export(dataset_dir, targets["serial"], 1, args)
+    export(dataset_dir, targets["parallel"], args.exportWorkers, args)
+    export(dataset_dir, targets["serial_append_serial"], 1, args, append=True)
+    export(dataset_dir, targets["serial_append_parallel"], args.exportWorkers, args, append=True)
+    export(dataset_dir, targets["parallel_append_parallel"], args.exportWorkers, args, append=True)
+    # 追加时使用新的任务描述，检查合并时 task_index 的重新编号
+    export(dataset_dir, targets["task_serial"], 1, args, append=True, instruction="append")
+    export(dataset_dir, targets["task_parallel"], args.exportWorkers, args, append=True, instruction="append")
+
+    passed = True
+    for name, expected in (("parallel", "serial"), ("serial_append_serial", "serial"), ("serial_append_parallel", "serial"),
+                           ("parallel_append_parallel", "serial"), ("task_parallel", "task_serial")):
+        differences = compare_datasets(Path(targets[expected]), Path(targets[name]))
+        print(f"{name} vs {expected}: {'same' if not differences else 'different ' + ', '.join(differences)}")
+        passed = passed and not differences
+    for name, target in targets.items():
+        print(f"{name}: loaded {load_dataset(Path(target))}")
+    return passed
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkDir', action='store', type=str, help='checkDir',
+                        default="/tmp/lerobot_export_check", required=False)
+    parser.add_argument('--type', action='store', type=str, help='type',
+                        default="aloha", required=False)
+    parser.add_argument('--episodes', action='store', type=int, help='episodes',
+                        default=5, required=False)
+    parser.add_argument('--appendEpisodes', action='store', type=int, help='appendEpisodes',
+                        default=2, required=False)
+    parser.add_argument('--frames', action='store', type=int, help='frames of the first episode',
+                        default=12, required=False)
+    parser.add_argument('--exportWorkers', action='store', type=int, help='exportWorkers',
+                        default=4, required=False)
+    parser.add_argument('--useCameraPointCloud', action='store', type=bool, help='useCameraPointCloud',
+                        default=False, required=False)
+    parser.add_argument('--pointNum', action='store', type=int, help='point_num',
+                        default=64, required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    passed = check(args)
+    print("passed" if passed else "failed")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
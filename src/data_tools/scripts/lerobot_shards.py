@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Merge LeRobot dataset shards.
+hdf5_to_lerobot.py can export episodes into several temporary shard datasets in
+parallel. merge_shards moves their episode parquet files and videos into one dataset
+and renumbers episode, frame-global and task indices, keeping the per-episode stats.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+INFO_PATH = "meta/info.json"
+EPISODES_PATH = "meta/episodes.jsonl"
+TASKS_PATH = "meta/tasks.jsonl"
+EPISODES_STATS_PATH = "meta/episodes_stats.jsonl"
+STATS_PATH = "meta/stats.json"
+SOURCE_EPISODES_PATH = "meta/source_episodes.jsonl"
+
+
+def load_json(path: Path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    tmp_path.replace(path)
+
+
+def load_jsonl(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_jsonl(path: Path, items: list[dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+    tmp_path.replace(path)
+
+
+def get_video_keys(info: dict) -> list[str]:
+    return [key for key, feature in info["features"].items() if feature["dtype"] == "video"]
+
+
+def get_episode_file(root: Path, info: dict, template_key: str, episode_index: int, video_key: str = None) -> Path:
+    episode_chunk = episode_index // info["chunks_size"]
+    return root / info[template_key].format(episode_chunk=episode_chunk, episode_index=episode_index, video_key=video_key)
+
+
+def reindex_episode_stats(stats: dict, episode_index: int, index_shift: int, task_index: int = None) -> dict:
+    """更新一个 episode 统计量中与编号相关的特征，index 平移 index_shift"""
+    stats = json.loads(json.dumps(stats))
+    if "episode_index" in stats:
+        stats["episode_index"].update({"min": [episode_index], "max": [episode_index], "mean": [float(episode_index)], "std": [0.0]})
+    if "index" in stats:
+        for name in ("min", "max", "mean"):
+            stats["index"][name] = [value + index_shift for value in stats["index"][name]]
+    if "task_index" in stats and task_index is not None:
+        stats["task_index"].update({"min": [task_index], "max": [task_index], "mean": [float(task_index)], "std": [0.0]})
+    return stats
+
+
+def aggregate_stats(items: list[tuple[dict, int]]) -> dict:
+    """按帧数加权合并数据集级统计量 (stats.json)"""
+    merged = {}
+    keys = set().union(*[stats.keys() for stats, _ in items]) if items else set()
+    for key in keys:
+        parts = [(stats[key], count) for stats, count in items if key in stats and count > 0]
+        if not parts:
+            continue
+        counts = np.array([count for _, count in parts], dtype=np.float64)
+        means = np.stack([np.asarray(stats["mean"], dtype=np.float64) for stats, _ in parts])
+        stds = np.stack([np.asarray(stats["std"], dtype=np.float64) for stats, _ in parts])
+        weights = (counts / counts.sum()).reshape((-1,) + (1,) * (means.ndim - 1))
+        mean = (means * weights).sum(axis=0)
+        variance = ((stds ** 2 + (means - mean) ** 2) * weights).sum(axis=0)
+        merged[key] = {
+            "mean": mean.tolist(),
+            "std": np.sqrt(variance).tolist(),
+            "min": np.min(np.stack([np.asarray(stats["min"]) for stats, _ in parts]), axis=0).tolist(),
+            "max": np.max(np.stack([np.asarray(stats["max"]) for stats, _ in parts]), axis=0).tolist(),
+        }
+    return merged
+
+
+def replace_column(table: pa.Table, name: str, values: np.ndarray) -> pa.Table:
+    index = table.schema.get_field_index(name)
+    if index < 0:
+        return table
+    return table.set_column(index, name, pa.array(values, type=table.schema.field(name).type))
+
+
+def merge_shards(target: Path, shards: list[Path], order: list[tuple[int, int]]):
+    """把分片数据集按 order 中的 (分片序号, 分片内 episode 编号) 顺序合并到 target
+
+    target 已存在时在其后追加；分片中的 parquet 和视频文件会被移动到 target。
+    """
+    shard_infos = [load_json(shard / INFO_PATH) for shard in shards]
+    shard_episodes = [{item["episode_index"]: item for item in load_jsonl(shard / EPISODES_PATH)} for shard in shards]
+    shard_tasks = [{item["task_index"]: item["task"] for item in load_jsonl(shard / TASKS_PATH)} for shard in shards]
+    shard_episode_stats = [{item["episode_index"]: item for item in load_jsonl(shard / EPISODES_STATS_PATH)} for shard in shards]
+    shard_sources = [{item["episode_index"]: item for item in load_jsonl(shard / SOURCE_EPISODES_PATH)} for shard in shards]
+
+    if (target / INFO_PATH).exists():
+        info = load_json(target / INFO_PATH)
+    else:
+        info = json.loads(json.dumps(shard_infos[0]))
+        info.update({"total_episodes": 0, "total_frames": 0, "total_tasks": 0, "total_videos": 0, "total_chunks": 0})
+    episodes = load_jsonl(target / EPISODES_PATH)
+    tasks = load_jsonl(target / TASKS_PATH)
+    episode_stats = load_jsonl(target / EPISODES_STATS_PATH)
+    sources = load_jsonl(target / SOURCE_EPISODES_PATH)
+    task_to_index = {item["task"]: item["task_index"] for item in tasks}
+    video_keys = get_video_keys(info)
+    has_stats = (target / STATS_PATH).exists() or any((shard / STATS_PATH).exists() for shard in shards)
+    stats_items = [(load_json(target / STATS_PATH), info["total_frames"])] if (target / STATS_PATH).exists() else []
+
+    for shard_id, shard_episode_index in order:
+        shard, shard_info = shards[shard_id], shard_infos[shard_id]
+        episode = shard_episodes[shard_id][shard_episode_index]
+        episode_index = info["total_episodes"]
+        index_offset = info["total_frames"]
+        for task in episode["tasks"]:
+            if task not in task_to_index:
+                task_to_index[task] = len(task_to_index)
+                tasks.append({"task_index": task_to_index[task], "task": task})
+        task_map = {old: task_to_index[task] for old, task in shard_tasks[shard_id].items() if task in task_to_index}
+
+        table = pq.read_table(get_episode_file(shard, shard_info, "data_path", shard_episode_index))
+        length = table.num_rows
+        # 分片内的全局帧编号起点，用于平移 index 的统计量
+        shard_index_offset = table["index"].to_pylist()[0] if table.schema.get_field_index("index") >= 0 and length > 0 else 0
+        table = replace_column(table, "episode_index", np.full(length, episode_index, dtype=np.int64))
+        table = replace_column(table, "index", np.arange(index_offset, index_offset + length, dtype=np.int64))
+        if table.schema.get_field_index("task_index") >= 0:
+            table = replace_column(table, "task_index", np.array([task_map[task] for task in table["task_index"].to_pylist()], dtype=np.int64))
+        data_file = get_episode_file(target, info, "data_path", episode_index)
+        data_file.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, data_file)
+
+        for video_key in video_keys:
+            video_file = get_episode_file(target, info, "video_path", episode_index, video_key)
+            video_file.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(get_episode_file(shard, shard_info, "video_path", shard_episode_index, video_key), video_file)
+
+        episodes.append({"episode_index": episode_index, "tasks": episode["tasks"], "length": length})
+        if shard_episode_index in shard_episode_stats[shard_id]:
+            task_index = task_to_index[episode["tasks"][0]] if len(episode["tasks"]) == 1 else None
+            episode_stats.append({"episode_index": episode_index,
+                                  "stats": reindex_episode_stats(shard_episode_stats[shard_id][shard_episode_index]["stats"],
+                                                                 episode_index, index_offset - shard_index_offset, task_index)})
+        if shard_episode_index in shard_sources[shard_id]:
+            sources.append(dict(shard_sources[shard_id][shard_episode_index], episode_index=episode_index))
+        info["total_episodes"] += 1
+        info["total_frames"] += length
+
+    for shard_id, shard in enumerate(shards):
+        if (shard / STATS_PATH).exists():
+            stats_items.append((load_json(shard / STATS_PATH), shard_infos[shard_id]["total_frames"]))
+
+    info["total_tasks"] = len(tasks)
+    info["total_videos"] = info["total_episodes"] * len(video_keys)
+    info["total_chunks"] = (info["total_episodes"] - 1) // info["chunks_size"] + 1 if info["total_episodes"] > 0 else 0
+    info["splits"] = {"train": f"0:{info['total_episodes']}"}
+    write_jsonl(target / EPISODES_PATH, episodes)
+    write_jsonl(target / TASKS_PATH, tasks)
+    if episode_stats:
+        write_jsonl(target / EPISODES_STATS_PATH, episode_stats)
+    if sources:
+        write_jsonl(target / SOURCE_EPISODES_PATH, sources)
+    if has_stats:
+        write_json(target / STATS_PATH, aggregate_stats(stats_items))
+    # info.json 最后写入，合并中断时不会指向不完整的 episode
+    write_json(target / INFO_PATH, info)
@@ -4,6 +4,11 @@ import os
 import h5py
 from torch.utils.data import TensorDataset, DataLoader
 import argparse
+from functools import partial
+from hdf5_image import read_image
+from point_cloud_io import read_point_cloud
+from point_cloud_augment import PointCloudAugmentation
+from dataset_catalog import get_episode_paths, get_episode_entries
 
 
 def flatten_list(target):
@@ -11,9 +16,8 @@ def flatten_list(target):
 
 
 def find_all_hdf5(dataset_dir):
-    hdf5_files = []
-    for f in os.listdir(dataset_dir):
-        hdf5_files.append(os.path.join(os.path.join(dataset_dir, f), "data.hdf5"))
+    # 从数据集根目录的 catalog.json 获取 episode 列表，目录不存在时扫描一次并生成
+    hdf5_files = get_episode_paths(dataset_dir, "*/data.hdf5")
     print(f'Found {len(hdf5_files)} hdf5 files')
     return hdf5_files
 
@@ -30,22 +34,34 @@ def batch_sampler(batch_size, episode_len_list):
 
 
 def get_all_episode_len(dataset_path_list):
-    all_episode_len = []
-    for dataset_path in dataset_path_list:
-        try:
-            with h5py.File(dataset_path, 'r') as root:
-                all_episode_len.append(root['size'][()])
-        except Exception as e:
-            print(e)
-            quit()
-    return all_episode_len
+    # 帧数从 catalog.json 读取，只有新增或修改过的 episode 才会被打开
+    try:
+        return [entry["frames"] for entry in get_episode_entries(dataset_path_list)]
+    except Exception as e:
+        print(e)
+        quit()
+
+
+def collate_batch(batch, augmentation=None):
+    # 点云 (第三项) 按批堆叠为 (B, pointNum, 6) 后统一增强，每个批次得到新的随机增强
+    data = [np.stack(items) for items in zip(*batch)]
+    if len(data) > 2 and augmentation is not None:
+        data[2] = augmentation(data[2])
+    return [torch.from_numpy(item) for item in data]
+
+
+def init_worker(augmentation, worker_id):
+    # 各 worker 的增强随机序列由种子和 worker 序号决定，互不相同
+    if augmentation is not None:
+        augmentation.reseed(worker_id)
 
 
 class EpisodicDataset(torch.utils.data.Dataset):
 
-    def __init__(self, dataset_path_list, episode_ids, episode_len):
+    def __init__(self, dataset_path_list, episode_ids, episode_len, point_cloud_name=None):
         super(EpisodicDataset).__init__()
         self.dataset_path_list = dataset_path_list
+        self.point_cloud_name = point_cloud_name
         self.episode_ids = episode_ids
         self.episode_len = episode_len
         self.cumulative_len = np.cumsum(self.episode_len)
@@ -86,14 +102,18 @@ class EpisodicDataset(torch.utils.data.Dataset):
             # root['/arm/jointStatePosition/puppetRight'][()]
             # root['/arm/jointStatePosition/masterLeft'][()]
             # root['/arm/jointStatePosition/masterRight'][()]
-            # cv2.imread(os.path.join(dataset_path[:-9], root[f'/camera/color/left'][start_index].decode('utf-8')), cv2.IMREAD_UNCHANGED)
-            # cv2.imread(os.path.join(dataset_path[:-9], root[f'/camera/depth/left'][start_index].decode('utf-8')), cv2.IMREAD_UNCHANGED)
-            # pcl.load(os.path.join(dataset_path[:-9], root[f'/camera/pointCloud/left'][start_index].decode('utf-8'))).to_array()
+            # read_image 兼容相对路径、解码后数组和原始编码字节三种图像存储方式
+            # read_image(root[f'/camera/color/left'], start_index, dataset_path[:-9])
+            # read_image(root[f'/camera/depth/left'], start_index, dataset_path[:-9])
+            # read_point_cloud 兼容相对路径 (.npy、.pcd、points.npy#<行号>) 和直接存储的数组
+            if self.point_cloud_name:
+                point_cloud = read_point_cloud(root[f'/camera/pointCloud/{self.point_cloud_name}'], start_index, dataset_path[:-9])
+                return qpos, action, np.asarray(point_cloud, dtype=np.float32)
 
         return qpos, action
 
 
-def load_data(dataset_dir, batch_size):
+def load_data(dataset_dir, batch_size, point_cloud_name=None, use_augment=False, seed=None):
     dataset_dir_list = dataset_dir
     if type(dataset_dir_list) == str:
         dataset_dir_list = [dataset_dir_list]
@@ -115,10 +135,14 @@ def load_data(dataset_dir, batch_size):
 
     episode_len = flatten_list(episode_len_list)
     episode_ids = np.concatenate(episode_ids_list)
-    dataset = EpisodicDataset(dataset_path_list, episode_ids, episode_len)
+    dataset = EpisodicDataset(dataset_path_list, episode_ids, episode_len, point_cloud_name)
+    # 点云增强在读取时按批进行，预处理只需运行一次
+    augmentation = PointCloudAugmentation(seed) if use_augment else None
     num_workers = 1
     dataloader = DataLoader(dataset, batch_sampler=batch_sampler(batch_size, episode_len_list),
-                            pin_memory=True, num_workers=num_workers, prefetch_factor=1)
+                            pin_memory=True, num_workers=num_workers, prefetch_factor=1,
+                            collate_fn=partial(collate_batch, augmentation=augmentation),
+                            worker_init_fn=partial(init_worker, augmentation))
 
     return dataloader
 
@@ -129,16 +153,22 @@ def get_arguments():
                         default="/home/agilex/data", required=False)
     parser.add_argument('--batchSize', action='store', type=int, help='batchSize',
                         default=16, required=False)
+    parser.add_argument('--pointCloudName', action='store', type=str, help='pointCloudName',
+                        default="", required=False)
+    parser.add_argument('--useAugment', action='store', type=bool, help='useAugment',
+                        default=False, required=False)
+    parser.add_argument('--seed', action='store', type=int, help='seed',
+                        default=None, required=False)
     args = parser.parse_args()
     return args
 
 
 def main():
     args = get_arguments()
-    dataloader = load_data(args.datasetDir, args.batchSize)
+    dataloader = load_data(args.datasetDir, args.batchSize, args.pointCloudName, args.useAugment, args.seed)
     step = 1000
     for batch_idx, data in enumerate(dataloader):
-        print(batch_idx, data[0].shape, data[1].shape)
+        print(batch_idx, *[item.shape for item in data])
         if batch_idx >= step:
             break
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Point cloud augmentation applied when training data is loaded.
+augment_point_clouds works on a whole (B, pointNum, 6) batch at once: it replaces
+random points with outliers, scales the brightness of random points and recolors
+random points, with the same distributions as the augmentation formerly baked into
+camera_point_cloud_filter.py. PointCloudAugmentation holds a seedable generator so
+the loaders draw fresh augmentations every batch from preprocessed data.
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+
+def sample_point_indices(rng: np.random.Generator, batch: int, count: int, max_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每帧随机选取 0 到 max_count 个点 (可重复)，返回 (帧下标, 点下标)"""
+    frames = np.repeat(np.arange(batch), rng.integers(0, max_count + 1, batch))
+    return frames, rng.integers(0, count, frames.shape[0])
+
+
+def augment_point_clouds(points: np.ndarray, rng: np.random.Generator, max_outliers: int = 200,
+                         max_jitters: int = 1000, max_recolors: int = 200) -> np.ndarray:
+    """对 (B, N, 6) 或 (N, 6) 的 x, y, z, r, g, b 点云做随机增强，返回新的 float32 数组
+
+    1. 每帧最多 max_outliers 个点替换为离群点: x, y 在 [-2, 2)，z 在 [0, 2)，颜色在 [0, 255)；
+    2. 每帧最多 max_jitters 个点的颜色乘以 [0, 2) 的亮度系数并截断到 [0, 255]；
+    3. 每帧最多 max_recolors 个点的颜色替换为随机颜色。
+    同一点被多次选中时保留最后一次的结果。
+    """
+    points = np.array(points, dtype=np.float32)
+    single = points.ndim == 2
+    if single:
+        points = points[np.newaxis]
+    batch, count, _ = points.shape
+    if count == 0:
+        return points[0] if single else points
+
+    frames, indices = sample_point_indices(rng, batch, count, max_outliers)
+    outliers = rng.uniform(0, 1, (frames.shape[0], 6)).astype(np.float32)
+    outliers[:, :2] = rng.uniform(-1, 1, (frames.shape[0], 2))
+    outliers[:, :3] *= 2
+    outliers[:, 3:] *= 255
+    points[frames, indices] = outliers
+
+    frames, indices = sample_point_indices(rng, batch, count, max_jitters)
+    scale = rng.uniform(0, 2, (frames.shape[0], 1)).astype(np.float32)
+    points[frames, indices, 3:] = np.clip(points[frames, indices, 3:] * scale, 0, 255)
+
+    frames, indices = sample_point_indices(rng, batch, count, max_recolors)
+    points[frames, indices, 3:] = rng.uniform(0, 1, (frames.shape[0], 3)) * 255
+    return points[0] if single else points
+
+
+class PointCloudAugmentation:
+    """可设定种子的批量点云增强
+
+    seed 为 None 时每次运行得到不同的增强；DataLoader 的每个 worker 应调用 reseed(worker_id)，
+    避免各 worker 产生相同的随机序列。
+    """
+
+    def __init__(self, seed: Optional[int] = None, max_outliers: int = 200, max_jitters: int = 1000, max_recolors: int = 200):
+        self.seed = seed
+        self.max_outliers = max_outliers
+        self.max_jitters = max_jitters
+        self.max_recolors = max_recolors
+        self.rng = np.random.default_rng(seed)
+
+    def reseed(self, *keys: int):
+        """由 seed 和 keys (如 worker 序号) 重新生成随机数发生器"""
+        self.rng = np.random.default_rng(None if self.seed is None else [self.seed, *keys])
+
+    def __call__(self, points: np.ndarray) -> np.ndarray:
+        return augment_point_clouds(points, self.rng, self.max_outliers, self.max_jitters, self.max_recolors)
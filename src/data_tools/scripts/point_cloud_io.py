@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Point cloud file reader shared by the filter, the HDF5 converter, the LeRobot
+exporter and the publisher.
+Binary PCD files are mapped onto a numpy structured dtype built from the header, so
+reading is one file read (np.frombuffer) or a memory map (np.memmap). The xyz and
+packed rgb fields are exposed as strided views, without building an Open3D or PCL
+object. ASCII PCD files and .npy files are also supported.
+camera_point_cloud_filter.py can also write all frames of a camera into one
+(frames, pointNum, 6) points.npy with a timestamps.npy sidecar; a frame of it is
+addressed as "points.npy#<row>" and read from a cached memory map.
+"""
+
+import os
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+PCD_TYPES = {('F', 4): '<f4', ('F', 8): '<f8',
+             ('U', 1): 'u1', ('U', 2): '<u2', ('U', 4): '<u4', ('U', 8): '<u8',
+             ('I', 1): 'i1', ('I', 2): '<i2', ('I', 4): '<i4', ('I', 8): '<i8'}
+PCD_COLOR_FIELDS = ('rgb', 'rgba')
+POINT_CLOUD_TENSOR_FILE = "points.npy"
+POINT_CLOUD_TIMESTAMP_FILE = "timestamps.npy"
+
+
+def parse_pcd_header(file) -> Tuple[Dict, int]:
+    """读取 PCD 文件头，返回 (字段表, 数据起始偏移)"""
+    header = {}
+    offset = 0
+    while True:
+        line = file.readline()
+        if not line:
+            raise ValueError("PCD header has no DATA line")
+        offset += len(line)
+        text = line.decode('ascii', errors='replace').strip()
+        if not text or text.startswith('#'):
+            continue
+        key, *values = text.split()
+        header[key.upper()] = values
+        if key.upper() == 'DATA':
+            break
+    fields = header['FIELDS']
+    header['SIZE'] = [int(value) for value in header.get('SIZE', ['4'] * len(fields))]
+    header['TYPE'] = header.get('TYPE', ['F'] * len(fields))
+    header['COUNT'] = [int(value) for value in header.get('COUNT', ['1'] * len(fields))]
+    width = int(header['WIDTH'][0])
+    height = int(header.get('HEIGHT', ['1'])[0])
+    header['POINTS'] = int(header['POINTS'][0]) if 'POINTS' in header else width * height
+    header['DATA'] = header['DATA'][0].lower()
+    return header, offset
+
+
+def get_pcd_dtype(header: Dict) -> np.dtype:
+    """由文件头构造逐点的结构化类型，重复的填充字段 (_) 重新编号"""
+    names, formats = [], []
+    for i, (name, size, type_name, count) in enumerate(zip(header['FIELDS'], header['SIZE'], header['TYPE'], header['COUNT'])):
+        if (type_name, size) not in PCD_TYPES:
+            raise ValueError(f"unsupported PCD field {name}: type {type_name}, size {size}")
+        names.append(name if name != '_' else f'_{i}')
+        formats.append(PCD_TYPES[(type_name, size)] if count == 1 else (PCD_TYPES[(type_name, size)], (count,)))
+    return np.dtype({'names': names, 'formats': formats})
+
+
+def read_pcd(path: str, mmap: bool = False) -> np.ndarray:
+    """读取 PCD 文件为结构化数组
+
+    binary 格式直接以文件内容为缓冲区 (np.frombuffer，只读)，mmap 时返回内存映射；
+    ascii 格式逐行解析；binary_compressed 暂不支持。
+    """
+    with open(path, 'rb') as f:
+        header, offset = parse_pcd_header(f)
+        dtype = get_pcd_dtype(header)
+        points = header['POINTS']
+        if header['DATA'] == 'binary':
+            if mmap:
+                return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(points,))
+            return np.frombuffer(f.read(points * dtype.itemsize), dtype=dtype, count=points)
+        if header['DATA'] == 'ascii':
+            values = np.loadtxt(f, dtype=np.float64, ndmin=2, max_rows=points)
+            cloud = np.empty(values.shape[0], dtype=dtype)
+            column = 0
+            for name, count in zip(dtype.names, header['COUNT']):
+                # TYPE F 的打包 rgb 经 float64 转回 float32 后位模式不变
+                cloud[name] = values[:, column:column + count].reshape(cloud[name].shape)
+                column += count
+            return cloud
+    raise ValueError(f"unsupported PCD data format {header['DATA']} in {path}")
+
+
+def get_field_view(cloud: np.ndarray, name: str, dtype, count: int) -> np.ndarray:
+    """结构化数组中从字段 name 开始的 count 个 dtype 值，作为 (N, count) 的跨步视图返回"""
+    offset = cloud.dtype.fields[name][1]
+    byte_view = cloud.view(np.uint8).reshape(cloud.shape[0], cloud.dtype.itemsize)
+    return byte_view[:, offset:offset + count * np.dtype(dtype).itemsize].view(dtype)
+
+
+def split_xyz_rgb(cloud: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """返回 (xyz, rgb)，xyz 为 (N, 3) float32，rgb 为 (N, 3) uint8，没有颜色字段时为 None
+
+    x, y, z 是连续的 float32 字段时 xyz 为零拷贝视图；打包的 rgb (小端 b, g, r, a)
+    以字节视图逆序取出 r, g, b，同样不复制。
+    """
+    names = cloud.dtype.names
+    offsets = [cloud.dtype.fields[name][1] for name in ('x', 'y', 'z')]
+    if all(cloud.dtype[name] == np.float32 for name in ('x', 'y', 'z')) and offsets == [offsets[0], offsets[0] + 4, offsets[0] + 8]:
+        xyz = get_field_view(cloud, 'x', np.float32, 3)
+    else:
+        xyz = np.stack([cloud['x'], cloud['y'], cloud['z']], axis=-1).astype(np.float32)
+    color_field = next((name for name in PCD_COLOR_FIELDS if name in names), None)
+    if color_field is None:
+        return xyz, None
+    return xyz, get_field_view(cloud, color_field, np.uint8, 4)[:, 2::-1]
+
+
+def create_point_cloud_tensor(output_dir: str, timestamps: List[float], point_num: int, dtype=np.float32) -> np.ndarray:
+    """在 output_dir 下预分配 (帧数, point_num, 6) 的 points.npy 并写入时间戳 timestamps.npy，返回可写的内存映射"""
+    np.save(os.path.join(output_dir, POINT_CLOUD_TIMESTAMP_FILE), np.asarray(timestamps, dtype=np.float64))
+    return np.lib.format.open_memmap(os.path.join(output_dir, POINT_CLOUD_TENSOR_FILE), mode='w+', dtype=dtype,
+                                     shape=(len(timestamps), point_num, 6))
+
+
+@lru_cache(maxsize=32)
+def open_point_cloud_tensor(path: str, mode: str = 'r') -> np.ndarray:
+    """以内存映射打开 points.npy，同一进程内重复读取时复用"""
+    return np.load(path, mmap_mode=mode)
+
+
+def get_point_cloud_tensor_path(point_cloud_dir: str) -> Optional[str]:
+    """点云目录中存在 points.npy 时返回其路径"""
+    path = os.path.join(point_cloud_dir, POINT_CLOUD_TENSOR_FILE)
+    return path if os.path.exists(path) else None
+
+
+def load_point_cloud(path: str, mmap: bool = False, remove_nan: bool = True) -> np.ndarray:
+    """读取点云文件为 float32 数组
+
+    .npy 原样返回 (mmap 时以只读内存映射打开，滤波输出为 float32，旧版输出为 float64)；points.npy#<row> 返回逐帧张量中的一帧；
+    .pcd 返回 (N, 6) 的 x, y, z, r, g, b，没有颜色字段时为 (N, 3)，remove_nan 时去掉坐标非有限的点。
+    """
+    if '#' in path:
+        path, row = path.rsplit('#', 1)
+        return open_point_cloud_tensor(path)[int(row)]
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r' if mmap else None)
+    xyz, rgb = split_xyz_rgb(read_pcd(path, mmap))
+    columns = 3 if rgb is None else 6
+    point_cloud = np.empty((xyz.shape[0], columns), dtype=np.float32)
+    point_cloud[:, :3] = xyz
+    if rgb is not None:
+        point_cloud[:, 3:] = rgb
+    if remove_nan:
+        # 三个坐标之和有限当且仅当各坐标都有限，比逐列 isfinite 后 all 快
+        finite = np.isfinite(point_cloud[:, 0] + point_cloud[:, 1] + point_cloud[:, 2])
+        if not finite.all():
+            point_cloud = point_cloud[finite]
+    return point_cloud
+
+
+def read_point_cloud(dataset, index: int, episode_dir: str) -> np.ndarray:
+    """读取 HDF5 中第 index 帧点云: 相对路径 (.npy、.pcd 或 points.npy#<行号>) 或直接存储的数组"""
+    if dataset.ndim == 1:
+        return load_point_cloud(os.path.join(episode_dir, dataset[index].decode('utf-8')))
+    return dataset[index]
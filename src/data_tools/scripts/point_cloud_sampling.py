@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Box cropping, voxel-grid downsampling and farthest point sampling for point clouds.
+voxel_down_sample averages the points and colors of each occupied voxel of an
+(N, 6) float32 array with one sort and one segmented sum, on the same grid as
+Open3D's voxel_down_sample. Farthest point sampling runs in float32 on the xyz
+columns with squared distances updated in place, so each selection is a few
+vectorized passes over preallocated buffers. Clouds of the same size can be sampled
+together as a batch, the start point can be seeded, and an optional coarse voxel
+pre-pass shrinks large clouds before sampling.
+"""
+
+import numpy as np
+from typing import List, Optional, Sequence
+
+
+def split_coordinates(points: np.ndarray) -> np.ndarray:
+    """取 (..., N, 3+) 点云的 xyz，转换为 (3, ..., N) 连续 float32 数组"""
+    return np.ascontiguousarray(np.moveaxis(np.asarray(points)[..., :3], -1, 0), dtype=np.float32)
+
+
+def crop_points(points: np.ndarray, lower: Optional[Sequence[float]] = None, upper: Optional[Sequence[float]] = None) -> np.ndarray:
+    """保留 xyz 在 [lower, upper) 内的点，lower、upper 为三个坐标的界，可用 ±np.inf 表示不限"""
+    points = np.asarray(points)
+    mask = np.ones(points.shape[0], dtype=bool)
+    for axis in range(3):
+        if lower is not None and np.isfinite(lower[axis]):
+            mask &= points[:, axis] >= lower[axis]
+        if upper is not None and np.isfinite(upper[axis]):
+            mask &= points[:, axis] < upper[axis]
+    return points if mask.all() else points[mask]
+
+
+def voxel_keys(points: np.ndarray, voxel_size: float, origin: np.ndarray) -> np.ndarray:
+    """点所在体素的一维键，origin 为网格原点"""
+    cells = np.floor((np.asarray(points)[:, :3] - origin) / voxel_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # 三维体素坐标合并成一维键，比按行 unique 快得多
+    extent = cells.max(axis=0) + 1
+    return (cells[:, 0] * extent[1] + cells[:, 1]) * extent[2] + cells[:, 2]
+
+
+def voxel_down_sample_batch(clouds: Sequence[np.ndarray], voxel_size: float) -> List[np.ndarray]:
+    """对一组 (N_i, C) 点云分别做体素降采样，每个非空体素输出所有列 (坐标和颜色) 的均值
+
+    网格原点与 Open3D 相同，为各点云的最小坐标减半个体素；输出按体素键排序，
+    结果与机器和点的输入顺序无关。所有帧一起排序和求和，返回 float32 点云列表。
+    """
+    clouds = [np.asarray(cloud) for cloud in clouds]
+    if not clouds:
+        return []
+    columns = clouds[0].shape[1]
+    counts = np.array([cloud.shape[0] for cloud in clouds])
+    keys = np.empty(counts.sum(), dtype=np.int64)
+    frames = np.repeat(np.arange(len(clouds)), counts)
+    offset = 0
+    for cloud in clouds:
+        if cloud.shape[0] > 0:
+            frame_keys = voxel_keys(cloud, voxel_size, cloud[:, :3].min(axis=0) - voxel_size * 0.5)
+            keys[offset:offset + cloud.shape[0]] = frame_keys
+        offset += cloud.shape[0]
+    if keys.shape[0] == 0:
+        return [np.empty((0, columns), dtype=np.float32) for _ in clouds]
+    # 帧序号作为最高位参与排序，各帧的体素互不混合
+    order = np.lexsort((keys, frames))
+    keys, frames = keys[order], frames[order]
+    starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (frames[1:] != frames[:-1])])
+    points = np.concatenate(clouds, axis=0)[order].astype(np.float64)
+    sums = np.add.reduceat(points, starts, axis=0)
+    sums /= np.diff(np.r_[starts, keys.shape[0]])[:, np.newaxis]
+    voxels = sums.astype(np.float32)
+    return np.split(voxels, np.searchsorted(frames[starts], np.arange(1, len(clouds))))
+
+
+def voxel_down_sample(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """单个 (N, C) 点云的体素降采样，见 voxel_down_sample_batch"""
+    return voxel_down_sample_batch([points], voxel_size)[0]
+
+
+def voxel_representatives(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """每个非空体素中第一个点的下标，按原顺序排列"""
+    keys = voxel_keys(points, voxel_size, np.zeros(3))
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
+
+
+def farthest_point_sampling_batch(points: np.ndarray, k: int, seed: Optional[int] = None,
+                                  start_indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """对 B 个点数相同的点云 (B, N, 3+) 同时做最远点采样，返回 (B, min(k, N)) 下标
+
+    起点为 start_indices，未指定时由 seed 随机选择。
+    """
+    coordinates = split_coordinates(points)
+    _, batch, count = coordinates.shape
+    k = min(k, count)
+    rows = np.arange(batch)
+    if start_indices is None:
+        start_indices = np.random.default_rng(seed).integers(0, count, batch)
+    indices = np.empty((batch, k), dtype=np.int64)
+    if k == 0:
+        return indices
+    indices[:, 0] = start_indices
+    distances = np.full((batch, count), np.inf, dtype=np.float32)
+    difference = np.empty((batch, count), dtype=np.float32)
+    squared = np.empty((batch, count), dtype=np.float32)
+    for i in range(1, k):
+        # 用上一次选中的点更新各点到已选集合的平方距离
+        centers = coordinates[:, rows, indices[:, i - 1]][:, :, np.newaxis]
+        np.subtract(coordinates[0], centers[0], out=difference)
+        np.multiply(difference, difference, out=squared)
+        for axis in (1, 2):
+            np.subtract(coordinates[axis], centers[axis], out=difference)
+            difference *= difference
+            squared += difference
+        np.minimum(distances, squared, out=distances)
+        indices[:, i] = np.argmax(distances, axis=1)
+    return indices
+
+
+def farthest_point_sampling(points: np.ndarray, k: int, seed: Optional[int] = None,
+                            start_index: Optional[int] = None, voxel_size: float = 0.0) -> np.ndarray:
+    """对 (N, 3+) 点云做最远点采样，返回 min(k, N) 个下标
+
+    voxel_size 大于 0 时先在每个体素中保留一个点，再在这些点上采样；
+    体素数不足 k 时退回到全部点。
+    """
+    points = np.asarray(points)
+    candidates = None
+    if voxel_size > 0:
+        candidates = voxel_representatives(points, voxel_size)
+        if candidates.shape[0] >= k:
+            points = points[candidates]
+            start_index = None if start_index is None else int(np.argmin(np.abs(candidates - start_index)))
+        else:
+            candidates = None
+    start_indices = None if start_index is None else np.array([start_index])
+    indices = farthest_point_sampling_batch(points[np.newaxis], k, seed, start_indices)[0]
+    return indices if candidates is None else candidates[indices]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scaling benchmark for the data_sync stage.
+Builds synthetic episodes with zero-byte payloads in the recorded directory layout
+and times the listing, sorting, sync and writing phases of data_sync.Operator.
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from data_sync import Operator
+
+
+class TimedList(list):
+    """记录 sort 耗时的列表，用于拆分原始实现中加载与排序的耗时"""
+
+    sort_time = 0.0
+
+    def sort(self, *args, **kwargs):
+        start = time.perf_counter()
+        super().sort(*args, **kwargs)
+        self.sort_time = time.perf_counter() - start
+
+
+def generate_times(rng: np.random.Generator, rate: float, duration: float, jitter: float, dropout: float) -> np.ndarray:
+    """生成带抖动和丢帧的时间戳，jitter 为相对帧周期的抖动比例"""
+    count = int(rate * duration)
+    periods = rng.uniform(1 - jitter, 1 + jitter, count) / rate
+    times = 1.7e9 + np.cumsum(periods)
+    return times[rng.random(count) >= dropout]
+
+
+def build_episode(episode_dir: str, args, duration: float, seed: int) -> int:
+    """按 camera/color/<name>/<timestamp>.jpg 和 arm/jointState/<name>/<timestamp>.json 布局创建空文件，返回文件数"""
+    rng = np.random.default_rng(seed)
+    topics = [("camera/color", f"camera{i}", args.cameraRate, ".jpg") for i in range(args.cameraNum)]
+    topics += [("arm/jointState", f"arm{i}", args.jointStateRate, ".json") for i in range(args.jointStateNum)]
+    file_count = 0
+    for key, name, rate, ext in topics:
+        path = os.path.join(episode_dir, key, name)
+        os.makedirs(path, exist_ok=True)
+        for t in generate_times(rng, rate, duration, args.jitter, args.dropout).tolist():
+            open(os.path.join(path, f"{t:.6f}{ext}"), 'w').close()
+            file_count += 1
+    return file_count
+
+
+def make_operator_args(args, dataset_dir: str, episode_name: str, engine: str) -> argparse.Namespace:
+    """构造 data_sync.Operator 所需参数"""
+    names = {key: [] for key in ["cameraColorNames", "cameraDepthNames", "cameraPointCloudNames", "armJointStateNames", "armEndPoseNames",
+                                 "localizationPoseNames", "gripperEncoderNames", "imu9AxisNames", "lidarPointCloudNames",
+                                 "robotBaseVelNames", "liftMotorNames"]}
+    names["cameraColorNames"] = [f"camera{i}" for i in range(args.cameraNum)]
+    names["armJointStateNames"] = [f"arm{i}" for i in range(args.jointStateNum)]
+    return argparse.Namespace(datasetDir=dataset_dir, episodeName=episode_name, timeDiffLimit=args.timeDiffLimit, syncEngine=engine,
+                              syncMode='nearest', interpolationGapLimit=0.1, syncReport=False, useSyncManifest=False, workers=1,
+                              **names)
+
+
+def run_vectorized(operator: Operator) -> Dict[str, float]:
+    """分阶段运行向量化同步"""
+    phases = {}
+    start = time.perf_counter()
+    operator.topics = operator.get_topics()
+    listed = [operator.list_topic_times(topic["dir"], topic["candidate_exts"][0]) for topic in operator.topics]
+    phases["listing"] = time.perf_counter() - start
+    start = time.perf_counter()
+    operator.topic_times = [np.sort(times, kind='stable') for times in listed]
+    phases["sorting"] = time.perf_counter() - start
+    start = time.perf_counter()
+    phases["frames"] = operator.sync_vectorized()
+    phases["sync"] = time.perf_counter() - start
+    start = time.perf_counter()
+    operator.write_topic_sync_files()
+    phases["writing"] = time.perf_counter() - start
+    return phases
+
+
+def run_legacy(operator: Operator) -> Dict[str, float]:
+    """分阶段运行原始逐帧同步"""
+    phases = {}
+    operator.all_time_series = TimedList()
+    start = time.perf_counter()
+    operator.load_all_time_series()
+    elapsed = time.perf_counter() - start
+    phases["listing"] = elapsed - operator.all_time_series.sort_time
+    phases["sorting"] = operator.all_time_series.sort_time
+    start = time.perf_counter()
+    phases["frames"] = operator.sync_legacy()
+    phases["sync"] = time.perf_counter() - start
+    start = time.perf_counter()
+    operator.write_sync_files()
+    phases["writing"] = time.perf_counter() - start
+    return phases
+
+
+def benchmark(args) -> List[Dict]:
+    results = []
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    for minutes in [float(value) for value in args.durations.split(",") if value.strip()]:
+        dataset_dir = os.path.join(args.benchmarkDir, f"{minutes:g}min")
+        episode_name = "episode0"
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+        start = time.perf_counter()
+        file_count = build_episode(os.path.join(dataset_dir, episode_name), args, minutes * 60, args.seed)
+        print(f"Build {minutes:g} min episode: {file_count} files, {time.perf_counter() - start:.2f}s")
+        for engine in engines:
+            runs = []
+            for _ in range(args.repeat):
+                operator = Operator(make_operator_args(args, dataset_dir, episode_name, engine))
+                runs.append(run_vectorized(operator) if engine == 'vectorized' else run_legacy(operator))
+            # 多次运行时各阶段取最小值
+            result = {"durationMinutes": minutes, "engine": engine, "files": file_count, "frames": int(runs[0]["frames"])}
+            for phase in ["listing", "sorting", "sync", "writing"]:
+                result[phase] = min(run[phase] for run in runs)
+            result["total"] = result["listing"] + result["sorting"] + result["sync"] + result["writing"]
+            results.append(result)
+            print(f"{minutes:g} min {engine}: frames {result['frames']}, listing {result['listing']:.3f}s, sorting {result['sorting']:.3f}s, "
+                  f"sync {result['sync']:.3f}s, writing {result['writing']:.3f}s, total {result['total']:.3f}s")
+        if not args.keepEpisodes:
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+    return results
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmarkDir', action='store', type=str, help='benchmarkDir',
+                        default='/tmp/sync_benchmark', required=False)
+    parser.add_argument('--output', action='store', type=str, help='output json file',
+                        default='sync_benchmark.json', required=False)
+    parser.add_argument('--durations', action='store', type=str, help='episode lengths in minutes, comma separated',
+                        default='1,5,10', required=False)
+    parser.add_argument('--engines', action='store', type=str, help='sync engines, comma separated: vectorized, legacy',
+                        default='vectorized,legacy', required=False)
+    parser.add_argument('--cameraNum', action='store', type=int, help='cameraNum',
+                        default=3, required=False)
+    parser.add_argument('--cameraRate', action='store', type=float, help='cameraRate',
+                        default=30, required=False)
+    parser.add_argument('--jointStateNum', action='store', type=int, help='jointStateNum',
+                        default=2, required=False)
+    parser.add_argument('--jointStateRate', action='store', type=float, help='jointStateRate',
+                        default=200, required=False)
+    parser.add_argument('--jitter', action='store', type=float, help='jitter ratio of the frame period',
+                        default=0.2, required=False)
+    parser.add_argument('--dropout', action='store', type=float, help='dropout ratio of frames',
+                        default=0.01, required=False)
+    parser.add_argument('--timeDiffLimit', action='store', type=float, help='timeDiffLimit',
+                        default=0.03, required=False)
+    parser.add_argument('--repeat', action='store', type=int, help='repeat',
+                        default=1, required=False)
+    parser.add_argument('--seed', action='store', type=int, help='seed',
+                        default=0, required=False)
+    parser.add_argument('--keepEpisodes', action='store', type=bool, help='keepEpisodes',
+                        default=False, required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for engine in args.engines.split(","):
+        if engine.strip() not in ('vectorized', 'legacy'):
+            print(f"Error: unsupported sync engine {engine}")
+            return
+    results = benchmark(args)
+    settings = {key: value for key, value in vars(args).items() if key not in ('output', 'benchmarkDir', 'keepEpisodes')}
+    with open(args.output, 'w') as f:
+        json.dump({"settings": settings, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
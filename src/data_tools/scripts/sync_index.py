@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Episode-level binary sync index.
+data_sync.py writes sync_index.npz beside the per-modality sync.txt files so that
+downstream stages can load every synchronized frame with a single np.load call.
+"""
+
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+SYNC_INDEX_FILE = "sync_index.npz"
+
+
+def save_sync_index(episode_dir: str, keys: List[str], exts: List[str], reference_times: np.ndarray, topic_times: List[np.ndarray], topic_indices: List[np.ndarray],
+                    interpolated: Optional[Dict[str, Dict[str, np.ndarray]]] = None):
+    """保存 episode 级同步索引
+
+    time:   (帧数, 数据源数) 与 sync.txt 中文件名一致的时间戳
+    index:  (帧数, 数据源数) 每帧在对应数据源有序时间戳中的索引
+    offset: (帧数, 数据源数) 每帧原始时间戳相对参考时间的偏移
+    interp/<数据源>/<字段>: 插值同步模式下在参考时间处插值得到的数据
+    """
+    frame_count = reference_times.size
+    times = np.zeros((frame_count, len(keys)), dtype=np.float64)
+    indices = np.zeros((frame_count, len(keys)), dtype=np.int64)
+    offsets = np.zeros((frame_count, len(keys)), dtype=np.float64)
+    for k in range(len(keys)):
+        raw_times = topic_times[k][topic_indices[k]]
+        # 按 sync.txt 的 6 位小数格式取整，保证与解析文件名得到的时间戳一致
+        times[:, k] = [float(f"{time:.6f}") for time in raw_times.tolist()]
+        indices[:, k] = topic_indices[k]
+        offsets[:, k] = raw_times - reference_times
+    path = os.path.join(episode_dir, SYNC_INDEX_FILE)
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    arrays = {f"interp/{key}/{field}": values for key, fields in (interpolated or {}).items() for field, values in fields.items()}
+    np.savez(tmp_path, keys=np.array(keys, dtype=str), exts=np.array(exts, dtype=str), reference_time=reference_times,
+             time=times, index=indices, offset=offsets, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_sync_index(episode_dir: str) -> Optional[Dict]:
+    """读取 episode 级同步索引，不存在或损坏时返回 None"""
+    path = os.path.join(episode_dir, SYNC_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            sync_index = {name: data[name] for name in data.files}
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignore invalid sync index {path}: {e}")
+        return None
+    interpolated = {}
+    for name in [name for name in sync_index if name.startswith("interp/")]:
+        key, field = name[len("interp/"):].rsplit("/", 1)
+        interpolated.setdefault(key, {})[field] = sync_index.pop(name)
+    sync_index["interpolated"] = interpolated
+    sync_index["keys"] = sync_index["keys"].tolist()
+    sync_index["exts"] = sync_index["exts"].tolist()
+    sync_index["mtime"] = os.stat(path).st_mtime_ns
+    return sync_index
+
+
+def is_sync_index_valid(sync_index: Optional[Dict], key: str, sync_path: str) -> bool:
+    """索引中包含该数据源且不早于 sync.txt 时索引可用"""
+    return sync_index is not None and key in sync_index["keys"] and os.path.exists(sync_path) \
+        and os.stat(sync_path).st_mtime_ns <= sync_index["mtime"]
+
+
+def read_sync_lines(sync_index: Optional[Dict], key: str, sync_path: str) -> List[Tuple[str, float]]:
+    """返回某数据源同步后的 (文件名, 时间戳) 列表
+
+    索引可用时直接使用索引，否则回退到逐行解析 sync.txt。
+    插值数据源的文件名为最近的原始帧，时间戳为插值所在的参考时间。
+    """
+    if is_sync_index_valid(sync_index, key, sync_path):
+        k = sync_index["keys"].index(key)
+        ext = sync_index["exts"][k]
+        if key in sync_index["interpolated"]:
+            return [(f"{time:.6f}{ext}", float(f"{reference_time:.6f}"))
+                    for time, reference_time in zip(sync_index["time"][:, k].tolist(), sync_index["reference_time"].tolist())]
+        return [(f"{time:.6f}{ext}", time) for time in sync_index["time"][:, k].tolist()]
+    sync_lines = []
+    with open(sync_path, 'r') as lines:
+        for line in lines:
+            line = line.replace('\n', '')
+            sync_lines.append((line, float(line[:line.rfind(".")])))
+    return sync_lines
+
+
+def read_interpolated(sync_index: Optional[Dict], key: str, sync_path: str) -> Optional[Dict[str, np.ndarray]]:
+    """返回某数据源在参考时间处的插值数据，非插值同步或索引不可用时返回 None"""
+    if is_sync_index_valid(sync_index, key, sync_path):
+        return sync_index["interpolated"].get(key)
+    return None
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Interpolation helpers for the camera-clocked sync mode.
+High-rate low-dimensional topics are sampled at the reference (camera) timestamps:
+vectors are interpolated linearly and orientations with quaternion slerp.
+"""
+
+import os
+import json
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+# 以相机为参考时钟时按时间插值的低维数据源
+INTERPOLATED_TOPICS = ("arm/jointState", "arm/endPose", "gripper/encoder", "imu/9axis")
+
+
+def is_interpolated_topic(key: str) -> bool:
+    """判断数据源是否为可插值的低维数据源"""
+    return key.rsplit("/", 1)[0] in INTERPOLATED_TOPICS
+
+
+def quaternion_from_euler(roll: np.ndarray, pitch: np.ndarray, yaw: np.ndarray) -> np.ndarray:
+    """欧拉角 (静态 xyz 顺序，与 create_transformation_matrix 一致) 转四元数 (x, y, z, w)"""
+    cr, sr = np.cos(roll / 2), np.sin(roll / 2)
+    cp, sp = np.cos(pitch / 2), np.sin(pitch / 2)
+    cy, sy = np.cos(yaw / 2), np.sin(yaw / 2)
+    return np.stack([sr * cp * cy - cr * sp * sy,
+                     cr * sp * cy + sr * cp * sy,
+                     cr * cp * sy - sr * sp * cy,
+                     cr * cp * cy + sr * sp * sy], axis=-1)
+
+
+def euler_from_quaternion(q: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """四元数 (x, y, z, w) 转欧拉角，与 matrix_to_xyzrpy 一致"""
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return roll, pitch, yaw
+
+
+def lerp(a: np.ndarray, b: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """批量线性插值，weights 形状为 (N,)"""
+    w = weights.reshape((-1,) + (1,) * (a.ndim - 1))
+    return a + (b - a) * w
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """批量四元数球面线性插值，q0/q1 形状为 (N, 4)"""
+    q0 = q0 / np.linalg.norm(q0, axis=1, keepdims=True)
+    q1 = q1 / np.linalg.norm(q1, axis=1, keepdims=True)
+    dot = np.sum(q0 * q1, axis=1)
+    # 取最短路径
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # 夹角很小时退化为线性插值，避免除零
+    near = sin_theta < 1e-6
+    safe_sin = np.where(near, 1.0, sin_theta)
+    s0 = np.where(near, 1 - weights, np.sin((1 - weights) * theta) / safe_sin)
+    s1 = np.where(near, weights, np.sin(weights * theta) / safe_sin)
+    q = q0 * s0[:, None] + q1 * s1[:, None]
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def bracket_samples(times: np.ndarray, reference_times: np.ndarray, gap_limit: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """为每个参考时间查找前后相邻的两帧
+
+    返回 (前一帧索引, 后一帧索引, 插值权重, 是否可插值)。参考时间与某帧时间相同时两索引相同、权重为 0；
+    参考时间超出数据范围或前后两帧间隔超过 gap_limit 时不可插值。
+    """
+    count = reference_times.size
+    if times.size == 0:
+        zeros = np.zeros(count, dtype=np.int64)
+        return zeros, zeros, np.zeros(count), np.zeros(count, dtype=bool)
+    lower = np.searchsorted(times, reference_times, side='right') - 1
+    has_lower = lower >= 0
+    lower = np.maximum(lower, 0)
+    upper = np.minimum(lower + 1, times.size - 1)
+    exact = has_lower & (times[lower] == reference_times)
+    span = times[upper] - times[lower]
+    valid = exact | (has_lower & (lower + 1 < times.size) & (span <= gap_limit))
+    upper = np.where(exact, lower, upper)
+    weights = np.where(exact | (span <= 0), 0.0, (reference_times - times[lower]) / np.where(span > 0, span, 1.0))
+    return lower, upper, weights, valid
+
+
+def load_topic_samples(key: str, path: str, filenames: List[str]) -> Dict[str, np.ndarray]:
+    """读取低维数据源的 json 数据，按字段返回 (帧数, 维度) 数组，姿态统一转为四元数"""
+    topic = key.rsplit("/", 1)[0]
+    payloads = []
+    for filename in filenames:
+        with open(os.path.join(path, filename), 'r') as file:
+            payloads.append(json.load(file))
+    if topic == "arm/jointState":
+        return {field: np.array([data[field] for data in payloads], dtype=np.float64).reshape(len(payloads), -1)
+                for field in ("position", "velocity", "effort")}
+    if topic == "arm/endPose":
+        samples = {
+            "position": np.array([[data['x'], data['y'], data['z']] for data in payloads], dtype=np.float64).reshape(-1, 3),
+            "orientation": quaternion_from_euler(*np.array([[data['roll'], data['pitch'], data['yaw']] for data in payloads],
+                                                           dtype=np.float64).reshape(-1, 3).T),
+        }
+        if payloads and all('grasper' in data for data in payloads):
+            samples["grasper"] = np.array([data['grasper'] for data in payloads], dtype=np.float64)
+        return samples
+    if topic == "gripper/encoder":
+        return {field: np.array([data[field] for data in payloads], dtype=np.float64) for field in ("angle", "distance")}
+    if topic == "imu/9axis":
+        return {
+            "orientation": np.array([[data['orientation'][axis] for axis in "xyzw"] for data in payloads], dtype=np.float64).reshape(-1, 4),
+            "angularVelocity": np.array([[data['angular_velocity'][axis] for axis in "xyz"] for data in payloads], dtype=np.float64).reshape(-1, 3),
+            "linearAcceleration": np.array([[data['linear_acceleration'][axis] for axis in "xyz"] for data in payloads], dtype=np.float64).reshape(-1, 3),
+        }
+    raise ValueError(f"Topic {key} does not support interpolation")
+
+
+def interpolate_samples(key: str, lower: Dict[str, np.ndarray], upper: Dict[str, np.ndarray], weights: np.ndarray) -> Dict[str, np.ndarray]:
+    """在参考时间处插值，返回与 data_to_hdf5 数据集布局一致的字段"""
+    topic = key.rsplit("/", 1)[0]
+    if topic == "arm/endPose":
+        roll, pitch, yaw = euler_from_quaternion(slerp(lower["orientation"], upper["orientation"], weights))
+        columns = [lerp(lower["position"], upper["position"], weights), np.stack([roll, pitch, yaw], axis=1)]
+        if "grasper" in lower:
+            columns.append(lerp(lower["grasper"], upper["grasper"], weights)[:, None])
+        return {"pose": np.concatenate(columns, axis=1)}
+    result = {}
+    for field in lower:
+        if field == "orientation":
+            result[field] = slerp(lower[field], upper[field], weights)
+        else:
+            result[field] = lerp(lower[field], upper[field], weights)
+    return result
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-episode sync quality report.
+data_sync.py writes sync_report.json beside sync_index.npz, built from the same
+sorted timestamp arrays used for syncing.
+"""
+
+import os
+import json
+import numpy as np
+from typing import Dict, List, Optional
+
+
+SYNC_REPORT_FILE = "sync_report.json"
+
+# 帧间隔直方图的区间边界 (秒)
+GAP_BIN_EDGES = [0.0, 0.005, 0.01, 0.02, 0.04, 0.05, 0.1, 0.2, 0.5, 1.0, np.inf]
+
+
+def describe(values: np.ndarray) -> Optional[Dict]:
+    """返回数组的均值、标准差和分位数，空数组返回 None"""
+    if values.size == 0:
+        return None
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {"mean": float(values.mean()), "std": float(values.std()), "min": float(values.min()),
+            "p5": float(p5), "p50": float(p50), "p95": float(p95), "max": float(values.max())}
+
+
+def gap_histogram(gaps: np.ndarray) -> List[Dict]:
+    """按 GAP_BIN_EDGES 统计帧间隔分布"""
+    counts, _ = np.histogram(gaps, bins=GAP_BIN_EDGES)
+    return [{"from": GAP_BIN_EDGES[i], "to": None if np.isinf(GAP_BIN_EDGES[i + 1]) else GAP_BIN_EDGES[i + 1], "count": int(count)}
+            for i, count in enumerate(counts)]
+
+
+def nearest_diff(times: np.ndarray, reference_times: np.ndarray) -> np.ndarray:
+    """每个参考时间到最近一帧的时间差，数据源为空时为 inf"""
+    if times.size == 0:
+        return np.full(reference_times.size, np.inf)
+    right = np.minimum(np.searchsorted(times, reference_times, side='left'), times.size - 1)
+    left = np.maximum(right - 1, 0)
+    return np.minimum(np.abs(times[left] - reference_times), np.abs(times[right] - reference_times))
+
+
+def build_sync_report(topics: List[Dict], topic_times: List[np.ndarray], topic_indices: List[np.ndarray],
+                      reference_times: np.ndarray, candidate_times: np.ndarray, rejected: List[np.ndarray],
+                      settings: Dict) -> Dict:
+    """生成同步质量报告
+
+    candidate_times: 候选参考帧时间 (帧数最少的参考数据源的时间戳)，同步帧数不会超过其数量
+    rejected:        每个数据源在各候选帧上是否不满足同步条件
+    """
+    frame_count = int(reference_times.size)
+    candidate_count = int(candidate_times.size)
+    report = dict(settings)
+    report.update({
+        "frameCount": frame_count,
+        "candidateFrames": candidate_count,
+        "yield": frame_count / candidate_count if candidate_count > 0 else 0.0,
+        "topics": [],
+    })
+    for k, topic in enumerate(topics):
+        times = topic_times[k]
+        gaps = np.diff(times)
+        duration = float(times[-1] - times[0]) if times.size > 1 else 0.0
+        offsets = times[topic_indices[k]] - reference_times if topic_indices[k] is not None else np.zeros(0)
+        report["topics"].append({
+            "key": topic["key"],
+            "count": int(times.size),
+            "duration": duration,
+            "rate": (times.size - 1) / duration if duration > 0 else 0.0,
+            "gap": describe(gaps),
+            "gapHistogram": gap_histogram(gaps),
+            "offset": describe(offsets),
+            "rejectedPercent": float(rejected[k].mean() * 100) if candidate_count > 0 else 0.0,
+        })
+    return report
+
+
+def save_sync_report(episode_dir: str, report: Dict):
+    """写入 episode 级同步质量报告"""
+    path = os.path.join(episode_dir, SYNC_REPORT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)